@@ -0,0 +1,94 @@
+"""
+Request helpers of the LLM adapters speaking the OpenAI chat completions protocol (DouBao, Kimi).
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+def parse_chat_completion(response: Any) -> str:
+    """
+    Returns the message content of a chat completion response.
+
+    Args:
+        response (httpx.Response): The response of the chat completions endpoint.
+
+    Returns:
+        str: The content of the first choice.
+    """
+    if response.status_code != 200:
+        raise ValueError(f"Failed with response: {response}")
+
+    try:
+        parsed_response = response.json()
+    except json.JSONDecodeError as e:
+        raise ValueError(
+            f"Error raised during decoding response from inference endpoint: {e}."
+            f"\nResponse: {response.text}"
+        )
+
+    if not isinstance(parsed_response, dict):
+        raise ValueError(f"Unexpected response type: {parsed_response}")
+    choices = parsed_response.get("choices")
+    if not choices:
+        raise ValueError(f"No content in response : {parsed_response}")
+    return choices[0]["message"]["content"]
+
+
+def parse_stream_line(line: str) -> Optional[str]:
+    """
+    Returns the content delta of a server-sent event line of a streamed chat completion.
+
+    Args:
+        line (str): A line of the event stream, e.g. 'data: {"choices": [{"delta": {"content": "Hi"}}]}'.
+
+    Returns:
+        Optional[str]: The content delta, "" for events without content, None once the stream is done.
+    """
+    line = line.strip()
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error raised during decoding stream event: {e}.\nEvent: {data}")
+    choices = event.get("choices") or []
+    if not choices:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+async def apost_chat_completion(client: Any, url: str, headers: Dict[str, str], payload: Dict[str, Any],
+                                timeout: float) -> str:
+    """Posts a chat completion request with the shared async client and returns the content."""
+    import httpx
+
+    try:
+        response = await client.post(url, headers=headers, json=payload, timeout=timeout)
+    except httpx.NetworkError as e:
+        raise ValueError(f"Error raised by inference endpoint: {e}")
+    return parse_chat_completion(response)
+
+
+async def astream_chat_completion(client: Any, url: str, headers: Dict[str, str], payload: Dict[str, Any],
+                                  timeout: float) -> AsyncIterator[str]:
+    """Posts a streamed chat completion request with the shared async client and yields the content deltas."""
+    import httpx
+
+    try:
+        async with client.stream("POST", url, headers=headers, json={**payload, "stream": True},
+                                 timeout=timeout) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ValueError(f"Failed with response: {response}")
+            async for line in response.aiter_lines():
+                delta = parse_stream_line(line)
+                if delta is None:
+                    break
+                if delta:
+                    yield delta
+    except httpx.NetworkError as e:
+        raise ValueError(f"Error raised by inference endpoint: {e}")
@@ -0,0 +1,95 @@
+from typing import Callable, List, Tuple
+
+
+def pack_token_windows(sentence_token_ids: List[List[int]], window_size: int,
+                       stride: int = 0) -> List[Tuple[List[int], int]]:
+    """
+    Pack the token ids of consecutive sentences into windows of at most window_size tokens.
+
+    Sentences are kept whole and appended to the current window while they fit. A sentence longer
+    than a window is split into windows of window_size tokens that start stride tokens apart, so
+    consecutive windows overlap by window_size - stride tokens and no token is truncated.
+
+    Args:
+        sentence_token_ids (List[List[int]]): The token ids of each sentence, without special tokens.
+        window_size (int): The maximum number of tokens of a window, without special tokens.
+        stride (int): The step between the windows of a long sentence; 0 or a value above
+            window_size means no overlap.
+
+    Returns:
+        List[Tuple[List[int], int]]: The token ids of each window and the number of tokens it
+            contributes, which is the pooling weight of the window; overlapping tokens are only counted once.
+    """
+    if window_size <= 0:
+        raise ValueError("window_size must be positive")
+    if stride <= 0 or stride > window_size:
+        stride = window_size
+
+    windows: List[Tuple[List[int], int]] = []
+    current: List[int] = []
+    for token_ids in sentence_token_ids:
+        if not token_ids:
+            continue
+        if len(token_ids) > window_size:
+            if current:
+                windows.append((current, len(current)))
+                current = []
+            start = 0
+            while True:
+                window = token_ids[start:start + window_size]
+                # the first window counts all its tokens, the next ones only the tokens not covered yet
+                new_tokens = len(window) if start == 0 else len(window) - (window_size - stride)
+                windows.append((window, new_tokens))
+                if start + window_size >= len(token_ids):
+                    break
+                start += stride
+            continue
+        if len(current) + len(token_ids) > window_size:
+            windows.append((current, len(current)))
+            current = []
+        current = current + token_ids
+    if current:
+        windows.append((current, len(current)))
+    return windows
+
+
+def group_texts_by_tokens(texts: List[str], max_tokens: int,
+                          count_tokens: Callable[[str], int]) -> List[List[str]]:
+    """
+    Group consecutive texts so that the tokens of each group stay within max_tokens.
+
+    Texts are kept whole while they fit in a group. A text longer than max_tokens is cut into
+    pieces of about max_tokens tokens, proportionally to its length in characters.
+
+    Args:
+        texts (List[str]): The texts in reading order, e.g. the pages of a document.
+        max_tokens (int): The maximum number of tokens of a group.
+        count_tokens (Callable[[str], int]): Counts or estimates the tokens of a text.
+
+    Returns:
+        List[List[str]]: The groups of texts, in reading order.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for text in texts:
+        if not text or not text.strip():
+            continue
+        tokens = count_tokens(text)
+        pieces = [text]
+        if tokens > max_tokens:
+            piece_length = max(1, len(text) * max_tokens // tokens)
+            pieces = [text[start:start + piece_length] for start in range(0, len(text), piece_length)]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece) if len(pieces) > 1 else tokens
+            if current and current_tokens + piece_tokens > max_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,122 @@
+"""
+Executors for CPU-bound model work, so that it never runs on the asyncio event loop.
+
+Torch releases the GIL during forward passes, so embeddings run in a thread pool sharing the
+models of the process-wide model registry. spaCy pipelines hold the GIL, so NER runs in a pool of
+worker processes that each load their own pipelines; with NLP_PROCESS_WORKERS=0 it falls back to
+the thread pool.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from core import config
+from core.extends_logger import logger
+
+
+_lock = threading.Lock()
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _configure_torch_threads() -> None:
+    if config.TORCH_NUM_THREADS <= 0:
+        return
+    try:
+        import torch
+        torch.set_num_threads(config.TORCH_NUM_THREADS)
+        logger.info(f"Set torch intra-op threads to {config.TORCH_NUM_THREADS}")
+    except Exception as e:
+        logger.error(f"Failed to set torch intra-op threads: {e}")
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Returns the thread pool running embedding and other GIL-releasing work."""
+    global _thread_pool
+    if _thread_pool is None:
+        with _lock:
+            if _thread_pool is None:
+                _configure_torch_threads()
+                _thread_pool = ThreadPoolExecutor(max_workers=max(1, config.COMPUTE_THREAD_WORKERS),
+                                                  thread_name_prefix="compute")
+    return _thread_pool
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the process pool running spaCy work, or None when NLP_PROCESS_WORKERS is 0."""
+    global _process_pool
+    if config.NLP_PROCESS_WORKERS <= 0:
+        return None
+    if _process_pool is None:
+        with _lock:
+            if _process_pool is None:
+                # spawn instead of fork: the parent holds torch thread pools and locks that must not be copied
+                _process_pool = ProcessPoolExecutor(max_workers=config.NLP_PROCESS_WORKERS,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+async def run_in_compute_thread(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a function in the compute thread pool and awaits its result.
+
+    Args:
+        func (Callable[..., Any]): The function to run, e.g. EmbeddingFactory.get_embeddings_for_texts.
+
+    Returns:
+        Any: The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(func, *args, **kwargs))
+
+
+async def run_in_nlp_process(func: Callable[..., Any], *args) -> Any:
+    """
+    Runs a module-level function in the NLP process pool and awaits its result.
+
+    The function and its arguments must be picklable. Falls back to the compute thread pool when the
+    process pool is disabled or broken.
+    """
+    global _process_pool
+    pool = get_process_pool()
+    if pool is None:
+        return await run_in_compute_thread(func, *args)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, functools.partial(func, *args))
+    except BrokenProcessPool as e:
+        logger.error(f"NLP process pool is broken, falling back to the compute thread pool: {e}")
+        with _lock:
+            if _process_pool is pool:
+                _process_pool = None
+        pool.shutdown(wait=False)
+        return await run_in_compute_thread(func, *args)
+
+
+def compute_stats() -> Dict:
+    """Returns the configured sizes of the compute executors."""
+    return {
+        "thread_workers": max(1, config.COMPUTE_THREAD_WORKERS),
+        "nlp_process_workers": max(0, config.NLP_PROCESS_WORKERS),
+        "torch_num_threads": config.TORCH_NUM_THREADS,
+        "thread_pool_started": _thread_pool is not None,
+        "process_pool_started": _process_pool is not None,
+    }
+
+
+def shutdown_compute_executors() -> None:
+    """Shuts the compute executors down, called on application shutdown."""
+    global _thread_pool, _process_pool
+    with _lock:
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
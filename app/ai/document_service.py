@@ -1,18 +1,9 @@
+import importlib
 import json
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from bs4 import BeautifulSoup
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_community.document_loaders.excel import UnstructuredExcelLoader
-from langchain_community.document_loaders.html import UnstructuredHTMLLoader
-from langchain_community.document_loaders.markdown import UnstructuredMarkdownLoader
-from langchain_community.document_loaders.powerpoint import UnstructuredPowerPointLoader
-from langchain_community.document_loaders.text import TextLoader
-from langchain_community.document_loaders.web_base import WebBaseLoader
-from langchain_community.document_loaders.word_document import UnstructuredWordDocumentLoader
-from langchain_community.document_loaders.xml import UnstructuredXMLLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import CharacterTextSplitter, MarkdownHeaderTextSplitter
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -20,6 +11,7 @@ from langchain_text_splitters import RecursiveJsonSplitter
 from pydantic import FilePath
 
 import core.config as config
+from core.extends_logger import logger
 from graph.graph_query import KnowledgeGraphQuery
 from.embedding import EmbeddingFactory
 from.llm import Llm
@@ -105,22 +97,37 @@ class DocumentService:
         self.embedding_factory = EmbeddingFactory()
         self.llm = Llm()
 
+        # the loaders are imported on first use, the unstructured loaders pull in heavy dependencies
         self.file_type_mapping = {
-            'md': UnstructuredMarkdownLoader,
-            'pdf': PyPDFLoader,
-            'docx': UnstructuredWordDocumentLoader,
-            'doc': UnstructuredWordDocumentLoader,
-            'xlsx': UnstructuredExcelLoader,
-            'xls': UnstructuredExcelLoader,
-            'pptx': UnstructuredPowerPointLoader,
-            'ppt': UnstructuredPowerPointLoader,
-            'csv': CSVLoader,
-            'html': UnstructuredHTMLLoader,
-            'xml': UnstructuredXMLLoader,
-            'txt': TextLoader,
-            'json': TextLoader
+            'md': 'langchain_community.document_loaders.markdown.UnstructuredMarkdownLoader',
+            'pdf': 'langchain_community.document_loaders.PyPDFLoader',
+            'docx': 'langchain_community.document_loaders.word_document.UnstructuredWordDocumentLoader',
+            'doc': 'langchain_community.document_loaders.word_document.UnstructuredWordDocumentLoader',
+            'xlsx': 'langchain_community.document_loaders.excel.UnstructuredExcelLoader',
+            'xls': 'langchain_community.document_loaders.excel.UnstructuredExcelLoader',
+            'pptx': 'langchain_community.document_loaders.powerpoint.UnstructuredPowerPointLoader',
+            'ppt': 'langchain_community.document_loaders.powerpoint.UnstructuredPowerPointLoader',
+            'csv': 'langchain_community.document_loaders.csv_loader.CSVLoader',
+            'html': 'langchain_community.document_loaders.html.UnstructuredHTMLLoader',
+            'xml': 'langchain_community.document_loaders.xml.UnstructuredXMLLoader',
+            'txt': 'langchain_community.document_loaders.text.TextLoader',
+            'json': 'langchain_community.document_loaders.text.TextLoader'
         }
 
+    @staticmethod
+    def import_loader(path: str):
+        """
+        Import a document loader class from its import path.
+
+        Args:
+            path (str): The import path, e.g. 'langchain_community.document_loaders.text.TextLoader'.
+
+        Returns:
+            The loader class.
+        """
+        module_name, class_name = path.rsplit('.', 1)
+        return getattr(importlib.import_module(module_name), class_name)
+
     def get_file_extension(self, filename: str) -> str:
         """
         Get the file extension of the given file name.
@@ -160,9 +167,9 @@ class DocumentService:
             ValueError: If the file type is not supported.
         """
         file_extension = self.get_file_extension(file_path)
-        loader_class = self.file_type_mapping.get(file_extension)
-        if loader_class:
-            loader = loader_class(file_path)
+        loader_path = self.file_type_mapping.get(file_extension)
+        if loader_path:
+            loader = self.import_loader(loader_path)(file_path)
             return loader.load()
         supported_types = ', '.join(self.file_type_mapping.keys())
         raise ValueError(f"Unsupported file type: {file_extension}. Supported types are: {supported_types}")
@@ -276,6 +283,22 @@ class DocumentService:
         else:
             return self.split_common_documents(docs)
 
+    def summarize_documents(self, documents: List[Document], llm_name: str) -> Optional[dict]:
+        """
+        Summarize documents in one prompt, or with map-reduce when they are too large for one prompt.
+
+        Args:
+            documents (List[Document]): The loaded documents.
+            llm_name (str): The name of the LLM to use for summarization.
+
+        Returns:
+            Optional[dict]: The title and summary of the documents.
+        """
+        if self.llm.should_map_reduce(documents, llm_name):
+            logger.info(f"Summarizing {len(documents)} documents with map-reduce")
+            return self.llm.summarize_documents_map_reduce(documents=documents, llm_name=llm_name)
+        return self.llm.summarize_documents(documents=documents, llm_name=llm_name)
+
     def analysis_url(self, url: str, llm_name: str = config.DEFAULT_LLM_NAME) -> tuple:
         """
         Analyze the content of a given URL.
@@ -287,9 +310,9 @@ class DocumentService:
         Returns:
             tuple: A tuple containing the summary and the split documents.
         """
-        loader = WebBaseLoader(url)
+        loader = self.import_loader('langchain_community.document_loaders.web_base.WebBaseLoader')(url)
         docs = loader.load()
-        summary = self.llm.summarize_documents(documents=docs, llm_name=llm_name)
+        summary = self.summarize_documents(docs, llm_name)
         splits = self.split_common_documents(docs)
 
         return summary, splits
@@ -311,6 +334,6 @@ class DocumentService:
             return None, None
 
         documents = self.load_documents(file_path)
-        summary = self.llm.summarize_documents(documents=documents, llm_name=llm_name)
+        summary = self.summarize_documents(documents, llm_name)
         splits = self.split_documents(file_path, documents, embedding_model)
         return summary, splits
@@ -1,9 +1,9 @@
-import json
-from typing import Any, List, Optional, Union
+from typing import Any, AsyncIterator, List, Optional, Union
 
 from langchain.embeddings import logger
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
 from langchain_core.messages import (
     AIMessage,
     BaseMessage,
@@ -16,6 +16,7 @@ from pydantic import Field
 from langchain_community.llms.utils import enforce_stop_tokens
 from core import config as env
 from . import _convert_message_to_dict
+from .chat_completions import apost_chat_completion, astream_chat_completion, parse_chat_completion
 
 HEADERS = {"Content-Type": "application/json", "Authorization": f"Bearer {env.DOUBAO_API_KEY}"}
 DEFAULT_TIMEOUT = 30
@@ -74,8 +75,17 @@ class DouBao(LLM):
 
     @property
     def client(self) -> Any:
-        import httpx
-        return httpx.Client(timeout=self.timeout)
+        # reuse the keep-alive client instead of opening a new connection per call
+        if self.http_client is None:
+            from .http_clients import get_http_client
+            self.http_client = get_http_client()
+        return self.http_client
+
+    @property
+    def async_client(self) -> Any:
+        # the async client is shared per event loop, see ai.http_clients
+        from .http_clients import get_async_http_client
+        return get_async_http_client()
 
     def _get_payload(self, prompt: str) -> dict:
         params = self._invocation_params
@@ -123,30 +133,45 @@ class DouBao(LLM):
 
         logger.debug(f"DouBao response: {response}")
 
-        if response.status_code != 200:
-            raise ValueError(f"Failed with response: {response}")
+        text = parse_chat_completion(response)
+        if stop is not None:
+            text = enforce_stop_tokens(text, stop)
 
-        try:
-            parsed_response = response.json()
-
-            if isinstance(parsed_response, dict):
-                content_keys = "choices"
-                if content_keys in parsed_response:
-                    choices = parsed_response[content_keys]
-                    if len(choices):
-                        text = choices[0]["message"]["content"]
-                else:
-                    raise ValueError(f"No content in response : {parsed_response}")
-            else:
-                raise ValueError(f"Unexpected response type: {parsed_response}")
-
-        except json.JSONDecodeError as e:
-            raise ValueError(
-                f"Error raised during decoding response from inference endpoint: {e}."
-                f"\nResponse: {response.text}"
-            )
+        return text
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Call out to a DouBao LLM inference endpoint with the shared async client, without a worker thread."""
+        payload = self._get_payload(prompt)
+        logger.debug(f"DouBao payload: {payload}")
 
+        text = await apost_chat_completion(self.async_client, self.endpoint_url, HEADERS, payload, self.timeout)
         if stop is not None:
             text = enforce_stop_tokens(text, stop)
 
-        return text
\ No newline at end of file
+        return text
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Stream the tokens generated by a DouBao LLM inference endpoint."""
+        payload = self._get_payload(prompt)
+        if stop is not None:
+            payload["stop"] = stop
+        logger.debug(f"DouBao stream payload: {payload}")
+
+        async for delta in astream_chat_completion(self.async_client, self.endpoint_url, HEADERS, payload,
+                                                   self.timeout):
+            chunk = GenerationChunk(text=delta)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
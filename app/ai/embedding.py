@@ -1,11 +1,21 @@
+import json
 import logging
-from transformers import MT5Tokenizer, MT5EncoderModel
-from sentence_transformers import SentenceTransformer, SimilarityFunction
-import torch
+import os
 import numpy as np
-from typing import List, Dict, Optional, Union
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Tuple
 import re
 
+from core import config
+from .chunking import pack_token_windows
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+from .model_registry import model_registry
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# torch, transformers and sentence_transformers take seconds to import, they are imported
+# when a model is loaded so that API workers and tests that never embed do not pay for them.
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -61,14 +71,42 @@ def split_text_into_sentences(text: str) -> List[str]:
     sentences = re.split(pattern, text)
     return [s.strip() for s in sentences if s.strip()]
 
+
+def scatter_mean(embeddings: np.ndarray, owners: List[int], valid: np.ndarray, size: int,
+                 weights: Optional[List[float]] = None) -> np.ndarray:
+    """
+    Average row embeddings back into their owners.
+
+    Args:
+        embeddings (np.ndarray): Embeddings of shape (rows, dimension).
+        owners (List[int]): The owner index of each row.
+        valid (np.ndarray): Boolean mask of the rows to take into account.
+        size (int): The number of owners.
+        weights (Optional[List[float]]): The weight of each row, every row weighs 1 by default.
+
+    Returns:
+        np.ndarray: The averaged embeddings of shape (size, dimension); owners without valid rows are zeros.
+    """
+    owners = np.asarray(owners, dtype=np.int64)[valid]
+    row_weights = np.ones(len(valid), dtype=embeddings.dtype) if weights is None \
+        else np.asarray(weights, dtype=embeddings.dtype)
+    row_weights = row_weights[valid]
+    rows = embeddings[valid] * row_weights[:, None]
+    sums = np.zeros((size, embeddings.shape[1]), dtype=embeddings.dtype)
+    np.add.at(sums, owners, rows)
+    counts = np.bincount(owners, weights=row_weights, minlength=size)
+    filled = counts > 0
+    sums[filled] /= counts[filled, None]
+    return sums
+
 class EmbeddingModel:
     """Base class for embedding models."""
 
     def __init__(self, model_name: str, device: str = "cpu"):
         self.model_name = model_name
         self.device = device
-        self.model: Optional[torch.nn.Module] = None
-        self.tokenizer: Optional[Union[torch.nn.Module, MT5Tokenizer]] = None
+        self.model: Optional[Any] = None
+        self.tokenizer: Optional[Any] = None
 
     def load_model(self):
         """Load the model and tokenizer."""
@@ -78,94 +116,432 @@ class EmbeddingModel:
         """Generate embedding for a given text."""
         raise NotImplementedError("Subclasses should implement this method.")
 
+    def get_embeddings(self, texts: List[str], max_tokens_each_chunk: int = 128,
+                       batch_size: int = config.EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """Generate embeddings for several texts. Subclasses should override this with a batched implementation."""
+        return np.vstack([self.get_embedding(text, max_tokens_each_chunk) for text in texts])
+
     def similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """Calculate similarity between two embeddings."""
         raise NotImplementedError("Subclasses should implement this method.")
 
+    def get_dimension(self) -> int:
+        """Return the dimension of the embeddings produced by the model."""
+        raise NotImplementedError("Subclasses should implement this method.")
+
+    def cache_name(self) -> str:
+        """Return the name identifying the embeddings of this model in the embedding cache."""
+        return f"{type(self).__name__}:{self.model_name}"
+
 class SBERTModel(EmbeddingModel):
-    """Wrapper for SBERT models."""
+    """
+    Wrapper for SBERT models.
+
+    Texts are chunked with one of two strategies:
+    - "sentence": every sentence is encoded on its own, truncated to max_tokens_each_chunk tokens.
+    - "token_window": the sentences are packed into windows of the model's token limit, long
+      sentences are split into overlapping windows with the given stride, and the windows are
+      pooled weighted by their token counts, so nothing is truncated.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu",
+                 chunk_strategy: str = config.EMBEDDING_CHUNK_STRATEGY,
+                 chunk_stride: int = config.EMBEDDING_CHUNK_STRIDE):
+        super().__init__(model_name, device)
+        if chunk_strategy not in ("sentence", "token_window"):
+            raise ValueError(f"Chunk strategy '{chunk_strategy}' is not supported. Use 'sentence' or 'token_window'.")
+        self.chunk_strategy = chunk_strategy
+        self.chunk_stride = chunk_stride
+
+    def cache_name(self) -> str:
+        name = super().cache_name()
+        return name if self.chunk_strategy == "sentence" else f"{name}:{self.chunk_strategy}:{self.chunk_stride}"
+
+    def _load_sentence_transformer(self) -> "SentenceTransformer":
+        from sentence_transformers import SentenceTransformer, SimilarityFunction
+
+        model = SentenceTransformer(self.model_name, device=self.device)
+        model.similarity_fn_name = SimilarityFunction.COSINE
+        return model
 
     def load_model(self):
         if self.model is None:
             try:
-                self.model = SentenceTransformer(self.model_name, device=self.device)
-                self.model.similarity_fn_name = SimilarityFunction.COSINE
+                self.model = model_registry.get_or_load(f"sbert:{self.model_name}:{self.device}",
+                                                        self._load_sentence_transformer)
             except Exception as e:
                 logger.error(f"Failed to load SBERT model {self.model_name}: {e}")
                 raise RuntimeError(f"Failed to load SBERT model {self.model_name}: {e}")
 
     def get_embedding(self, text: str, max_tokens_each_chunk: int = 128) -> np.ndarray:
+        return self.get_embeddings([text], max_tokens_each_chunk)[0]
+
+    def get_embeddings(self, texts: List[str], max_tokens_each_chunk: int = 128,
+                       batch_size: int = config.EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """
+        Generate embeddings for several texts with batched forward passes.
+
+        The chunks of all texts are tokenized together, sorted by token length so that each
+        mini-batch only pads to its own longest chunk, encoded in mini-batches of batch_size,
+        and the chunk embeddings are averaged back per text. Tokenization and encoding hold the
+        lock of the model, which is not thread-safe.
+        """
         self.load_model()
-        sentences = split_text_into_sentences(text)
-        all_embeddings = []
-        for sentence in sentences:
-            try:
-                encoding = self.model.tokenizer(
-                    sentence, add_special_tokens=True, truncation=True,
-                    padding="max_length", max_length=max_tokens_each_chunk,
-                    return_tensors='pt'
+        owners: List[int] = []
+        sentences: List[str] = []
+        for index, text in enumerate(texts):
+            for sentence in split_text_into_sentences(text or ""):
+                sentences.append(sentence)
+                owners.append(index)
+
+        dimension = self.get_dimension()
+        if not sentences:
+            return np.zeros((len(texts), dimension), dtype=np.float32)
+
+        # the model and its fast tokenizer are shared by the compute threads and the embedding batcher
+        with model_registry.model_lock(self.model):
+            if self.chunk_strategy == "token_window":
+                input_ids, owners, weights = self._token_windows(sentences, owners, max_tokens_each_chunk)
+            else:
+                encodings = self.model.tokenizer(
+                    sentences, add_special_tokens=True, truncation=True, max_length=max_tokens_each_chunk
                 )
-                input_dict = {
-                    'input_ids': encoding['input_ids'].to(self.device),
-                    'attention_mask': encoding['attention_mask'].to(self.device)
-                }
-                with torch.no_grad():
-                    embedding = self.model(input_dict)['sentence_embedding']
-                all_embeddings.append(embedding.cpu().numpy())
-            except Exception as e:
-                logger.error(f"Error processing sentence: {sentence}. Error: {e}")
-                continue
+                input_ids = encodings['input_ids']
+                weights = None
+            order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+
+            chunk_embeddings = np.zeros((len(input_ids), dimension), dtype=np.float32)
+            valid = np.zeros(len(input_ids), dtype=bool)
+            for start in range(0, len(order), max(1, batch_size)):
+                batch = order[start:start + max(1, batch_size)]
+                try:
+                    chunk_embeddings[batch] = self._encode_batch([input_ids[i] for i in batch],
+                                                                 [[1] * len(input_ids[i]) for i in batch])
+                    valid[batch] = True
+                except Exception as e:
+                    logger.error(f"Error processing a batch of {len(batch)} chunks. Error: {e}")
+                    continue
+
+        return scatter_mean(chunk_embeddings, owners, valid, len(texts), weights)
+
+    def _token_windows(self, sentences: List[str], owners: List[int],
+                       max_tokens_each_chunk: int) -> Tuple[List[List[int]], List[int], List[int]]:
+        """
+        Pack the sentences of each text into token windows.
+
+        Returns:
+            Tuple[List[List[int]], List[int], List[int]]: The input ids of each window with special tokens,
+                the owner text of each window and the number of tokens each window contributes.
+        """
+        tokenizer = self.model.tokenizer
+        model_limit = min(self.model.get_max_seq_length() or max_tokens_each_chunk, max_tokens_each_chunk)
+        window_size = max(1, model_limit - tokenizer.num_special_tokens_to_add())
+        sentence_token_ids = tokenizer(sentences, add_special_tokens=False)['input_ids']
+
+        input_ids: List[List[int]] = []
+        window_owners: List[int] = []
+        weights: List[int] = []
+        start = 0
+        while start < len(sentences):
+            end = start
+            while end < len(sentences) and owners[end] == owners[start]:
+                end += 1
+            for window, tokens in pack_token_windows(sentence_token_ids[start:end], window_size, self.chunk_stride):
+                input_ids.append(tokenizer.build_inputs_with_special_tokens(window))
+                window_owners.append(owners[start])
+                weights.append(tokens)
+            start = end
+        return input_ids, window_owners, weights
+
+    def _encode_batch(self, input_ids: List[List[int]], attention_mask: List[List[int]]) -> np.ndarray:
+        """Encode one mini-batch of tokenized sentences into sentence embeddings."""
+        import torch
+
+        features = self.model.tokenizer.pad(
+            {'input_ids': input_ids, 'attention_mask': attention_mask},
+            padding=True, return_tensors='pt'
+        )
+        input_dict = {
+            'input_ids': features['input_ids'].to(self.device),
+            'attention_mask': features['attention_mask'].to(self.device)
+        }
+        with torch.no_grad():
+            embeddings = self.model(input_dict)['sentence_embedding']
+        return embeddings.cpu().numpy()
 
-        if all_embeddings:
-            aggregated_embedding = np.mean(all_embeddings, axis=0)
+    def similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+        return self.model.similarity(embedding1, embedding2)
+
+    def get_dimension(self) -> int:
+        self.load_model()
+        return self.model.get_sentence_embedding_dimension()
+
+class OnnxSentenceEncoder:
+    """An SBERT model exported to ONNX, served by ONNX Runtime together with its tokenizer and pooling settings."""
+
+    def __init__(self, model_path: str, artifact_dir: str, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(artifact_dir, "pooling.json"), "r", encoding="utf-8") as f:
+            pooling = json.load(f)
+        self.pooling_mode: str = pooling["pooling_mode"]
+        self.normalize: bool = pooling["normalize"]
+        self.dimension: int = pooling["dimension"]
+        self.max_seq_length: Optional[int] = pooling.get("max_seq_length")
+        self.tokenizer = AutoTokenizer.from_pretrained(artifact_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+    def encode(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        inputs = {"input_ids": input_ids.astype(np.int64), "attention_mask": attention_mask.astype(np.int64)}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(inputs["input_ids"])
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        if self.pooling_mode == "cls":
+            embeddings = token_embeddings[:, 0]
         else:
-            aggregated_embedding = np.zeros(self.model.get_sentence_embedding_dimension())
-        return aggregated_embedding.flatten()
+            mask = attention_mask[..., None].astype(token_embeddings.dtype)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def get_max_seq_length(self) -> Optional[int]:
+        return self.max_seq_length
+
+
+class SBERTOnnxModel(SBERTModel):
+    """
+    SBERT model served by ONNX Runtime on CPU.
+
+    The transformer of the SentenceTransformer model is exported to ONNX once and cached under
+    EMBEDDING_ONNX_DIR, optionally with dynamic int8 quantization of its weights. Sentence splitting,
+    tokenization and batching are shared with SBERTModel; only the forward pass and pooling differ.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", quantize: bool = config.EMBEDDING_ONNX_QUANTIZE):
+        super().__init__(model_name, device)
+        self.quantize = quantize
+
+    @property
+    def artifact_dir(self) -> str:
+        return os.path.join(config.EMBEDDING_ONNX_DIR, re.sub(r"[^\w.-]", "_", self.model_name))
+
+    def cache_name(self) -> str:
+        return f"{super().cache_name()}:{'int8' if self.quantize else 'fp32'}"
+
+    def export(self) -> str:
+        """
+        Export the model to ONNX (and quantize it) unless the artifact is already on disk.
+
+        Returns:
+            str: The path of the ONNX model to serve.
+        """
+        artifact_dir = self.artifact_dir
+        fp32_path = os.path.join(artifact_dir, "model.onnx")
+        int8_path = os.path.join(artifact_dir, "model.int8.onnx")
+
+        if not os.path.exists(fp32_path):
+            import torch
+            from sentence_transformers import SentenceTransformer
+            from sentence_transformers.models import Normalize, Pooling
+
+            logger.info(f"Exporting {self.model_name} to ONNX in {artifact_dir}")
+            os.makedirs(artifact_dir, exist_ok=True)
+            sentence_transformer = SentenceTransformer(self.model_name, device="cpu")
+            transformer = sentence_transformer[0].auto_model.eval()
+            tokenizer = sentence_transformer.tokenizer
+            pooling = next((module for module in sentence_transformer if isinstance(module, Pooling)), None)
+            normalize = any(isinstance(module, Normalize) for module in sentence_transformer)
+
+            dummy = tokenizer(["export the model to onnx"], return_tensors="pt")
+            input_names = ["input_ids", "attention_mask"]
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+            tmp_path = fp32_path + ".tmp"
+            with torch.no_grad():
+                torch.onnx.export(
+                    transformer,
+                    (dummy["input_ids"], dummy["attention_mask"]),
+                    tmp_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                )
+            tokenizer.save_pretrained(artifact_dir)
+            with open(os.path.join(artifact_dir, "pooling.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "pooling_mode": "cls" if pooling is not None and pooling.pooling_mode_cls_token else "mean",
+                    "normalize": normalize,
+                    "dimension": sentence_transformer.get_sentence_embedding_dimension(),
+                    "max_seq_length": sentence_transformer.get_max_seq_length(),
+                }, f)
+            os.replace(tmp_path, fp32_path)
+
+        if not self.quantize:
+            return fp32_path
+
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing {fp32_path} to int8")
+            quantize_dynamic(fp32_path, int8_path + ".tmp", weight_type=QuantType.QInt8)
+            os.replace(int8_path + ".tmp", int8_path)
+        return int8_path
+
+    def load_model(self):
+        if self.model is None:
+            try:
+                self.model = model_registry.get_or_load(
+                    f"sbert-onnx:{self.model_name}:{'int8' if self.quantize else 'fp32'}",
+                    lambda: OnnxSentenceEncoder(self.export(), self.artifact_dir, config.EMBEDDING_ONNX_THREADS))
+            except Exception as e:
+                logger.error(f"Failed to load ONNX SBERT model {self.model_name}: {e}")
+                raise RuntimeError(f"Failed to load ONNX SBERT model {self.model_name}: {e}")
+
+    def _encode_batch(self, input_ids: List[List[int]], attention_mask: List[List[int]]) -> np.ndarray:
+        features = self.model.tokenizer.pad(
+            {'input_ids': input_ids, 'attention_mask': attention_mask},
+            padding=True, return_tensors='np'
+        )
+        return self.model.encode(features['input_ids'], features['attention_mask'])
 
     def similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        return self.model.similarity(embedding1, embedding2)
+        return calculate_cosine_similarity(embedding1, embedding2)
+
+
+def check_onnx_parity(texts: Optional[List[str]] = None, quantize: bool = config.EMBEDDING_ONNX_QUANTIZE,
+                      threshold: float = config.EMBEDDING_ONNX_PARITY_THRESHOLD,
+                      model_name: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2") -> Dict:
+    """
+    Compare the ONNX embeddings with the torch embeddings of the same SBERT model.
+
+    Args:
+        texts (Optional[List[str]]): The texts to compare, a small multilingual sample by default.
+        quantize (bool): Whether to check the int8 quantized model.
+        threshold (float): The minimum cosine similarity every text must reach.
+        model_name (str): The SBERT model name.
+
+    Returns:
+        Dict: The minimum and mean cosine similarity and whether the check passed.
+    """
+    if texts is None:
+        texts = [
+            "This is a test sentence.",
+            "Knowledge graphs connect entities through typed relationships.",
+            "这是一个测试句子。",
+            "知识图谱通过关系连接实体。",
+            "BigBird is designed for long sequences. Longformer can handle long documents.",
+        ]
+    torch_embeddings = SBERTModel(model_name).get_embeddings(texts)
+    onnx_embeddings = SBERTOnnxModel(model_name, quantize=quantize).get_embeddings(texts)
+    similarities = [calculate_cosine_similarity(a, b) for a, b in zip(torch_embeddings, onnx_embeddings)]
+    result = {
+        "quantize": quantize,
+        "min_cosine": float(min(similarities)),
+        "mean_cosine": float(np.mean(similarities)),
+        "threshold": threshold,
+        "passed": min(similarities) >= threshold,
+    }
+    if not result["passed"]:
+        logger.error(f"ONNX embeddings diverge from torch embeddings: {result}")
+    return result
+
 
 class MLongT5ModelWrapper(EmbeddingModel):
     """Wrapper for mLongT5 models."""
 
     def load_model(self):
         if self.model is None:
+            from transformers import MT5Tokenizer, MT5EncoderModel
+
             try:
-                self.model = MT5EncoderModel.from_pretrained(self.model_name).to(self.device)
-                self.tokenizer = MT5Tokenizer.from_pretrained(self.model_name)
+                self.model = model_registry.get_or_load(
+                    f"mlongt5:{self.model_name}:{self.device}",
+                    lambda: MT5EncoderModel.from_pretrained(self.model_name).to(self.device))
+                self.tokenizer = model_registry.get_or_load(
+                    f"mlongt5-tokenizer:{self.model_name}",
+                    lambda: MT5Tokenizer.from_pretrained(self.model_name))
             except Exception as e:
                 logger.error(f"Failed to load mLongT5 model {self.model_name}: {e}")
                 raise RuntimeError(f"Failed to load mLongT5 model {self.model_name}: {e}")
 
     def get_embedding(self, text: str, max_tokens_each_chunk: int = 128) -> np.ndarray:
+        return self.get_embeddings([text], max_tokens_each_chunk)[0]
+
+    def get_embeddings(self, texts: List[str], max_tokens_each_chunk: int = 128,
+                       batch_size: int = config.EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """Generate embeddings for several texts, encoding them in length-sorted mini-batches."""
+        import torch
+
         self.load_model()
-        try:
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
-            inputs = {key: val.to(self.device) for key, val in inputs.items()}
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-            embeddings = outputs.last_hidden_state.mean(dim=1)
-            embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
-            return embeddings.cpu().numpy().flatten()
-        except Exception as e:
-            logger.error(f"Error generating embedding for text: {text}. Error: {e}")
-            return np.zeros(self.model.config.hidden_size)
+        results = np.zeros((len(texts), self.get_dimension()), dtype=np.float32)
+        order = sorted((i for i, text in enumerate(texts) if text), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), max(1, batch_size)):
+            batch = order[start:start + max(1, batch_size)]
+            try:
+                inputs = self.tokenizer([texts[i] for i in batch], return_tensors="pt", padding=True, truncation=True)
+                inputs = {key: val.to(self.device) for key, val in inputs.items()}
+                with torch.no_grad():
+                    outputs = self.model(**inputs)
+                # mean over the real tokens only, so that padding does not change the embedding of short texts
+                mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+                embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+                results[batch] = embeddings.cpu().numpy()
+            except Exception as e:
+                logger.error(f"Error generating embeddings for a batch of {len(batch)} texts. Error: {e}")
+        return results
 
     def similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         return calculate_cosine_similarity(embedding1, embedding2)
 
+    def get_dimension(self) -> int:
+        self.load_model()
+        return self.model.config.hidden_size
+
 class EmbeddingFactory:
-    """Factory class to manage embedding models."""
+    """
+    Factory class to manage embedding models.
 
-    def __init__(self):
+    The factory is cheap to construct: the model weights are held by the process-wide model registry,
+    so every factory (one per service, one per request) shares the models loaded by the first one.
+    Computed embeddings are stored in the persistent embedding cache, so unchanged texts are not re-encoded.
+    """
+
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
         self.models: Dict[str, EmbeddingModel] = {
             "sbert": SBERTModel("sentence-transformers/paraphrase-multilingual-mpnet-base-v2"),
-            "mlongt5": MLongT5ModelWrapper("agemagician/mlong-t5-tglobal-base")
+            "mlongt5": MLongT5ModelWrapper("agemagician/mlong-t5-tglobal-base"),
+            "sbert-onnx": SBERTOnnxModel("sentence-transformers/paraphrase-multilingual-mpnet-base-v2"),
         }
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    @classmethod
+    def model_stats(cls) -> List[Dict]:
+        """Returns the load time and memory footprint of the models loaded in this process."""
+        return model_registry.stats()
+
+    @classmethod
+    def cache_stats(cls) -> Optional[Dict]:
+        """Returns the hit/miss counters of the embedding cache, or None when it is disabled."""
+        cache = get_embedding_cache()
+        return cache.stats() if cache else None
 
     @classmethod
     def all_embeddings(cls):
-        return ["sbert"]
+        return ["sbert", "sbert-onnx"]
 
     def get_model(self, model_name: str) -> EmbeddingModel:
         if model_name not in self.models:
@@ -177,17 +553,74 @@ class EmbeddingFactory:
         if model_name not in self.models:
             raise ValueError(f"Model '{model_name}' is not supported. Available models are: {list(self.models.keys())}")
 
+        model = self.models[model_name]
+        if model.device != device:
+            # the loaded model belongs to the previous device, reload it from the registry
+            model.device = device
+            model.model = None
         if not text:
-            return np.zeros(self.models[model_name].model.get_sentence_embedding_dimension())
+            model.load_model()
+            return np.zeros(model.get_dimension())
 
-        model = self.models[model_name]
-        model.device = device
-        return model.get_embedding(text, max_tokens_each_chunk)
+        if self.cache is None:
+            return model.get_embedding(text, max_tokens_each_chunk)
+
+        cache_model_name = model.cache_name()
+        embedding = self.cache.get(cache_model_name, max_tokens_each_chunk, text)
+        if embedding is None:
+            embedding = model.get_embedding(text, max_tokens_each_chunk)
+            if np.any(embedding):
+                self.cache.put(cache_model_name, max_tokens_each_chunk, text, embedding)
+        return embedding
 
     def get_embeddings_for_texts(self, texts: List[str], model_name: str = "sbert", max_tokens_each_chunk: int = 128,
-                                 device: str = "cpu") -> np.ndarray:
-        embeddings = [self.get_embedding(text, model_name, max_tokens_each_chunk, device) for text in texts]
-        return np.vstack(embeddings)
+                                 device: str = "cpu", batch_size: int = config.EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        """
+        Generate embeddings for several texts in batched forward passes.
+
+        Returns:
+            np.ndarray: A matrix of shape (len(texts), dimension); empty texts get zero vectors.
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model '{model_name}' is not supported. Available models are: {list(self.models.keys())}")
+
+        model = self.models[model_name]
+        if model.device != device:
+            model.device = device
+            model.model = None
+        texts = list(texts)
+        if self.cache is None or not texts:
+            return model.get_embeddings(texts, max_tokens_each_chunk, batch_size)
+
+        cache_model_name = model.cache_name()
+        # empty texts, e.g. the missing title of a webpage, are not looked up and get zero vectors
+        present = list(dict.fromkeys(text for text in texts if text))
+        cached = dict(zip(present, self.cache.get_many(cache_model_name, max_tokens_each_chunk, present))) \
+            if present else {}
+        # encode every distinct missing text once
+        missing = [text for text in present if cached[text] is None]
+        computed: Dict[str, np.ndarray] = {}
+        if missing:
+            missing_embeddings = model.get_embeddings(missing, max_tokens_each_chunk, batch_size)
+            computed = dict(zip(missing, missing_embeddings))
+            # failed encodings come back as zero vectors and must not be cached
+            stored = [text for text in missing if np.any(computed[text])]
+            self.cache.put_many(cache_model_name, max_tokens_each_chunk, stored, [computed[text] for text in stored])
+
+        known = [embedding for embedding in list(computed.values()) + list(cached.values()) if embedding is not None]
+        if known:
+            dimension = known[0].shape[-1]
+        else:
+            model.load_model()
+            dimension = model.get_dimension()
+        embeddings = np.zeros((len(texts), dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            embedding = cached[text] if cached[text] is not None else computed.get(text)
+            if embedding is not None:
+                embeddings[i] = embedding
+        return embeddings
 
 
 # Example usage
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core import config
+from .sqlite_lru_store import SqliteLruStore
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embedding vectors backed by SQLite.
+
+    Vectors are keyed by (model name, max tokens of each chunk, sha256 of the text), so the same
+    keyword, tag or boilerplate paragraph is embedded once no matter which subject or library it
+    appears in. The number of cached vectors is bounded; the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        self.store = SqliteLruStore(path, "embeddings", max_entries)
+
+    @property
+    def path(self) -> str:
+        return self.store.path
+
+    @staticmethod
+    def make_key(model_name: str, max_tokens_each_chunk: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{max_tokens_each_chunk}:{digest}"
+
+    def get_many(self, model_name: str, max_tokens_each_chunk: int,
+                 texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up the embeddings of several texts at once.
+
+        Args:
+            model_name (str): The embedding model name.
+            max_tokens_each_chunk (int): The chunk size the embeddings were computed with.
+            texts (Sequence[str]): The texts to look up.
+
+        Returns:
+            List[Optional[np.ndarray]]: The cached embedding of each text, or None when it is not cached.
+        """
+        vectors = self.store.get_many([self.make_key(model_name, max_tokens_each_chunk, text) for text in texts])
+        return [np.frombuffer(vector, dtype=np.float32).copy() if vector is not None else None for vector in vectors]
+
+    def put_many(self, model_name: str, max_tokens_each_chunk: int,
+                 texts: Sequence[str], embeddings: Sequence[np.ndarray]) -> None:
+        """
+        Store the embeddings of several texts, evicting the least recently used entries when the cache is full.
+
+        Args:
+            model_name (str): The embedding model name.
+            max_tokens_each_chunk (int): The chunk size the embeddings were computed with.
+            texts (Sequence[str]): The texts.
+            embeddings (Sequence[np.ndarray]): The embedding of each text.
+        """
+        self.store.put_many([(self.make_key(model_name, max_tokens_each_chunk, text), model_name,
+                              np.asarray(embedding, dtype=np.float32).tobytes())
+                             for text, embedding in zip(texts, embeddings)])
+
+    def get(self, model_name: str, max_tokens_each_chunk: int, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model_name, max_tokens_each_chunk, [text])[0]
+
+    def put(self, model_name: str, max_tokens_each_chunk: int, text: str, embedding: np.ndarray) -> None:
+        self.put_many(model_name, max_tokens_each_chunk, [text], [embedding])
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict:
+        """Returns the hit/miss counters and the number of cached vectors."""
+        return self.store.stats()
+
+    def close(self) -> None:
+        self.store.close()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide embedding cache, or None when it is disabled by EMBEDDING_CACHE_ENABLED.
+    """
+    global _embedding_cache
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(config.EMBEDDING_CACHE_PATH, config.EMBEDDING_CACHE_MAX_ENTRIES)
+    return _embedding_cache
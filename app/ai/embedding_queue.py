@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core import config
+from core.extends_logger import logger
+
+
+class _EmbeddingRequest:
+    __slots__ = ("text", "model_name", "max_tokens_each_chunk", "future")
+
+    def __init__(self, text: str, model_name: str, max_tokens_each_chunk: int, future: asyncio.Future):
+        self.text = text
+        self.model_name = model_name
+        self.max_tokens_each_chunk = max_tokens_each_chunk
+        self.future = future
+
+
+class EmbeddingBatcher:
+    """
+    Asyncio-facing embedding service that micro-batches concurrent requests.
+
+    Callers await `embed()`; requests arriving within `max_wait_ms` of each other are collected and
+    encoded as one batch by `EmbeddingFactory.get_embeddings_for_texts` in a dedicated worker thread,
+    so the event loop is never blocked by a forward pass and concurrent chat traffic shares batches.
+    """
+
+    def __init__(self, factory=None,
+                 max_batch_size: int = config.EMBEDDING_QUEUE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = config.EMBEDDING_QUEUE_MAX_WAIT_MS):
+        self._factory = factory
+        self._factory_lock = threading.Lock()
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-batcher")
+        # one queue and collector task per event loop, asyncio primitives cannot be shared between loops
+        self._queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Queue]" = weakref.WeakKeyDictionary()
+        self._collectors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+        self.requests = 0
+        self.batches = 0
+        self.max_observed_batch = 0
+
+    @property
+    def factory(self):
+        if self._factory is None:
+            with self._factory_lock:
+                if self._factory is None:
+                    from .embedding import EmbeddingFactory
+                    self._factory = EmbeddingFactory()
+        return self._factory
+
+    async def embed(self, text: str, model_name: str = "sbert", max_tokens_each_chunk: int = 128) -> np.ndarray:
+        """
+        Embed a text, sharing the forward pass with the other requests queued at the same time.
+
+        Args:
+            text (str): The text to embed.
+            model_name (str): The embedding model name.
+            max_tokens_each_chunk (int): The maximum number of tokens of each chunk.
+
+        Returns:
+            np.ndarray: The embedding of the text.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._get_queue(loop).put_nowait(_EmbeddingRequest(text, model_name, max_tokens_each_chunk, future))
+        return await future
+
+    def _get_queue(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        queue = self._queues.get(loop)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[loop] = queue
+        collector = self._collectors.get(loop)
+        if collector is None or collector.done():
+            self._collectors[loop] = loop.create_task(self._collect(queue))
+        return queue
+
+    async def _collect(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[_EmbeddingRequest] = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # take whatever queued up meanwhile without waiting any longer
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            await self._encode(loop, batch)
+
+    async def _encode(self, loop: asyncio.AbstractEventLoop, batch: List[_EmbeddingRequest]) -> None:
+        groups: Dict[Tuple[str, int], List[_EmbeddingRequest]] = {}
+        for request in batch:
+            if not request.future.cancelled():
+                groups.setdefault((request.model_name, request.max_tokens_each_chunk), []).append(request)
+
+        for (model_name, max_tokens_each_chunk), requests in groups.items():
+            self.requests += len(requests)
+            self.batches += 1
+            self.max_observed_batch = max(self.max_observed_batch, len(requests))
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor,
+                    lambda: self.factory.get_embeddings_for_texts(
+                        texts=[request.text for request in requests],
+                        model_name=model_name,
+                        max_tokens_each_chunk=max_tokens_each_chunk,
+                    )
+                )
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(requests)} texts: {e}")
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            for request, embedding in zip(requests, embeddings):
+                if not request.future.done():
+                    request.future.set_result(embedding)
+
+    def stats(self) -> Dict:
+        """Returns the number of requests and batches encoded so far."""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_observed_batch,
+        }
+
+
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+_embedding_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Returns the process-wide embedding batcher."""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        with _embedding_batcher_lock:
+            if _embedding_batcher is None:
+                _embedding_batcher = EmbeddingBatcher()
+    return _embedding_batcher
@@ -0,0 +1,90 @@
+"""
+Shared HTTP clients of the LLM integrations.
+
+Every LLM call used to open its own connection (and TLS handshake). The clients below keep
+connections alive and are shared by all LLM instances, bounded by LLM_HTTP_MAX_CONNECTIONS.
+The async client is created once per event loop, since its connections are bound to the loop,
+and speaks HTTP/2 when LLM_HTTP2 is enabled and the h2 package is installed.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+from core import config
+
+_lock = threading.Lock()
+_sync_client = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=config.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client() -> Any:
+    """Returns the process-wide httpx.Client shared by the LLM integrations."""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                import httpx
+                _sync_client = httpx.Client(timeout=config.LLM_TIMEOUT, limits=http_limits())
+    return _sync_client
+
+
+def http2_available() -> bool:
+    """Returns whether the async client negotiates HTTP/2, which needs the h2 package."""
+    if not config.LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_async_http_client() -> Any:
+    """Returns the httpx.AsyncClient of the running event loop shared by the LLM integrations."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+        client = httpx.AsyncClient(timeout=config.LLM_TIMEOUT, limits=http_limits(), http2=http2_available())
+        _async_clients[loop] = client
+    return client
+
+
+def http_client_stats() -> Dict[str, Optional[int]]:
+    """Returns the connection limits of the shared clients."""
+    return {
+        "max_connections": config.LLM_HTTP_MAX_CONNECTIONS,
+        "max_keepalive_connections": config.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": config.LLM_HTTP_KEEPALIVE_EXPIRY,
+        "http2": http2_available(),
+        "sync_client_started": _sync_client is not None,
+        "async_clients": len(_async_clients),
+    }
+
+
+def close_http_clients() -> None:
+    """Closes the shared clients, called on application shutdown."""
+    global _sync_client
+    with _lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+async def aclose_http_clients() -> None:
+    """Closes the shared clients, including the async client of the running event loop."""
+    close_http_clients()
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
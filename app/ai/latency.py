@@ -0,0 +1,153 @@
+"""
+Latency tracking of the LLM calls and hedged requests.
+
+Every model keeps a window of its recent latencies, and a window per kind of request (e.g. the
+"llama3.1:summary" window of the summaries), whose latencies depend on their prompt sizes. A hedged
+call waits for the primary model up to a quantile of the window of its kind; when the primary is slower than usual, the same request is sent to a
+secondary model and whichever answers first wins, which trades a few extra calls for a much lower
+tail latency of interactive requests.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from core import config
+from core.extends_logger import logger
+
+# upper bounds in seconds of the latency histogram buckets
+HISTOGRAM_BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+
+
+class LatencyTracker:
+    """Keeps the recent latencies, a latency histogram and the hedging counters of each model."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._histograms: Dict[str, List[int]] = {}
+        self._hedges: Dict[str, int] = {}
+        self._hedge_wins: Dict[str, int] = {}
+
+    def observe(self, model_name: str, seconds: float) -> None:
+        """Records the latency of a successful call."""
+        with self._lock:
+            latencies = self._latencies.setdefault(model_name, deque(maxlen=self.window))
+            latencies.append(seconds)
+            histogram = self._histograms.setdefault(model_name, [0] * (len(HISTOGRAM_BUCKETS) + 1))
+            histogram[bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+
+    @staticmethod
+    def _pick(latencies: List[float], q: float) -> float:
+        return latencies[min(len(latencies) - 1, max(0, int(round(q * (len(latencies) - 1)))))]
+
+    def quantile(self, model_name: str, q: float) -> Optional[float]:
+        """
+        Returns the q-quantile of the recent latencies of a model.
+
+        Args:
+            model_name (str): The model name.
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            Optional[float]: The latency in seconds, or None while there are fewer than min_samples latencies.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(model_name, ()))
+        if len(latencies) < max(1, self.min_samples):
+            return None
+        return self._pick(latencies, q)
+
+    def record_hedge(self, model_name: str, secondary_won: bool) -> None:
+        with self._lock:
+            self._hedges[model_name] = self._hedges.get(model_name, 0) + 1
+            if secondary_won:
+                self._hedge_wins[model_name] = self._hedge_wins.get(model_name, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the latency quantiles, histogram and hedging counters of each model."""
+        result = {}
+        with self._lock:
+            for model_name, window in self._latencies.items():
+                latencies = sorted(window)
+                result[model_name] = {
+                    "samples": len(latencies),
+                    "p50": round(self._pick(latencies, 0.5), 4),
+                    "p90": round(self._pick(latencies, 0.9), 4),
+                    "p99": round(self._pick(latencies, 0.99), 4),
+                    "histogram": {f"le_{bound}": count for bound, count in
+                                  zip(HISTOGRAM_BUCKETS + ["inf"], self._histograms[model_name])},
+                    "hedges": self._hedges.get(model_name, 0),
+                    "hedge_wins": self._hedge_wins.get(model_name, 0),
+                }
+        return result
+
+
+latency_tracker = LatencyTracker(config.LLM_LATENCY_WINDOW, config.LLM_HEDGE_MIN_SAMPLES)
+
+
+def latency_key(model_name: str, kind: str = "") -> str:
+    """Returns the key of the latency window of a kind of request to a model, the model name for any request."""
+    return f"{model_name}:{kind}" if kind else model_name
+
+
+async def timed_call(model_name: str, call: Callable[[str], Awaitable[Any]],
+                     tracker: LatencyTracker = latency_tracker, kind: str = "") -> Any:
+    """Awaits call(model_name) and records its latency under the window of its kind when it succeeds."""
+    start = time.monotonic()
+    result = await call(model_name)
+    tracker.observe(latency_key(model_name, kind), time.monotonic() - start)
+    return result
+
+
+async def hedged_call(call: Callable[[str], Awaitable[Any]], primary: str, secondary: Optional[str],
+                      quantile: float, tracker: LatencyTracker = latency_tracker, kind: str = "") -> Any:
+    """
+    Calls the primary model and, when it is slower than the quantile of its recent latency, the secondary too.
+
+    Args:
+        call (Callable[[str], Awaitable[Any]]): Sends the request to the model of the given name.
+        primary (str): The primary model name.
+        secondary (Optional[str]): The model the request is hedged to; None or the primary disables hedging.
+        quantile (float): The quantile of the primary latency after which the request is hedged, e.g. 0.9.
+        tracker (LatencyTracker): The latency tracker of the models.
+        kind (str): The kind of request, whose latencies are tracked apart from the other requests to the models.
+
+    Returns:
+        Any: The result of the first model that answered successfully.
+    """
+    primary_key = latency_key(primary, kind)
+    delay = tracker.quantile(primary_key, quantile) if secondary and secondary != primary else None
+    primary_task = asyncio.ensure_future(timed_call(primary, call, tracker, kind))
+    if delay is None:
+        return await primary_task
+
+    secondary_task = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            return primary_task.result()
+
+        logger.debug(f"LLM {primary} has not answered within {delay:.2f}s, hedging to {secondary}")
+        secondary_task = asyncio.ensure_future(timed_call(secondary, call, tracker, kind))
+        pending = {primary_task, secondary_task}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    tracker.record_hedge(primary_key, secondary_won=task is secondary_task)
+                    return task.result()
+                error = task.exception()
+                logger.warning(f"Hedged LLM call to {primary if task is primary_task else secondary} failed: {error}")
+        tracker.record_hedge(primary_key, secondary_won=False)
+        raise error
+    finally:
+        for task in (primary_task, secondary_task):
+            if task is not None and not task.done():
+                task.cancel()
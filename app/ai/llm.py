@@ -1,25 +1,37 @@
+import asyncio
 import json
-from typing import List, Dict, Optional, AsyncGenerator, Union
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Dict, Optional, AsyncGenerator, Tuple, Union
 
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.summarize import load_summarize_chain
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import Document
-from langchain_community.llms.tongyi import Tongyi
+from langchain_core.documents import Document
 from langchain_core.messages import BaseMessage
-from langchain_core.prompts import PromptTemplate
-from langchain_openai import OpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_deepseek import ChatDeepSeek
-from langchain_ollama import OllamaLLM
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 
 from core.extends_logger import logger
 from core.i18n import _
 from core import config
-from .doubao_llm import DouBao
+from .chunking import group_texts_by_tokens
+from .http_clients import get_http_client, http_limits
+from .latency import hedged_call, latency_tracker
+from .llm_cache import LlmResponseCache, get_llm_cache
+from .rate_limiter import get_rate_limiter, is_overload_error, rate_limiter_stats
+from .token_budget import count_tokens, fit_texts, prompt_budget, token_usage, truncate_text
+
+# The provider integrations and langchain chains are imported where they are used:
+# importing all of them takes seconds and most requests never touch an LLM.
 
 
 class Llm:
+    # LLM instances keyed by (model name, parameters), shared by every call and coroutine so that
+    # their HTTP clients keep connections alive. The least recently used instances are dropped.
+    _client_pool: "OrderedDict[Tuple, Any]" = OrderedDict()
+    _client_pool_lock = threading.Lock()
+    _client_pool_hits = 0
+    _client_pool_misses = 0
+
     @classmethod
     def all_llms(cls) -> List[str]:
         """Returns a list of all supported LLM names."""
@@ -54,53 +66,145 @@ class Llm:
         return model_info.get(llm_name, "Unknown model.")
 
     @classmethod
-    def retrieve_llm_by_name(cls, llm_name: str, **kwargs) -> Optional[object]:
-        """Retrieves an LLM instance by name with optional parameters."""
-        if llm_name not in cls.all_llms():
-            logger.warning(f"Model {llm_name} not found. Defaulting to {cls.all_llms()[0]}.")
-            llm_name = cls.all_llms()[0]
+    def get_provider(cls, llm_name: str) -> str:
+        """Returns the provider serving the specified LLM, which shares rate limits across its models."""
+        if llm_name.startswith("gpt-"):
+            return "openai"
+        if llm_name.startswith("claude"):
+            return "anthropic"
+        if llm_name == "deepseek":
+            return "deepseek"
+        if llm_name.startswith("qwen-"):
+            return "dashscope"
+        if llm_name.startswith("Doubao-"):
+            return "doubao"
+        return "ollama"
+
+    @classmethod
+    def rate_limiter_stats(cls) -> Dict:
+        """Returns the queue depth, limits and outcome counters of the rate limiter of each provider."""
+        return rate_limiter_stats()
+
+    @classmethod
+    def _client_pool_key(cls, llm_name: str, params: Dict) -> Tuple:
+        return (llm_name,) + tuple(sorted((key, repr(value)) for key, value in params.items()))
 
+    @classmethod
+    def client_pool_stats(cls) -> Dict:
+        """Returns the size and hit/miss counters of the LLM client pool."""
+        return {
+            "size": len(cls._client_pool),
+            "max_size": config.LLM_CLIENT_POOL_SIZE,
+            "hits": cls._client_pool_hits,
+            "misses": cls._client_pool_misses,
+            "clients": [key[0] for key in cls._client_pool.keys()],
+        }
+
+    @classmethod
+    def clear_client_pool(cls) -> None:
+        with cls._client_pool_lock:
+            cls._client_pool.clear()
+
+    @classmethod
+    def _llm_params(cls, **kwargs) -> Dict[str, Any]:
         default_params = {
             "top_p": 0.5,
             "temperature": 0.7,
             "n": 1,
         }
-        params = {**default_params, **kwargs}
+        return {**default_params, **kwargs}
+
+    @classmethod
+    def retrieve_llm_by_name(cls, llm_name: str, **kwargs) -> Optional[object]:
+        """
+        Retrieves an LLM instance by name with optional parameters.
 
+        Instances are pooled by model name and parameters, so repeated calls reuse the same client
+        and its keep-alive connections instead of constructing a new one per call.
+        """
+        if llm_name not in cls.all_llms():
+            logger.warning(f"Model {llm_name} not found. Defaulting to {cls.all_llms()[0]}.")
+            llm_name = cls.all_llms()[0]
+
+        params = cls._llm_params(**kwargs)
+
+        key = cls._client_pool_key(llm_name, params)
+        with cls._client_pool_lock:
+            llm = cls._client_pool.get(key)
+            if llm is not None:
+                cls._client_pool.move_to_end(key)
+                cls._client_pool_hits += 1
+                return llm
+
+        llm = cls._create_llm(llm_name, params)
+        if llm is None:
+            return None
+
+        with cls._client_pool_lock:
+            cls._client_pool_misses += 1
+            # another coroutine or thread may have created the same client meanwhile, keep the first one
+            llm = cls._client_pool.setdefault(key, llm)
+            cls._client_pool.move_to_end(key)
+            while len(cls._client_pool) > max(1, config.LLM_CLIENT_POOL_SIZE):
+                cls._client_pool.popitem(last=False)
+        return llm
+
+    @classmethod
+    def _create_llm(cls, llm_name: str, params: Dict) -> Optional[object]:
+        """Creates a new LLM instance, sharing the keep-alive HTTP client where the integration supports it."""
         try:
             if llm_name == "gpt-4o":
-                return OpenAI(model="gpt-4o", api_key=config.OPENAI_API_KEY, request_timeout=60, **params)
+                from langchain_openai import OpenAI
+                return OpenAI(model="gpt-4o", api_key=config.OPENAI_API_KEY, request_timeout=60,
+                              http_client=get_http_client(), **params)
             elif llm_name == "gpt-4-turbo":
-                return OpenAI(model="gpt-4-turbo", api_key=config.OPENAI_API_KEY, request_timeout=60, **params)
+                from langchain_openai import OpenAI
+                return OpenAI(model="gpt-4-turbo", api_key=config.OPENAI_API_KEY, request_timeout=60,
+                              http_client=get_http_client(), **params)
             elif llm_name == "gpt-4":
-                return OpenAI(model="gpt-4", api_key=config.OPENAI_API_KEY, request_timeout=60, **params)
+                from langchain_openai import OpenAI
+                return OpenAI(model="gpt-4", api_key=config.OPENAI_API_KEY, request_timeout=60,
+                              http_client=get_http_client(), **params)
             elif llm_name == "claude3.5-sonnet":
+                from langchain_anthropic import ChatAnthropic
                 return ChatAnthropic(model="claude-3-5-sonnet-latest", api_key=config.ANTHROPIC_API_KEY, default_request_timeout=60, **params)
             elif llm_name == "claude3.5-haiku":
+                from langchain_anthropic import ChatAnthropic
                 return ChatAnthropic(model="claude-3-5-haiku-latest", api_key=config.ANTHROPIC_API_KEY, default_request_timeout=60, **params)
             elif llm_name == "claude3-opus":
+                from langchain_anthropic import ChatAnthropic
                 return ChatAnthropic(model="claude-3-opus-latest", api_key=config.ANTHROPIC_API_KEY, default_request_timeout=60, **params)
             elif llm_name == "deepseek":
+                from langchain_deepseek import ChatDeepSeek
                 return ChatDeepSeek(
                             model='deepseek-chat', 
                             openai_api_key=config.DEEPSEEK_API_KEY, 
                             request_timeout=60,
+                            http_client=get_http_client(),
                             **params
                         )
             elif llm_name == "qwen-plus":
+                from langchain_community.llms.tongyi import Tongyi
                 return Tongyi(model="qwen-plus", api_key=config.DASHSCOPE_API_KEY, **params)
             elif llm_name == "qwen-max":
+                from langchain_community.llms.tongyi import Tongyi
                 return Tongyi(model="qwen-max", api_key=config.DASHSCOPE_API_KEY, **params)
             elif llm_name == "Doubao-1.5-pro-32k":
-                return DouBao(model=config.DOUBAO_1_5_PRO_32K_MODEL, **params)
+                from .doubao_llm import DouBao
+                return DouBao(model=config.DOUBAO_1_5_PRO_32K_MODEL, http_client=get_http_client(), **params)
             elif llm_name == "Doubao-1.5-pro-256k":
-                return DouBao(model=config.DOUBAO_1_5_PRO_256K_MODEL, **params)
+                from .doubao_llm import DouBao
+                return DouBao(model=config.DOUBAO_1_5_PRO_256K_MODEL, http_client=get_http_client(), **params)
             elif llm_name == "Doubao-1.5-lite-32k":
-                return DouBao(model=config.DOUBAO_1_5_LITE_32K_MODEL, **params)
+                from .doubao_llm import DouBao
+                return DouBao(model=config.DOUBAO_1_5_LITE_32K_MODEL, http_client=get_http_client(), **params)
             elif llm_name == "Doubao-pro-32k":
-                return DouBao(model=config.DOUBAO_PRO_32K_MODEL, **params)
+                from .doubao_llm import DouBao
+                return DouBao(model=config.DOUBAO_PRO_32K_MODEL, http_client=get_http_client(), **params)
             else:
-                return OllamaLLM(base_url=config.OLLAMA_ENDPOINT, model=llm_name, num_predict=8192, **params)
+                from langchain_ollama import OllamaLLM
+                return OllamaLLM(base_url=config.OLLAMA_ENDPOINT, model=llm_name, num_predict=8192,
+                                 num_ctx=config.OLLAMA_NUM_CTX, client_kwargs={"limits": http_limits()}, **params)
         except Exception as e:
             logger.error(f"Failed to load model {llm_name}: {e}")
             return None
@@ -120,149 +224,320 @@ class Llm:
         return ""
 
     @classmethod
-    def get_ai_response(cls, user_message: str, llm_name: str) -> str:
+    def parse_json_response(cls, ai_message: str | BaseMessage) -> Optional[Any]:
+        """Extracts and decodes the JSON result of the AI response."""
+        json_str = cls.parse_json_data(ai_message)
+        return json.loads(json_str) if json_str else None
+
+    @staticmethod
+    def _message_text(ai_message: str | BaseMessage) -> str:
+        if isinstance(ai_message, BaseMessage):
+            return ai_message.content
+        return ai_message
+
+    @classmethod
+    def response_cache_stats(cls) -> Optional[Dict]:
+        """Returns the hit/miss counters of the LLM response cache, or None when it is disabled."""
+        cache = get_llm_cache()
+        return cache.stats() if cache else None
+
+    @classmethod
+    def _lookup_response(cls, llm_name: str, prompt_text: str,
+                         use_cache: bool) -> Tuple[Optional[LlmResponseCache], Optional[str], Optional[str]]:
+        cache = get_llm_cache() if use_cache else None
+        if cache is None:
+            return None, None, None
+        key = cache.make_key(llm_name, cls._llm_params(), prompt_text)
+        return cache, key, cache.get(key)
+
+    @classmethod
+    def _parse_and_store(cls, text: str, parse: Optional[Callable[[str], Any]],
+                         cache: Optional[LlmResponseCache], key: Optional[str], llm_name: str) -> Any:
+        result = parse(text) if parse else text
+        # only responses that parse are cached, a malformed answer is asked again next time
+        if cache is not None and result:
+            cache.put(key, llm_name, text)
+        return result
+
+    @classmethod
+    def token_usage_stats(cls) -> Dict:
+        """Returns the calls, estimated tokens, truncations and cost of each LLM."""
+        return token_usage.stats()
+
+    @classmethod
+    def _render_within_budget(cls, llm_name: str, prompt: Any, inputs: Dict) -> Tuple[Any, int, bool]:
+        """
+        Renders a prompt, truncating its largest text inputs until it fits the prompt budget of the LLM.
+
+        Args:
+            llm_name (str): The name of the LLM to use.
+            prompt (Any): The prompt template.
+            inputs (Dict): The variables of the prompt template.
+
+        Returns:
+            Tuple[Any, int, bool]: The prompt value, its tokens and whether an input was truncated.
+        """
+        prompt_value = prompt.invoke(inputs)
+        tokens = count_tokens(prompt_value.to_string(), llm_name)
+        budget = prompt_budget(llm_name)
+        truncated = False
+        # the template itself is not truncated, a few rounds are enough to fit the inputs
+        for _round in range(3):
+            if not config.LLM_TOKEN_BUDGET_ENABLED or tokens <= budget:
+                break
+            texts = {name: value for name, value in inputs.items() if isinstance(value, str) and value}
+            if not texts:
+                break
+            name = max(texts, key=lambda key: len(texts[key]))
+            input_budget = count_tokens(texts[name], llm_name) - (tokens - budget)
+            logger.warning(f"Prompt of {tokens} tokens exceeds the budget of {budget} tokens of {llm_name}, "
+                           f"truncating {name}")
+            inputs = {**inputs, name: truncate_text(texts[name], max(0, input_budget), llm_name)}
+            prompt_value = prompt.invoke(inputs)
+            tokens = count_tokens(prompt_value.to_string(), llm_name)
+            truncated = True
+        return prompt_value, tokens, truncated
+
+    @classmethod
+    def _fit_documents(cls, documents: List[Document], llm_name: str, template: str) -> List[Document]:
+        """Keeps the most recent documents of a history that fit the prompt budget of the LLM with the template."""
+        if not config.LLM_TOKEN_BUDGET_ENABLED:
+            return documents
+        budget = prompt_budget(llm_name) - count_tokens(template, llm_name)
+        texts = [document.page_content for document in documents]
+        fitted = fit_texts(texts, budget, llm_name)
+        if len(fitted) == len(texts) and fitted[-1:] == texts[-1:]:
+            return documents
+        logger.warning(f"Message history exceeds the budget of {budget} tokens of {llm_name}, "
+                       f"keeping the {len(fitted)} most recent of {len(texts)} messages")
+        return [Document(page_content=text) for text in fitted]
+
+    @classmethod
+    def _invoke(cls, llm_name: str, prompt: Any, inputs: Dict, parse: Optional[Callable[[str], Any]] = None,
+                use_cache: bool = True) -> Any:
+        """
+        Renders the prompt, sends it to the LLM through the rate limiter of its provider and parses the
+        response, going through the response cache.
+
+        Args:
+            llm_name (str): The name of the LLM to use.
+            prompt (Any): The prompt template, e.g. a PromptTemplate or ChatPromptTemplate.
+            inputs (Dict): The variables of the prompt template.
+            parse (Optional[Callable[[str], Any]]): Parses the response text, e.g. parse_json_response.
+            use_cache (bool): Whether to look the response up in and store it to the response cache.
+
+        Returns:
+            Any: The parsed response, or None when the LLM is not available.
+        """
+        llm = cls.retrieve_llm_by_name(llm_name)
+        if not llm:
+            return None
+
+        prompt_value, tokens, truncated = cls._render_within_budget(llm_name, prompt, inputs)
+        cache, key, cached = cls._lookup_response(llm_name, prompt_value.to_string(), use_cache)
+        if cached is not None:
+            return parse(cached) if parse else cached
+
+        text = cls._invoke_with_limits(llm, llm_name, prompt_value, tokens)
+        token_usage.record(llm_name, tokens, count_tokens(text, llm_name), truncated)
+        return cls._parse_and_store(text, parse, cache, key, llm_name)
+
+    @classmethod
+    async def _ainvoke(cls, llm_name: str, prompt: Any, inputs: Dict, parse: Optional[Callable[[str], Any]] = None,
+                       use_cache: bool = True) -> Any:
+        """Asynchronous version of _invoke."""
+        llm = cls.retrieve_llm_by_name(llm_name)
+        if not llm:
+            return None
+
+        prompt_value, tokens, truncated = cls._render_within_budget(llm_name, prompt, inputs)
+        cache, key, cached = cls._lookup_response(llm_name, prompt_value.to_string(), use_cache)
+        if cached is not None:
+            return parse(cached) if parse else cached
+
+        text = await cls._ainvoke_with_limits(llm, llm_name, prompt_value, tokens)
+        token_usage.record(llm_name, tokens, count_tokens(text, llm_name), truncated)
+        return cls._parse_and_store(text, parse, cache, key, llm_name)
+
+    @classmethod
+    def _invoke_with_limits(cls, llm: Any, llm_name: str, prompt_value: Any, tokens: Optional[int] = None) -> str:
+        """
+        Synchronous version of _ainvoke_with_limits, for the calls made from worker threads.
+
+        A call that exceeds LLM_TIMEOUT is abandoned in its thread and fails as a timeout.
+        """
+        limiter = get_rate_limiter(llm_name, cls.get_provider(llm_name))
+        if tokens is None:
+            tokens = count_tokens(prompt_value.to_string(), llm_name)
+        for attempt in range(config.LLM_RATE_LIMIT_RETRIES + 1):
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-call")
+            try:
+                with limiter.limit_sync(tokens):
+                    start = time.monotonic()
+                    try:
+                        ai_message = executor.submit(llm.invoke, prompt_value).result(timeout=config.LLM_TIMEOUT)
+                    except FutureTimeoutError:
+                        # a distinct class before Python 3.11, raised as the builtin for is_overload_error
+                        raise TimeoutError(f"LLM {llm_name} did not answer within {config.LLM_TIMEOUT}s")
+                    latency_tracker.observe(llm_name, time.monotonic() - start)
+                return cls._message_text(ai_message)
+            except Exception as e:
+                if attempt >= config.LLM_RATE_LIMIT_RETRIES or not is_overload_error(e):
+                    raise
+                logger.warning(f"LLM {llm_name} is overloaded, retrying "
+                               f"({attempt + 1}/{config.LLM_RATE_LIMIT_RETRIES}): {e!r}")
+            finally:
+                executor.shutdown(wait=False)
+
+    @classmethod
+    async def _ainvoke_with_limits(cls, llm: Any, llm_name: str, prompt_value: Any,
+                                   tokens: Optional[int] = None) -> str:
+        """
+        Calls the LLM through the rate limiter of its provider, retrying when the provider is overloaded.
+
+        LLM_TIMEOUT applies to each attempt, not to the time spent waiting for the limiter.
+        """
+        limiter = get_rate_limiter(llm_name, cls.get_provider(llm_name))
+        if tokens is None:
+            tokens = count_tokens(prompt_value.to_string(), llm_name)
+        for attempt in range(config.LLM_RATE_LIMIT_RETRIES + 1):
+            try:
+                async with limiter.limit(tokens):
+                    start = time.monotonic()
+                    ai_message = await asyncio.wait_for(llm.ainvoke(prompt_value), timeout=config.LLM_TIMEOUT)
+                    latency_tracker.observe(llm_name, time.monotonic() - start)
+                return cls._message_text(ai_message)
+            except Exception as e:
+                if attempt >= config.LLM_RATE_LIMIT_RETRIES or not is_overload_error(e):
+                    raise
+                logger.warning(f"LLM {llm_name} is overloaded, retrying "
+                               f"({attempt + 1}/{config.LLM_RATE_LIMIT_RETRIES}): {e!r}")
+
+    @classmethod
+    def get_ai_response(cls, user_message: str, llm_name: str, use_cache: bool = True) -> str:
         """Gets a response from the specified LLM."""
         if not user_message:
             return ""
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return ""
-
-            prompt = PromptTemplate.from_template("{input}")
-            llm_chain = prompt | llm
-            ai_message = llm_chain.invoke({"input": user_message.strip()})
-            if isinstance(ai_message, BaseMessage):
-                return ai_message.content
-            return ai_message
+            ai_message = cls._invoke(llm_name, PromptTemplate.from_template("{input}"),
+                                     {"input": user_message.strip()}, use_cache=use_cache)
+            return ai_message or ""
         except Exception as e:
             logger.error(f"Failed to get AI response: {e}")
             return ""
 
     @classmethod
-    async def get_ai_response_async(cls, user_message: str, llm_name: str) -> str:
+    async def get_ai_response_async(cls, user_message: str, llm_name: str, use_cache: bool = True) -> str:
         """Gets a response from the specified LLM asynchronously."""
         if not user_message:
             return ""
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return ""
-
-            prompt = PromptTemplate.from_template("{input}")
-            llm_chain = prompt | llm
-            ai_message = await llm_chain.ainvoke({"input": user_message.strip()})
-            if isinstance(ai_message, BaseMessage):
-                return ai_message.content
-            return ai_message
+            ai_message = await cls._ainvoke(llm_name, PromptTemplate.from_template("{input}"),
+                                            {"input": user_message.strip()}, use_cache=use_cache)
+            return ai_message or ""
         except Exception as e:
             logger.error(f"Failed to get AI response asynchronously: {e}")
             return ""
 
     @classmethod
-    def get_ai_json_response(cls, user_message: str, llm_name: str) -> Optional[Dict]:
+    def get_ai_json_response(cls, user_message: str, llm_name: str, use_cache: bool = True) -> Optional[Dict]:
         """Gets a JSON response from the specified LLM."""
         if not user_message:
             return None
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return None
-
-            prompt = PromptTemplate.from_template("{input}")
-            llm_chain = prompt | llm | cls.parse_json_data
-            ai_response = llm_chain.invoke({"input": user_message.strip()})
-            return json.loads(ai_response) if ai_response else None
+            return cls._invoke(llm_name, PromptTemplate.from_template("{input}"), {"input": user_message.strip()},
+                               parse=cls.parse_json_response, use_cache=use_cache)
         except Exception as e:
             logger.error(f"Failed to get AI JSON response: {e}")
             return None
 
     @classmethod
-    def generate_prompts_from_text(cls, text: str, llm_name: str) -> Optional[List]:
+    async def get_ai_json_response_async(cls, user_message: str, llm_name: str,
+                                         use_cache: bool = True) -> Optional[Dict]:
+        """Gets a JSON response from the specified LLM asynchronously."""
+        if not user_message:
+            return None
+
+        try:
+            return await cls._ainvoke(llm_name, PromptTemplate.from_template("{input}"),
+                                      {"input": user_message.strip()},
+                                      parse=cls.parse_json_response, use_cache=use_cache)
+        except Exception as e:
+            logger.error(f"Failed to get AI JSON response asynchronously: {e}")
+            return None
+
+    @classmethod
+    def generate_prompts_from_text(cls, text: str, llm_name: str, use_cache: bool = True) -> Optional[List]:
         """Generates prompts from the given text."""
         if not text:
             return []
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return []
-
             prompt = ChatPromptTemplate.from_messages([
                 ("system", _("System prompt for generate_prompts_from_text")),
                 ("user", _("User prompt for generate_prompts_from_text")),
             ])
-            llm_chain = prompt | llm | cls.parse_json_data
-            prompts = llm_chain.invoke({"input": text, "count": 3})
-            return json.loads(prompts) if prompts else []
+            prompts = cls._invoke(llm_name, prompt, {"input": text, "count": 3},
+                                  parse=cls.parse_json_response, use_cache=use_cache)
+            return prompts or []
         except Exception as e:
             logger.error(f"Failed to generate prompts: {e}")
             return []
 
     @classmethod
-    async def generate_prompts_from_text_async(cls, text: str, llm_name: str) -> Optional[List]:
+    async def generate_prompts_from_text_async(cls, text: str, llm_name: str,
+                                               use_cache: bool = True) -> Optional[List]:
         if not text:
             return []
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return []
-
             prompt = ChatPromptTemplate.from_messages([
                 ("system", _("System prompt for generate_prompts_from_text")),
                 ("user", _("User prompt for generate_prompts_from_text")),
             ])
-            llm_chain = prompt | llm | cls.parse_json_data
-            prompts = await llm_chain.ainvoke({"input": text, "count": 3})
-            return json.loads(prompts) if prompts else []
+            prompts = await cls._ainvoke(llm_name, prompt, {"input": text, "count": 3},
+                                         parse=cls.parse_json_response, use_cache=use_cache)
+            return prompts or []
         except Exception as e:
             logger.error(f"Failed to generate prompts: {e}")
             return []
 
     @classmethod
-    def generate_questions_from_text(cls, text: str, llm_name: str) -> Optional[List]:
+    def generate_questions_from_text(cls, text: str, llm_name: str, use_cache: bool = True) -> Optional[List]:
         """Generates questions from the given text."""
         if not text:
             return []
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return []
-
             prompt = ChatPromptTemplate.from_messages([
                 ("system", _("System prompt for generate question")),
                 ("user", _("User prompt for generate question")),
             ])
-            llm_chain = prompt | llm | cls.parse_json_data
-            questions = llm_chain.invoke({"input": text, "count": 3})
-            return json.loads(questions) if questions else []
+            questions = cls._invoke(llm_name, prompt, {"input": text, "count": 3},
+                                    parse=cls.parse_json_response, use_cache=use_cache)
+            return questions or []
         except Exception as e:
             logger.error(f"Failed to generate questions: {e}")
             return []
 
     @classmethod
-    async def generate_questions_from_text_async(cls, text: str, llm_name: str) -> Optional[List]:
+    async def generate_questions_from_text_async(cls, text: str, llm_name: str,
+                                                 use_cache: bool = True) -> Optional[List]:
         """Generates questions from the given text."""
         if not text:
             return []
 
         try:
-            llm = cls.retrieve_llm_by_name(llm_name)
-            if not llm:
-                return []
-
             prompt = ChatPromptTemplate.from_messages([
                 ("system", _("System prompt for generate question")),
                 ("user", _("User prompt for generate question")),
             ])
-            llm_chain = prompt | llm | cls.parse_json_data
-            questions = await llm_chain.invoke({"input": text, "count": 3})
-            return json.loads(questions) if questions else []
+            questions = await cls._ainvoke(llm_name, prompt, {"input": text, "count": 3},
+                                           parse=cls.parse_json_response, use_cache=use_cache)
+            return questions or []
         except Exception as e:
             logger.error(f"Failed to generate questions: {e}")
             return []
@@ -275,6 +550,8 @@ class Llm:
             if not llm:
                 return None
 
+            from langchain.chains.combine_documents import create_stuff_documents_chain
+
             prompt = ChatPromptTemplate.from_template(_("System prompt for summarize documents"))
             llm_chain = create_stuff_documents_chain(llm, prompt)
             final_chain = llm_chain | cls.parse_json_data
@@ -292,6 +569,8 @@ class Llm:
             if not llm:
                 return None
 
+            from langchain.chains.combine_documents import create_stuff_documents_chain
+
             prompt = ChatPromptTemplate.from_template(_("System prompt for summarize documents"))
             llm_chain = create_stuff_documents_chain(llm, prompt)
             final_chain = llm_chain | cls.parse_json_data
@@ -301,9 +580,117 @@ class Llm:
             logger.exception(f"Error summarizing documents: {e}")
             return None
 
+    @classmethod
+    def _summary_group_prompts(cls) -> Tuple[Any, Any]:
+        return (ChatPromptTemplate.from_template(_("System prompt for summarize document part")),
+                ChatPromptTemplate.from_template(_("System prompt for summarize documents")))
+
+    @classmethod
+    def _group_for_summary(cls, texts: List[str], llm_name: str) -> List[str]:
+        groups = group_texts_by_tokens(texts, config.LLM_SUMMARY_GROUP_TOKENS,
+                                       lambda text: count_tokens(text, llm_name))
+        return ["\n\n".join(group) for group in groups]
+
+    @classmethod
+    def summarize_documents_map_reduce(cls, documents: List, llm_name: str) -> Optional[Dict]:
+        """
+        Summarizes a list of documents too large for one prompt using the specified LLM.
+
+        The documents are split into groups of LLM_SUMMARY_GROUP_TOKENS tokens that are summarized
+        concurrently (map); the summaries are grouped and summarized again until they fit in one
+        prompt, which produces the title and summary (reduce). Every call goes through the rate
+        limiter of the provider and LLM_TIMEOUT, like the asynchronous calls.
+
+        Args:
+            documents (List): The documents to summarize, e.g. the pages of a PDF.
+            llm_name (str): The name of the LLM to use.
+
+        Returns:
+            Optional[Dict]: The title and summary, or None when the summarization failed.
+        """
+        try:
+            part_prompt, final_prompt = cls._summary_group_prompts()
+            texts = [document.page_content for document in documents]
+
+            def summarize_part(text: str) -> str:
+                return cls._invoke(llm_name, part_prompt, {"context": text}) or ""
+
+            with ThreadPoolExecutor(max_workers=max(1, config.LLM_SUMMARY_MAP_CONCURRENCY),
+                                    thread_name_prefix="summary") as executor:
+                tokens = sum(count_tokens(text, llm_name) for text in texts)
+                while tokens > cls._stuff_max_tokens(llm_name):
+                    groups = cls._group_for_summary(texts, llm_name)
+                    logger.debug(f"Summarizing {len(texts)} texts of {tokens} tokens in {len(groups)} groups")
+                    texts = [summary for summary in executor.map(summarize_part, groups) if summary]
+                    reduced_tokens = sum(count_tokens(text, llm_name) for text in texts)
+                    if reduced_tokens >= tokens:
+                        # the summaries no longer get shorter, summarize what there is
+                        break
+                    tokens = reduced_tokens
+
+            if not texts:
+                return None
+            return cls._invoke(llm_name, final_prompt, {"context": "\n\n".join(texts)}, parse=cls.parse_json_response)
+        except Exception as e:
+            logger.exception(f"Error summarizing documents with map-reduce: {e}")
+            return None
+
+    @classmethod
+    def should_map_reduce(cls, documents: List, llm_name: str = "") -> bool:
+        """Returns whether the documents are too large to be summarized in one prompt of the LLM."""
+        tokens = sum(count_tokens(document.page_content, llm_name) for document in documents)
+        return tokens > cls._stuff_max_tokens(llm_name)
+
+    @classmethod
+    def _stuff_max_tokens(cls, llm_name: str) -> int:
+        """Returns the tokens of documents summarized in one prompt, within the prompt budget of the LLM."""
+        if not llm_name or not config.LLM_TOKEN_BUDGET_ENABLED:
+            return config.LLM_SUMMARY_STUFF_MAX_TOKENS
+        template_tokens = count_tokens(_("System prompt for summarize documents"), llm_name)
+        return min(config.LLM_SUMMARY_STUFF_MAX_TOKENS, prompt_budget(llm_name) - template_tokens)
+
+    @staticmethod
+    def _message_documents(messages: List[Union[str, BaseMessage, dict]]) -> List[Document]:
+        documents = []
+        for msg in messages:
+            if msg is None:
+                continue
+
+            if isinstance(msg, str):
+                documents.append(Document(page_content=msg))
+            elif isinstance(msg, BaseMessage) or isinstance(msg, dict) and 'content' in msg:
+                content = msg.get('content', '') if isinstance(msg, dict) else msg.content
+                documents.append(Document(page_content=content))
+        return documents
+
+    @staticmethod
+    def _summary_chain(llm: Any, chain_type: str) -> Any:
+        # Extract key information
+        if chain_type not in ["stuff", "refine", "map_reduce"]:
+            chain_type = "stuff"
+
+        prompt_template = _("System prompt for summarize message history")
+        prompt = PromptTemplate.from_template(prompt_template)
+        from langchain.chains.summarize import load_summarize_chain
+        # each chain type names its prompts differently, the refine step keeps its default prompt
+        if chain_type == "refine":
+            return load_summarize_chain(llm, chain_type=chain_type, question_prompt=prompt)
+        if chain_type == "map_reduce":
+            return load_summarize_chain(llm, chain_type=chain_type, map_prompt=prompt, combine_prompt=prompt)
+        return load_summarize_chain(llm, chain_type=chain_type, prompt=prompt)
+
+    @staticmethod
+    def _parse_summary(ai_summary: Any) -> Optional[Any]:
+        if isinstance(ai_summary, dict):
+            return ai_summary
+        if isinstance(ai_summary, BaseMessage):
+            ai_summary = ai_summary.content
+
+        return json.loads(ai_summary) if ai_summary else None
+
     @classmethod
     def summary_message_history(cls, messages, llm_name: str, chain_type: str = "stuff") -> Optional[str]:
-        """Processes a list of messages asynchronously using the specified LLM."""
+        """Processes a list of messages using the specified LLM."""
         try:
             if not messages:
                 return None
@@ -312,36 +699,64 @@ class Llm:
             if not llm:
                 return None
 
-            documents = []
-            for msg in messages:
-                if msg is None:
-                    continue
-                
-                if isinstance(msg, str):
-                    documents.append(Document(page_content=msg))
-                elif isinstance(msg, BaseMessage) or 'content' in msg:
-                    content = msg.get('content', '')
-                    documents.append(Document(page_content=content))
-
-            # Extract key information
-            if chain_type not in ["stuff", "refine", "map_reduce"]:
-                chain_type = "stuff"
-
-            prompt_template = _("System prompt for summarize message history")
-            prompt = PromptTemplate.from_template(prompt_template)
-            chain = load_summarize_chain(llm, chain_type=chain_type, prompt=prompt)
+            documents = cls._message_documents(messages)
+            if chain_type not in ["refine", "map_reduce"]:
+                documents = cls._fit_documents(documents, llm_name, _("System prompt for summarize message history"))
+            chain = cls._summary_chain(llm, chain_type)
             ai_summary = chain.invoke(documents)
-            if isinstance(ai_summary, dict):
-                return ai_summary
-            if isinstance(ai_summary, BaseMessage):
-                ai_summary = ai_summary.content
-            
-            return json.loads(ai_summary) if ai_summary else None
+            return cls._parse_summary(ai_summary)
         except Exception as e:
             logger.exception(f"Error processing message history: {e}")
             return None
-    
-    
+
+    @classmethod
+    async def summary_message_history_async(cls, messages, llm_name: str,
+                                            chain_type: str = "stuff") -> Optional[str]:
+        """
+        Processes a list of messages asynchronously using the specified LLM.
+
+        With LLM_HEDGE_ENABLED, the request is also sent to LLM_HEDGE_MODEL when the LLM has not
+        answered within the LLM_HEDGE_QUANTILE of its recent summary latency, and the first answer wins.
+        Each request goes through the rate limiter of its provider.
+
+        Args:
+            messages (List[Union[str, BaseMessage, dict]]): The messages to summarize.
+            llm_name (str): The name of the LLM to use.
+            chain_type (str): The type of summarization chain to use (default: "stuff").
+
+        Returns:
+            Optional[str]: The summary, as returned by the summarization chain.
+        """
+        try:
+            if not messages:
+                return None
+
+            documents = cls._message_documents(messages)
+
+            async def summarize(name: str) -> Any:
+                llm = cls.retrieve_llm_by_name(name)
+                if not llm:
+                    raise ValueError(f"LLM {name} is not available")
+                summarized = documents
+                if chain_type not in ["refine", "map_reduce"]:
+                    summarized = cls._fit_documents(documents, name, _("System prompt for summarize message history"))
+                tokens = count_tokens("\n\n".join(doc.page_content for doc in summarized), name)
+                async with get_rate_limiter(name, cls.get_provider(name)).limit(tokens):
+                    return await cls._summary_chain(llm, chain_type).ainvoke(summarized)
+
+            secondary = config.LLM_HEDGE_MODEL if config.LLM_HEDGE_ENABLED else None
+            # the summaries have their own latency window, the other calls to the model have other prompt sizes
+            ai_summary = await hedged_call(summarize, llm_name, secondary, config.LLM_HEDGE_QUANTILE, kind="summary")
+            return cls._parse_summary(ai_summary)
+        except Exception as e:
+            logger.exception(f"Error processing message history: {e}")
+            return None
+
+    @classmethod
+    def latency_stats(cls) -> Dict:
+        """Returns the latency quantiles, histogram and hedging counters of each LLM."""
+        return latency_tracker.stats()
+
     @classmethod
     async def summary_message_history_streaming(
         cls, messages: List[Union[str, BaseMessage, dict]], llm_name: str, chain_type: str = "stuff"
@@ -349,6 +764,10 @@ class Llm:
         """
         Processes a list of messages asynchronously using the specified LLM and streams the summary.
 
+        The "stuff" summary streams the tokens of the LLM as they are generated, so the first chunk
+        arrives after the time to first token of the model. The "refine" and "map_reduce" chains
+        only yield their final output.
+
         Args:
             messages (List[Union[str, BaseMessage, dict]]): The messages to summarize.
             llm_name (str): The name of the LLM to use.
@@ -371,30 +790,37 @@ class Llm:
                 logger.error(f"LLM with name '{llm_name}' not found.")
                 return
 
-            # Prepare documents for summarization
-            documents = []
-            for msg in messages:
-                if msg is None:
-                    continue
-
-                if isinstance(msg, str):
-                    documents.append(Document(page_content=msg))
-                elif isinstance(msg, BaseMessage) or isinstance(msg, dict) and 'content' in msg:
-                    content = msg.get('content', '') if isinstance(msg, dict) else msg.content
-                    documents.append(Document(page_content=content))
-
+            documents = cls._message_documents(messages)
             if not documents:
                 logger.warning("No valid documents found for summarization.")
                 return
 
-            # Load the summarization chain
-            chain = load_summarize_chain(llm, chain_type=chain_type)
+            if chain_type in ["refine", "map_reduce"]:
+                async for chunk in cls._summary_chain(llm, chain_type).astream(documents):
+                    yield chunk.get("output_text") if isinstance(chunk, dict) else cls._message_text(chunk)
+                return
 
-            # Stream the summarization process
-            async for chunk in chain.astream(documents):
-                if isinstance(chunk, BaseMessage):
-                    chunk = chunk.content
-                yield chunk  # Yield intermediate results
+            # the same prompt as the "stuff" summarization chain, sent to the LLM directly to stream its tokens
+            template = _("System prompt for summarize message history")
+            documents = cls._fit_documents(documents, llm_name, template)
+            prompt_value = PromptTemplate.from_template(template).format_prompt(
+                text="\n\n".join(doc.page_content for doc in documents))
+            prompt_tokens = count_tokens(prompt_value.to_string(), llm_name)
+            completion_tokens = 0
+            limiter = get_rate_limiter(llm_name, cls.get_provider(llm_name))
+            async with limiter.limit(prompt_tokens):
+                start = time.monotonic()
+                first_token = True
+                async for chunk in llm.astream(prompt_value):
+                    text = cls._message_text(chunk)
+                    if not text:
+                        continue
+                    if first_token:
+                        logger.debug(f"LLM {llm_name} streamed its first token after {time.monotonic() - start:.2f}s")
+                        first_token = False
+                    completion_tokens += count_tokens(text, llm_name)
+                    yield text
+            token_usage.record(llm_name, prompt_tokens, completion_tokens)
 
         except Exception as e:
             logger.exception(f"Error processing message history: {e}")
@@ -407,7 +833,8 @@ class Llm:
             "content": _("Content prompt template"),
             "analysis_title": _("Analysis title prompt template"),
             "analysis_keywords": _("Analysis keywords prompt template"),
-            "analysis_tags": _("Analysis tags prompt template")
+            "analysis_tags": _("Analysis tags prompt template"),
+            "analysis_node": _("Analysis node prompt template")
         }
         return templates.get(template_name, "")
 
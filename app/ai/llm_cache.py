@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from core import config
+from .sqlite_lru_store import SqliteLruStore
+
+
+class LlmResponseCache:
+    """
+    Persistent cache of LLM responses backed by SQLite.
+
+    Responses are keyed by the sha256 of the rendered prompt, the model name and the sampling
+    parameters, so re-running the generation or the analysis of a subject does not send the same
+    prompts to the model again. Entries expire after ttl_seconds (0 means never) and the least
+    recently used ones are evicted above max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000, ttl_seconds: float = 0):
+        self.store = SqliteLruStore(path, "llm_responses", max_entries, ttl_seconds)
+
+    @property
+    def path(self) -> str:
+        return self.store.path
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self.store.ttl_seconds
+
+    @ttl_seconds.setter
+    def ttl_seconds(self, ttl_seconds: float) -> None:
+        self.store.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def make_key(model_name: str, params: Dict[str, Any], prompt: str) -> str:
+        """
+        Returns the cache key of a prompt.
+
+        Args:
+            model_name (str): The LLM name.
+            params (Dict[str, Any]): The sampling parameters of the LLM, e.g. temperature and top_p.
+            prompt (str): The rendered prompt.
+
+        Returns:
+            str: The model name and the sha256 of the model, parameters and prompt.
+        """
+        content = json.dumps({"model": model_name, "params": params, "prompt": prompt},
+                             sort_keys=True, ensure_ascii=False, default=repr)
+        return f"{model_name}:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response of a key, or None when it is not cached or expired."""
+        return self.store.get_many([key])[0]
+
+    def put(self, key: str, model_name: str, response: str) -> None:
+        """Stores a response, evicting the expired and the least recently used entries when the cache is full."""
+        if not response:
+            return
+        self.store.put_many([(key, model_name, response)])
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> Dict:
+        """Returns the hit/miss counters and the number of cached responses."""
+        return self.store.stats()
+
+    def close(self) -> None:
+        self.store.close()
+
+
+_llm_cache: Optional[LlmResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LlmResponseCache]:
+    """
+    Returns the process-wide LLM response cache, or None when it is disabled by LLM_CACHE_ENABLED.
+    """
+    global _llm_cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LlmResponseCache(config.LLM_CACHE_PATH, config.LLM_CACHE_MAX_ENTRIES,
+                                              config.LLM_CACHE_TTL_SECONDS)
+    return _llm_cache
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from core.extends_logger import logger
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """
+    Returns the resident set size of the current process in bytes, or None if it cannot be determined.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    try:
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except Exception:
+        return None
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """
+    Returns the size of the parameters and buffers of a torch module in bytes, or None for other objects.
+    """
+    parameters = getattr(model, "parameters", None)
+    buffers = getattr(model, "buffers", None)
+    if not callable(parameters) or not callable(buffers):
+        return None
+    try:
+        total = sum(p.nelement() * p.element_size() for p in parameters())
+        total += sum(b.nelement() * b.element_size() for b in buffers())
+        return total
+    except Exception:
+        return None
+
+
+class ModelEntry:
+    """A model loaded into the registry together with its load statistics."""
+
+    def __init__(self, key: str, model: Any, load_seconds: float,
+                 rss_delta_bytes: Optional[int], parameter_bytes: Optional[int]):
+        self.key = key
+        self.model = model
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.parameter_bytes = parameter_bytes
+        self.loaded_at = time.time()
+        self.hits = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "type": type(self.model).__name__,
+            "load_seconds": round(self.load_seconds, 3),
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "parameter_bytes": self.parameter_bytes,
+            "loaded_at": self.loaded_at,
+            "hits": self.hits,
+        }
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models (embedding models, tokenizers, spaCy pipelines, ...).
+
+    Each model is loaded at most once per process and shared by every service and request.
+    Loading is guarded by a per-key lock, so concurrent first requests wait for a single load
+    instead of loading the same weights several times. The models themselves are not thread-safe
+    (e.g. HF fast tokenizers raise "Already borrowed" when called concurrently), callers that share
+    one across threads serialize its use with model_lock.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._entries = {}
+                    instance._key_locks = {}
+                    instance._model_locks = {}
+                    instance._lock = threading.Lock()
+                    cls._instance = instance
+        return cls._instance
+
+    def _get_key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            if key not in self._key_locks:
+                self._key_locks[key] = threading.Lock()
+            return self._key_locks[key]
+
+    def model_lock(self, model: Any) -> threading.Lock:
+        """
+        Returns the lock serializing the use of a loaded model.
+
+        Args:
+            model (Any): The model returned by get_or_load.
+
+        Returns:
+            threading.Lock: The same lock for every caller of the same model object.
+        """
+        with self._lock:
+            return self._model_locks.setdefault(id(model), threading.Lock())
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Returns the model registered under the given key, loading it with the loader on first use.
+
+        Args:
+            key (str): The unique key of the model, e.g. "sbert:<model name>:cpu".
+            loader (Callable[[], Any]): A function that loads and returns the model.
+
+        Returns:
+            Any: The shared model instance.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.hits += 1
+            return entry.model
+
+        with self._get_key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.hits += 1
+                return entry.model
+
+            logger.info(f"Loading model '{key}'")
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+            entry = ModelEntry(key, model, load_seconds, rss_delta, _parameter_bytes(model))
+            self._entries[key] = entry
+            logger.info(f"Loaded model '{key}' in {load_seconds:.2f}s, rss delta: {rss_delta} bytes")
+            return model
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the model registered under the given key without loading it."""
+        entry = self._entries.get(key)
+        return entry.model if entry else None
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._entries
+
+    def unload(self, key: str) -> None:
+        """Removes a model from the registry so that it can be garbage collected."""
+        with self._get_key_lock(key):
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                with self._lock:
+                    self._model_locks.pop(id(entry.model), None)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Returns the load time and memory footprint of every loaded model."""
+        return [entry.to_dict() for entry in list(self._entries.values())]
+
+
+model_registry = ModelRegistry()
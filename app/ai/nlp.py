@@ -1,8 +1,9 @@
-import spacy
-import langid
+import threading
 from pathlib import Path
 import logging
 
+from .model_registry import model_registry
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
@@ -10,8 +11,21 @@ logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 spacy_model_dir_path = Path('data/spacy_models')
 spacy_model_dir_path.mkdir(parents=True, exist_ok=True)  # Ensure the directory exists
 
-# Restrict langid to English and Chinese
-langid.set_languages(['en', 'zh'])
+# spaCy and langid are imported on first use, importing spaCy alone takes seconds
+_langid = None
+_langid_lock = threading.Lock()
+
+
+def _get_langid():
+    global _langid
+    if _langid is None:
+        with _langid_lock:
+            if _langid is None:
+                import langid
+                # Restrict langid to English and Chinese
+                langid.set_languages(['en', 'zh'])
+                _langid = langid
+    return _langid
 
 # Define paths to spaCy models
 model_paths = {
@@ -19,18 +33,28 @@ model_paths = {
     'zh': spacy_model_dir_path / 'zh_core_web_lg-3.8.0/zh_core_web_lg/zh_core_web_lg-3.8.0'
 }
 
-# Load spaCy models from local directories
-ner_models = {}
-for lang, model_path in model_paths.items():
+
+def get_ner_model(lang: str):
+    """
+    Returns the spaCy pipeline for the given language, loading it into the process-wide
+    model registry on first use. Returns None if the model is not available.
+    """
+    model_path = model_paths.get(lang)
+    if model_path is None:
+        return None
     if not model_path.exists():
         logging.error(f"Model for '{lang}' not found at {model_path}. Ensure the model is downloaded.")
-        continue  # Skip loading if model is missing
+        return None
 
     try:
-        ner_models[lang] = spacy.load(model_path)
-        logging.info(f"Loaded {lang} model from {model_path}")
+        def load():
+            import spacy
+            return spacy.load(model_path)
+
+        return model_registry.get_or_load(f"spacy:{lang}:{model_path.name}", load)
     except Exception as e:
         logging.error(f"Error loading {lang} model from {model_path}: {e}")
+        return None
 
 # Define the labels of interest
 interested_labels = {'PERSON', 'GPE', 'LOC', 'PRODUCT', 'ORG', 'EVENT', 'WORK_OF_ART', 'FAC', 'LANGUAGE', 'NORP'}
@@ -38,7 +62,7 @@ interested_labels = {'PERSON', 'GPE', 'LOC', 'PRODUCT', 'ORG', 'EVENT', 'WORK_OF
 def detect_language(text: str) -> str:
     """Detect language of input text."""
     try:
-        return langid.classify(text)[0]
+        return _get_langid().classify(text)[0]
     except Exception as e:
         logging.error(f"Language detection failed: {e}")
         return 'en'  # Default to English on failure
@@ -47,9 +71,30 @@ def extract_entities(text: str) -> list[str]:
     """Extract named entities from text."""
     lang = detect_language(text) if len(text) >= 10 else 'en'
 
-    if lang not in ner_models:
+    ner_model = get_ner_model(lang)
+    if ner_model is None:
         logging.warning(f"No NER model available for language '{lang}', defaulting to English.")
-        lang = 'en'
+        ner_model = get_ner_model('en')
+    if ner_model is None:
+        return []
 
-    doc = ner_models[lang](text)
+    doc = ner_model(text)
     return [ent.text for ent in doc.ents if ent.label_ in interested_labels]
+
+
+def warm_up_ner(langs: list[str]) -> list[str]:
+    """Load the spaCy pipelines of the given languages and run them once. Returns the languages that are ready."""
+    ready = []
+    for lang in langs:
+        ner_model = get_ner_model(lang)
+        if ner_model is None:
+            continue
+        ner_model("Barack Obama visited San Francisco." if lang == 'en' else "巴拉克·奥巴马访问了旧金山。")
+        ready.append(lang)
+    return ready
+
+
+async def extract_entities_async(text: str) -> list[str]:
+    """Extract named entities from text in the NLP process pool, without blocking the event loop."""
+    from .compute import run_in_nlp_process
+    return await run_in_nlp_process(extract_entities, text)
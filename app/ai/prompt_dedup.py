@@ -0,0 +1,108 @@
+"""
+Semantic de-duplication of the prompts generated for a subject.
+
+Answers of sibling and cousin nodes often lead the LLM to near-identical follow-up prompts, each of
+which would be expanded into a full subtree of LLM calls. The index keeps the normalized embedding
+of every prompt accepted for a subject; a candidate whose cosine similarity to an accepted prompt
+reaches the threshold is reported as a duplicate of it instead of being accepted.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from core import config
+from core.extends_logger import logger
+from .embedding_queue import get_embedding_batcher
+
+
+class PromptDedupIndex:
+    """In-memory index of the prompts accepted for a subject, searched by cosine similarity."""
+
+    def __init__(self, threshold: Optional[float] = None, model_name: Optional[str] = None,
+                 embed: Optional[Callable[[List[str]], Awaitable[np.ndarray]]] = None):
+        """
+        Initializes the PromptDedupIndex.
+
+        Args:
+            threshold (Optional[float]): Similarity from which a prompt is a duplicate. Defaults to GRAPH_PROMPT_DEDUP_THRESHOLD.
+            model_name (Optional[str]): The embedding model. Defaults to GRAPH_PROMPT_DEDUP_MODEL.
+            embed (Optional[Callable[[List[str]], Awaitable[np.ndarray]]]): Embeds a batch of prompts.
+                Defaults to the process-wide embedding batcher.
+        """
+        self.threshold = threshold if threshold is not None else config.GRAPH_PROMPT_DEDUP_THRESHOLD
+        self.model_name = model_name or config.GRAPH_PROMPT_DEDUP_MODEL
+        self._embed = embed or self._embed_with_batcher
+        self._items: List[Any] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self.duplicates = 0
+
+    def __len__(self):
+        return self._size
+
+    async def _embed_with_batcher(self, prompts: List[str]) -> np.ndarray:
+        # the prompts of concurrent expansions share the forward passes of the batcher
+        batcher = get_embedding_batcher()
+        return np.stack(await asyncio.gather(*(batcher.embed(prompt, self.model_name) for prompt in prompts)))
+
+    async def embed(self, prompts: List[str]) -> Optional[np.ndarray]:
+        """
+        Embeds a batch of prompts and normalizes the embeddings.
+
+        Args:
+            prompts (List[str]): The prompts.
+
+        Returns:
+            Optional[np.ndarray]: A matrix of shape (len(prompts), dimension) with unit rows, zero rows
+                for the prompts that could not be embedded, or None when the embedding failed.
+        """
+        if not prompts:
+            return None
+        try:
+            embeddings = np.asarray(await self._embed(prompts), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Failed to embed {len(prompts)} generated prompts, they are not de-duplicated: {e}")
+            return None
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+
+    def find(self, embedding: np.ndarray) -> Tuple[Optional[Any], float]:
+        """
+        Finds the accepted prompt most similar to an embedding, if it reaches the threshold.
+
+        Args:
+            embedding (np.ndarray): A normalized embedding returned by embed.
+
+        Returns:
+            Tuple[Optional[Any], float]: The item of the duplicated prompt, or None, and its similarity.
+        """
+        if not self._size or not np.any(embedding):
+            return None, 0.0
+        similarities = self._matrix[:self._size] @ embedding
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            return None, similarity
+        self.duplicates += 1
+        return self._items[best], similarity
+
+    def add(self, item: Any, embedding: np.ndarray) -> None:
+        """
+        Accepts a prompt, which later candidates are compared to.
+
+        Args:
+            item (Any): What find returns for the duplicates of the prompt, e.g. its node.
+            embedding (np.ndarray): The normalized embedding of the prompt returned by embed.
+        """
+        if not np.any(embedding):
+            return
+        if self._matrix is None:
+            self._matrix = np.zeros((64, embedding.shape[-1]), dtype=np.float32)
+        elif self._size == len(self._matrix):
+            # grow geometrically instead of copying the index for every prompt
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+        self._matrix[self._size] = embedding
+        self._items.append(item)
+        self._size += 1
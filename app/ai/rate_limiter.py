@@ -0,0 +1,295 @@
+"""
+Concurrency and rate limiting of the LLM calls.
+
+Every provider (or model with its own limits) gets an AdaptiveRateLimiter, which bounds the calls
+in flight and meters them through token buckets of requests per second and tokens per minute.
+When the provider answers 429/5xx or a call times out, the limiter halves its concurrency and rate
+and pauses; every successful call raises them again (additive increase, multiplicative decrease),
+so a fan-out of generation or analysis tasks settles at the throughput the provider sustains
+instead of bursting into timeouts.
+"""
+
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Set, Tuple
+
+from core import config
+from core.extends_logger import logger
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """
+    Returns the HTTP status code of an error raised by an LLM integration, if it has one.
+
+    The SDKs expose it as status_code (OpenAI, Anthropic, Ollama) or on the response (httpx); the
+    DouBao and Kimi adapters only keep it in the message, e.g. "Failed with response: <Response [429 ...]>".
+    """
+    for candidate in (error, getattr(error, "response", None)):
+        status_code = getattr(candidate, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+    match = re.search(r"\[(\d{3})", str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Returns whether an error means that the provider is overloaded: a timeout, 429 or 5xx."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    return error_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+class AdaptiveRateLimiter:
+    """
+    Bounds the LLM calls in flight and meters them with request and token buckets.
+
+    The limits adapt to the provider: an overload halves the concurrency and the rates and pauses
+    new calls for LLM_RATE_LIMIT_BACKOFF_SECONDS, each success raises them again up to the
+    configured maximum. Waiting callers are served in FIFO order.
+    """
+
+    def __init__(self, name: str, requests_per_second: float = 0, tokens_per_minute: float = 0,
+                 max_in_flight: int = 8):
+        self.name = name
+        self.requests_per_second = max(0.0, requests_per_second)
+        self.tokens_per_minute = max(0.0, tokens_per_minute)
+        self.max_in_flight = max(1, max_in_flight)
+        self.concurrency = float(self.max_in_flight)
+        self.rate_factor = 1.0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._granted: Set[asyncio.Future] = set()
+        self._waiting = 0
+        now = time.monotonic()
+        self._request_bucket = max(1.0, self.requests_per_second)
+        self._token_bucket = self.tokens_per_minute
+        self._refilled_at = now
+        self._paused_until = 0.0
+        self.requests = 0
+        self.succeeded = 0
+        self.overloaded = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.requests_per_second:
+            self._request_bucket = min(max(1.0, self.requests_per_second),
+                                       self._request_bucket + elapsed * self.requests_per_second * self.rate_factor)
+        if self.tokens_per_minute:
+            self._token_bucket = min(self.tokens_per_minute,
+                                     self._token_bucket + elapsed * self.tokens_per_minute / 60 * self.rate_factor)
+
+    def _reserve(self, tokens: int) -> float:
+        """Takes a request and its tokens from the buckets, or returns the seconds to wait for them."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = self._paused_until - now
+        if self.requests_per_second and self._request_bucket < 1:
+            wait = max(wait, (1 - self._request_bucket) / (self.requests_per_second * self.rate_factor))
+        # a request larger than the bucket only waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        if self.tokens_per_minute and self._token_bucket < tokens:
+            wait = max(wait, (tokens - self._token_bucket) / (self.tokens_per_minute / 60 * self.rate_factor))
+        if wait > 0:
+            return wait
+        if self.requests_per_second:
+            self._request_bucket -= 1
+        if self.tokens_per_minute:
+            self._token_bucket -= tokens
+        return 0.0
+
+    async def _acquire_slot(self) -> None:
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.concurrency):
+                self.in_flight += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._granted:
+                    # the slot was handed over just before the cancellation, pass it on
+                    self._granted.discard(future)
+                    self._release_slot()
+                elif future in self._waiters:
+                    self._waiters.remove(future)
+            raise
+        with self._lock:
+            self._granted.discard(future)
+
+    def _release_slot(self) -> None:
+        """Frees a slot or hands it to the next waiter; must be called with the lock held."""
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.concurrency):
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            self._granted.add(future)
+            future.get_loop().call_soon_threadsafe(self._wake, future)
+
+    @staticmethod
+    def _wake(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Waits for a free slot and for the request and token buckets.
+
+        Args:
+            tokens (int): The estimated number of tokens of the request.
+        """
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._waiting)
+        try:
+            await self._acquire_slot()
+            try:
+                while True:
+                    with self._lock:
+                        wait = self._reserve(tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+            except BaseException:
+                with self._lock:
+                    self._release_slot()
+                raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self.requests += 1
+                self.wait_seconds += time.monotonic() - start
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        """
+        Frees the slot of a finished call and adapts the limits to its outcome.
+
+        Args:
+            error (Optional[BaseException]): The error raised by the call, None when it succeeded.
+        """
+        with self._lock:
+            if error is None:
+                self.succeeded += 1
+                self.concurrency = min(float(self.max_in_flight), self.concurrency + 1 / self.concurrency)
+                self.rate_factor = min(1.0, self.rate_factor + config.LLM_RATE_LIMIT_RECOVERY)
+            elif is_overload_error(error):
+                self.overloaded += 1
+                self.concurrency = max(1.0, self.concurrency / 2)
+                self.rate_factor = max(0.05, self.rate_factor / 2)
+                self._paused_until = time.monotonic() + config.LLM_RATE_LIMIT_BACKOFF_SECONDS
+                logger.warning(f"LLM provider {self.name} is overloaded ({error}), reducing concurrency "
+                               f"to {int(self.concurrency)} and rate to {self.rate_factor:.0%}")
+            else:
+                self.failed += 1
+            self._release_slot()
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0) -> AsyncIterator[None]:
+        """Holds a slot of the limiter for the duration of a call."""
+        await self.acquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            self.release(e if isinstance(e, Exception) else None)
+            raise
+        else:
+            self.release()
+
+    @contextmanager
+    def limit_sync(self, tokens: int = 0) -> Iterator[None]:
+        """
+        Blocking version of limit, for the calls made from worker threads outside an event loop.
+
+        The wait for the slot runs in an event loop of its own; the slot is handed over between the
+        loops of the threads, so the synchronous and asynchronous callers share the same limits.
+        """
+        asyncio.run(self.acquire(tokens))
+        try:
+            yield
+        except BaseException as e:
+            self.release(e if isinstance(e, Exception) else None)
+            raise
+        else:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the limits, the queue depth and the outcome counters of the limiter."""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self._waiting,
+                "max_queue_depth": self.max_queue_depth,
+                "concurrency": int(self.concurrency),
+                "max_in_flight": self.max_in_flight,
+                "requests_per_second": self.requests_per_second * self.rate_factor,
+                "tokens_per_minute": self.tokens_per_minute * self.rate_factor,
+                "requests": self.requests,
+                "succeeded": self.succeeded,
+                "overloaded": self.overloaded,
+                "failed": self.failed,
+                "avg_wait_seconds": round(self.wait_seconds / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def parse_rate_limits(value: str) -> Dict[str, Tuple[float, float, int]]:
+    """
+    Parses LLM_RATE_LIMITS, e.g. "ollama=0:0:2,openai=10:90000:32,gpt-4=2:10000:4".
+
+    Returns:
+        Dict[str, Tuple[float, float, int]]: The requests per second, tokens per minute and max in
+            flight of each provider or model name; 0 means unlimited for the rates.
+    """
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        name, spec = item.split("=", 1)
+        try:
+            rps, tpm, in_flight = spec.split(":")
+            limits[name.strip()] = (float(rps), float(tpm), int(in_flight))
+        except ValueError:
+            logger.error(f"Invalid LLM_RATE_LIMITS entry: {item}")
+    return limits
+
+
+def get_rate_limiter(llm_name: str, provider: str) -> AdaptiveRateLimiter:
+    """
+    Returns the limiter of a model: its own when LLM_RATE_LIMITS lists the model, otherwise the
+    limiter shared by all models of the provider.
+    """
+    limits = parse_rate_limits(config.LLM_RATE_LIMITS)
+    key = llm_name if llm_name in limits else provider
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                rps, tpm, in_flight = limits.get(key, (config.LLM_REQUESTS_PER_SECOND, config.LLM_TOKENS_PER_MINUTE,
+                                                       config.LLM_MAX_IN_FLIGHT))
+                limiter = AdaptiveRateLimiter(key, rps, tpm, in_flight)
+                _limiters[key] = limiter
+    return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns the stats of every limiter, keyed by provider or model name."""
+    return {key: limiter.stats() for key, limiter in list(_limiters.items())}
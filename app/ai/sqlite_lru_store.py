@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.extends_logger import logger
+
+
+class SqliteLruStore:
+    """
+    Persistent key-value store backed by a SQLite table, bounded by least recently used eviction.
+
+    The caches of the process are thin layers over a store: they make the keys and encode the values,
+    the store keeps the values with the model that produced them, expires them after ttl_seconds
+    (0 means never), evicts the least recently used ones above max_entries and counts the lookups.
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int, ttl_seconds: float = 0):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._clock = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, "
+                "model TEXT NOT NULL, "
+                "value BLOB NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "last_access INTEGER NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_access ON {self.table} (last_access)")
+            conn.commit()
+            # the access clock is a monotonic counter, it continues from the newest entry on disk
+            self._clock = conn.execute(f"SELECT COALESCE(MAX(last_access), 0) FROM {self.table}").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """
+        Looks up several keys at once and marks the entries found as the most recently used.
+
+        Args:
+            keys (Sequence[str]): The keys, possibly repeated.
+
+        Returns:
+            List[Optional[Any]]: The value of each key, or None when it is not stored or expired.
+        """
+        found: Dict[str, Any] = {}
+        with self._lock:
+            try:
+                conn = self._connect()
+                unique_keys = list(dict.fromkeys(keys))
+                expired = []
+                # stay below the SQLite host parameter limit
+                for start in range(0, len(unique_keys), 500):
+                    chunk = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, value, created_at FROM {self.table} WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, value, created_at in rows:
+                        if self._expired(created_at):
+                            expired.append(key)
+                        else:
+                            found[key] = value
+                if expired:
+                    conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in expired])
+                    self.expirations += len(expired)
+                if found:
+                    self._clock += 1
+                    conn.executemany(f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                                     [(self._clock, key) for key in found])
+                if expired or found:
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to read cache {self.path}: {e}")
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, entries: Sequence[Tuple[str, str, Any]]) -> None:
+        """
+        Stores several entries, evicting the expired and the least recently used ones when the store is full.
+
+        Args:
+            entries (Sequence[Tuple[str, str, Any]]): The key, model name and value of each entry.
+        """
+        if not entries:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                self._clock += 1
+                now = time.time()
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, model, value, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)", [(key, model, value, now, self._clock) for key, model, value in entries]
+                )
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write cache {self.path}: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        if self.ttl_seconds > 0:
+            expired = conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?",
+                                   (time.time() - self.ttl_seconds,)).rowcount
+            self.expirations += expired
+            overflow -= expired
+        if overflow > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)", (overflow,)
+            )
+            self.evictions += overflow
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+            self.hits = self.misses = self.expirations = self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Returns the lookup and eviction counters and the number of stored entries."""
+        with self._lock:
+            try:
+                entries = self._connect().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
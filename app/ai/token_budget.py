@@ -0,0 +1,245 @@
+"""
+Token accounting and budgeting of the LLM prompts.
+
+Every model has a context window; a prompt must leave room in it for the answer. Prompts over
+their budget are compressed (runs of whitespace collapsed) and then truncated, instead of being
+sent to the provider to be truncated server side or rejected, and message histories keep their
+most recent messages. Each call records its estimated prompt and completion tokens and cost, which
+are reported per model.
+
+The OpenAI models are counted with tiktoken when it is installed; the other models, whose
+tokenizers are not available locally, are estimated: about one token per CJK character and one
+per 4 other characters.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import config
+from core.extends_logger import logger
+
+# context window in tokens of each model; the Ollama models get OLLAMA_NUM_CTX
+CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "claude3.5-sonnet": 200000,
+    "claude3.5-haiku": 200000,
+    "claude3.5-opus": 200000,
+    "deepseek": 64000,
+    "qwen-plus": 131072,
+    "qwen-max": 32768,
+    "Doubao-1.5-pro-32k": 32768,
+    "Doubao-1.5-pro-256k": 262144,
+    "Doubao-1.5-lite-32k": 32768,
+    "Doubao-pro-32k": 32768,
+}
+
+# approximate list prices in USD per 1000 prompt and completion tokens; the local models are free
+TOKEN_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4": (0.03, 0.06),
+    "claude3.5-sonnet": (0.003, 0.015),
+    "claude3.5-haiku": (0.0008, 0.004),
+    "claude3.5-opus": (0.015, 0.075),
+    "deepseek": (0.00027, 0.0011),
+    "qwen-plus": (0.00011, 0.00028),
+    "qwen-max": (0.0003, 0.0012),
+    "Doubao-1.5-pro-32k": (0.00011, 0.00028),
+    "Doubao-1.5-pro-256k": (0.0007, 0.0013),
+    "Doubao-1.5-lite-32k": (0.00004, 0.00008),
+    "Doubao-pro-32k": (0.00011, 0.00028),
+}
+
+TRUNCATION_MARK = "\n...\n"
+
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]")
+_WHITESPACE_PATTERN = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES_PATTERN = re.compile(r"\n\s*\n+")
+
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _parse_overrides(value: str) -> Dict[str, List[str]]:
+    overrides = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, spec = item.split("=", 1)
+            overrides[name.strip()] = spec.split(":")
+    return overrides
+
+
+def context_window(llm_name: str) -> int:
+    """Returns the context window of a model, LLM_CONTEXT_WINDOWS overriding the defaults."""
+    override = _parse_overrides(config.LLM_CONTEXT_WINDOWS).get(llm_name)
+    if override:
+        try:
+            return int(override[0])
+        except ValueError:
+            logger.error(f"Invalid LLM_CONTEXT_WINDOWS entry for {llm_name}: {override}")
+    return CONTEXT_WINDOWS.get(llm_name, config.OLLAMA_NUM_CTX)
+
+
+def token_prices(llm_name: str) -> Tuple[float, float]:
+    """Returns the USD prices per 1000 prompt and completion tokens of a model, LLM_TOKEN_PRICES overriding the defaults."""
+    override = _parse_overrides(config.LLM_TOKEN_PRICES).get(llm_name)
+    if override:
+        try:
+            prompt_price, completion_price = override
+            return float(prompt_price), float(completion_price)
+        except ValueError:
+            logger.error(f"Invalid LLM_TOKEN_PRICES entry for {llm_name}: {override}")
+    return TOKEN_PRICES.get(llm_name, (0.0, 0.0))
+
+
+def prompt_budget(llm_name: str) -> int:
+    """Returns the tokens a prompt may use: the context window less the tokens reserved for the answer."""
+    window = context_window(llm_name)
+    return window - min(config.LLM_OUTPUT_TOKEN_RESERVE, window // 4)
+
+
+def _encoding(llm_name: str) -> Optional[Any]:
+    if not llm_name.startswith("gpt-"):
+        return None
+    name = "o200k_base" if llm_name.startswith("gpt-4o") else "cl100k_base"
+    if name not in _encodings:
+        with _encodings_lock:
+            if name not in _encodings:
+                try:
+                    import tiktoken
+                    _encodings[name] = tiktoken.get_encoding(name)
+                except Exception as e:
+                    # tiktoken is not installed or cannot download its encoding files
+                    logger.debug(f"tiktoken encoding {name} is not available, estimating tokens: {e}")
+                    _encodings[name] = None
+    return _encodings[name]
+
+
+def count_tokens(text: str, llm_name: str = "") -> int:
+    """
+    Counts or estimates the tokens of a text for a model.
+
+    Args:
+        text (str): The text.
+        llm_name (str): The model name; the OpenAI models are counted with their tiktoken encoding.
+
+    Returns:
+        int: The number of tokens.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(llm_name)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def compress_text(text: str) -> str:
+    """Collapses runs of spaces and blank lines, which cost tokens without adding content."""
+    text = _WHITESPACE_PATTERN.sub(" ", text)
+    return _BLANK_LINES_PATTERN.sub("\n\n", text).strip()
+
+
+def truncate_text(text: str, max_tokens: int, llm_name: str = "") -> str:
+    """
+    Fits a text into a number of tokens, compressing it first and then cutting its end.
+
+    Args:
+        text (str): The text.
+        max_tokens (int): The token budget of the text.
+        llm_name (str): The model name, to count the tokens with.
+
+    Returns:
+        str: The text, unchanged when it fits, otherwise compressed and truncated at a TRUNCATION_MARK.
+    """
+    if count_tokens(text, llm_name) <= max_tokens:
+        return text
+    text = compress_text(text)
+    if count_tokens(text, llm_name) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # binary search of the longest prefix that fits with the mark
+    budget = max_tokens - count_tokens(TRUNCATION_MARK, llm_name)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle], llm_name) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + TRUNCATION_MARK
+
+
+def fit_texts(texts: List[str], max_tokens: int, llm_name: str = "") -> List[str]:
+    """
+    Keeps the most recent texts of a history that fit into a number of tokens.
+
+    Args:
+        texts (List[str]): The texts, oldest first.
+        max_tokens (int): The token budget of all the texts.
+        llm_name (str): The model name, to count the tokens with.
+
+    Returns:
+        List[str]: The newest texts that fit, oldest first; the newest text alone is truncated to the budget.
+    """
+    kept, total = [], 0
+    for text in reversed(texts):
+        tokens = count_tokens(text, llm_name)
+        if total + tokens > max_tokens:
+            if not kept:
+                kept.append(truncate_text(text, max_tokens, llm_name))
+            break
+        kept.append(text)
+        total += tokens
+    return list(reversed(kept))
+
+
+class TokenUsage:
+    """Counts the calls, estimated tokens, truncations and cost of each model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, llm_name: str, prompt_tokens: int, completion_tokens: int, truncated: bool = False) -> float:
+        """
+        Records a call and returns its estimated cost in USD.
+
+        Args:
+            llm_name (str): The model name.
+            prompt_tokens (int): The tokens of the prompt.
+            completion_tokens (int): The tokens of the answer.
+            truncated (bool): Whether the prompt was truncated to its budget.
+
+        Returns:
+            float: The estimated cost of the call.
+        """
+        prompt_price, completion_price = token_prices(llm_name)
+        cost = (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+        with self._lock:
+            usage = self._usage.setdefault(llm_name, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                                      "truncated": 0, "cost_usd": 0.0})
+            usage["calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["truncated"] += int(truncated)
+            usage["cost_usd"] += cost
+        logger.debug(f"LLM {llm_name} call: {prompt_tokens} prompt and {completion_tokens} completion tokens, "
+                     f"about ${cost:.5f}")
+        return cost
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the usage of each model, with its context window and prompt budget."""
+        with self._lock:
+            return {llm_name: {**usage, "cost_usd": round(usage["cost_usd"], 5),
+                               "context_window": context_window(llm_name), "prompt_budget": prompt_budget(llm_name)}
+                    for llm_name, usage in self._usage.items()}
+
+
+token_usage = TokenUsage()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 import shutil
@@ -105,6 +106,29 @@ async def generate_knowledge_graph(generate_data: GraphGenerateConditionView,
         logger.error(f"generate_knowledge_graph error: {e}")
         return failed(data=None, msg=str(e))
 
+@router.post("/generate/resume")
+async def resume_knowledge_graph(generate_data: GraphGenerateConditionView,
+                                 background_tasks: BackgroundTasks,
+                                 graph_service: GraphService = Depends(get_graph_service)):
+    try:
+        lib_id = generate_data.lib_id
+        subject_id = generate_data.subject_id
+        if not lib_id or not subject_id:
+            return failed(data=None, msg=_("lib_id and subject_id are required"))
+
+        # the checks run before the response, the generation itself in the background
+        job = await graph_service.find_resumable_job(lib_id, subject_id)
+        background_tasks.add_task(graph_service.resume_generate_graph, lib_id, subject_id)
+
+        return ok({"success": True, "job": job.to_dict()})
+    except (ValueError, RuntimeError) as e:
+        return failed(data=None, msg=str(e))
+    except HTTPException as e:
+        return failed(data=None, msg=str(e))
+    except Exception as e:
+        logger.error(f"resume_knowledge_graph error: {e}")
+        return failed(data=None, msg=str(e))
+
 @router.post("/analyze")
 async def analyze_knowledge_graph(analyze_data: GraphAnalyzeConditionView, 
                                     knowledge_lib_service: KnowledgeLibService = Depends(get_knowledge_lib_service),
@@ -451,9 +475,10 @@ async def analysis_document(data: GraphGenerateConditionView,
         if element_id is None:
             return failed(data=None, msg=_("Element id must be provided."))
 
-        document: Document = graph_service.analyze_graph_node_file(element_id, data.llm_name,
-                                                                           data.embedding_model,
-                                                                           data.max_tokens_each_chunk)
+        # the analysis waits on the loader and the LLM, it must not hold a compute thread
+        document: Document = await asyncio.to_thread(graph_service.analyze_graph_node_file, element_id,
+                                                     data.llm_name, data.embedding_model,
+                                                     data.max_tokens_each_chunk)
         return ok(document.to_dict())
     except HTTPException as e:
         return failed(data=None, msg=str(e))
@@ -505,9 +530,9 @@ async def analyze_graph_node_webpage(data: GraphGenerateConditionView,
         if not element_id:
             return failed(data=None, msg=_("Element id must be provided."))
 
-        webpage: WebPage = graph_service.analyze_graph_node_webpage(element_id, data.llm_name,
-                                                                            data.embedding_model,
-                                                                            data.max_tokens_each_chunk)
+        webpage: WebPage = await asyncio.to_thread(graph_service.analyze_graph_node_webpage, element_id,
+                                                   data.llm_name, data.embedding_model,
+                                                   data.max_tokens_each_chunk)
         return ok(webpage.to_dict())
     except ValueError as e:
         return failed(data=None, msg=str(e))
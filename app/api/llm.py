@@ -7,4 +7,11 @@ router = APIRouter()
 
 @router.get("/all")
 def available_llms():
-    return ok({"llms": Llm.all_llms(), "embeddings": EmbeddingFactory.all_embeddings()})
\ No newline at end of file
+    return ok({"llms": Llm.all_llms(), "embeddings": EmbeddingFactory.all_embeddings()})
+
+@router.get("/models")
+def loaded_models():
+    return ok({"models": EmbeddingFactory.model_stats(), "embedding_cache": EmbeddingFactory.cache_stats(),
+               "llm_clients": Llm.client_pool_stats(), "llm_cache": Llm.response_cache_stats(),
+               "llm_rate_limits": Llm.rate_limiter_stats(),
+               "llm_latency": Llm.latency_stats(), "llm_tokens": Llm.token_usage_stats()})
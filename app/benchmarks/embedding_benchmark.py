@@ -0,0 +1,259 @@
+"""
+Embedding throughput benchmark.
+
+Measures texts per second, latency percentiles and memory of the EmbeddingFactory models across
+batch sizes, text lengths and languages, on fixed synthetic corpora so that results are comparable
+across runs and machines. The models must already be in the local Hugging Face cache when running
+with --offline.
+
+Usage (from the app directory):
+    python -m benchmarks.embedding_benchmark --models sbert,mlongt5 --output data/benchmarks/embedding.json
+    python -m benchmarks.embedding_benchmark --baseline data/benchmarks/embedding.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+EN_WORDS = [
+    "knowledge", "graph", "model", "question", "answer", "network", "language", "system", "data", "learning",
+    "research", "history", "science", "energy", "market", "city", "river", "protein", "theory", "design",
+    "analysis", "structure", "process", "method", "result", "value", "growth", "policy", "culture", "memory",
+]
+EN_GLUE = ["the", "of", "and", "a", "in", "to", "is", "for", "with", "on", "that", "by", "from", "as"]
+ZH_WORDS = [
+    "知识", "图谱", "模型", "问题", "答案", "网络", "语言", "系统", "数据", "学习",
+    "研究", "历史", "科学", "能源", "市场", "城市", "河流", "蛋白质", "理论", "设计",
+    "分析", "结构", "过程", "方法", "结果", "价值", "增长", "政策", "文化", "记忆",
+]
+ZH_GLUE = ["的", "和", "在", "是", "了", "对", "与", "从", "把", "被"]
+
+# number of sentences of each text length
+TEXT_LENGTHS = {"short": 1, "medium": 5, "long": 30}
+
+
+def make_sentence(rng: random.Random, lang: str) -> str:
+    words = EN_WORDS if lang == "en" else ZH_WORDS
+    glue = EN_GLUE if lang == "en" else ZH_GLUE
+    tokens = []
+    for _ in range(rng.randint(8, 20)):
+        tokens.append(rng.choice(words) if rng.random() < 0.6 else rng.choice(glue))
+    if lang == "en":
+        return " ".join(tokens).capitalize() + "."
+    return "".join(tokens) + "。"
+
+
+def make_corpus(lang: str, length: str, size: int, seed: int = 42) -> List[str]:
+    """
+    Build a deterministic synthetic corpus.
+
+    Args:
+        lang (str): "en" or "zh".
+        length (str): One of TEXT_LENGTHS.
+        size (int): The number of texts.
+        seed (int): The random seed, the same seed always gives the same corpus.
+
+    Returns:
+        List[str]: The texts.
+    """
+    if lang not in ("en", "zh"):
+        raise ValueError(f"Language '{lang}' is not supported. Use 'en' or 'zh'.")
+    if length not in TEXT_LENGTHS:
+        raise ValueError(f"Text length '{length}' is not supported. Use one of {list(TEXT_LENGTHS)}.")
+    rng = random.Random(f"{seed}:{lang}:{length}")
+    separator = " " if lang == "en" else ""
+    return [separator.join(make_sentence(rng, lang) for _ in range(TEXT_LENGTHS[length])) for _ in range(size)]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(float(np.mean(values)), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return round((max_rss if sys.platform == "darwin" else max_rss * 1024) / 1024 / 1024, 1)
+
+
+def environment() -> Dict:
+    info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        info["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                            text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        info["git_commit"] = None
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def benchmark_model(factory, model_name: str, langs: List[str], lengths: List[str], batch_sizes: List[int],
+                    size: int, repeats: int, max_tokens_each_chunk: int, latency_samples: int) -> List[Dict]:
+    """Run every (language, length, batch size) combination against one model."""
+    from ai.model_registry import model_registry
+
+    model = factory.get_model(model_name)
+    load_start = time.perf_counter()
+    model.load_model()
+    load_seconds = time.perf_counter() - load_start
+    model_stats = [item for item in model_registry.stats() if model.model_name in item["key"]]
+
+    results = []
+    for lang in langs:
+        for length in lengths:
+            corpus = make_corpus(lang, length, size)
+            # warm-up pass, the first forward pass allocates buffers lazily
+            model.get_embeddings(corpus[:2], max_tokens_each_chunk)
+
+            # single text latency
+            latencies = []
+            for text in corpus[:latency_samples]:
+                start = time.perf_counter()
+                model.get_embeddings([text], max_tokens_each_chunk)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            for batch_size in batch_sizes:
+                durations = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    model.get_embeddings(corpus, max_tokens_each_chunk, batch_size)
+                    durations.append(time.perf_counter() - start)
+                best = min(durations)
+                result = {
+                    "model": model_name,
+                    "lang": lang,
+                    "length": length,
+                    "batch_size": batch_size,
+                    "texts": len(corpus),
+                    "repeats": repeats,
+                    "texts_per_second": round(len(corpus) / best, 2),
+                    "batch_seconds": percentiles(durations),
+                    "single_text_latency_ms": percentiles(latencies),
+                    "peak_rss_mb": peak_rss_mb(),
+                    "load_seconds": round(load_seconds, 3),
+                    "model_memory": model_stats,
+                }
+                results.append(result)
+                print(f"{model_name:12s} {lang} {length:6s} batch={batch_size:<4d} "
+                      f"{result['texts_per_second']:>9.2f} texts/s  "
+                      f"p95 latency {result['single_text_latency_ms']['p95']:.1f} ms", flush=True)
+    return results
+
+
+def result_key(result: Dict) -> str:
+    return f"{result['model']}/{result['lang']}/{result['length']}/{result['batch_size']}"
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[Dict]:
+    """
+    Compare throughput with a baseline run.
+
+    Args:
+        results (List[Dict]): The results of this run.
+        baseline (List[Dict]): The results of the baseline run.
+        tolerance (float): The relative throughput drop reported as a regression, e.g. 0.1 for 10%.
+
+    Returns:
+        List[Dict]: The throughput ratio of every combination present in both runs.
+    """
+    baseline_by_key = {result_key(result): result for result in baseline}
+    comparisons = []
+    for result in results:
+        previous = baseline_by_key.get(result_key(result))
+        if not previous or not previous["texts_per_second"]:
+            continue
+        ratio = result["texts_per_second"] / previous["texts_per_second"]
+        comparisons.append({
+            "key": result_key(result),
+            "texts_per_second": result["texts_per_second"],
+            "baseline_texts_per_second": previous["texts_per_second"],
+            "ratio": round(ratio, 3),
+            "regression": ratio < 1 - tolerance,
+        })
+    return comparisons
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the embedding models of EmbeddingFactory.")
+    parser.add_argument("--models", default="sbert,mlongt5", help="comma separated EmbeddingFactory model names")
+    parser.add_argument("--langs", default="en,zh")
+    parser.add_argument("--lengths", default=",".join(TEXT_LENGTHS))
+    parser.add_argument("--batch-sizes", default="1,8,32,64")
+    parser.add_argument("--texts", type=int, default=64, help="number of texts of each corpus")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency-samples", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--offline", action="store_true", help="only use models from the local cache")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the throughput with this JSON results file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative throughput drop flagged as regression")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    from ai.embedding import EmbeddingFactory
+
+    factory = EmbeddingFactory()
+    results = []
+    for model_name in [name.strip() for name in args.models.split(",") if name.strip()]:
+        factory.get_model(model_name).device = args.device
+        results.extend(benchmark_model(
+            factory, model_name,
+            langs=[lang.strip() for lang in args.langs.split(",") if lang.strip()],
+            lengths=[length.strip() for length in args.lengths.split(",") if length.strip()],
+            batch_sizes=[int(size) for size in args.batch_sizes.split(",") if size.strip()],
+            size=args.texts,
+            repeats=max(1, args.repeats),
+            max_tokens_each_chunk=args.max_tokens,
+            latency_samples=max(1, args.latency_samples),
+        ))
+
+    report = {"benchmark": "embedding", "environment": environment(), "parameters": vars(args), "results": results}
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(results, baseline.get("results", []), args.tolerance)
+        for item in report["comparison"]:
+            flag = "REGRESSION" if item["regression"] else ""
+            print(f"{item['key']:40s} {item['ratio']:.3f}x {flag}")
+        if any(item["regression"] for item in report["comparison"]):
+            exit_code = 1
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Results written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
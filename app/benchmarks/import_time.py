@@ -0,0 +1,133 @@
+"""
+Import-time report based on `python -X importtime`.
+
+Imports a module (main by default) in a fresh interpreter, and reports the total import time, the
+slowest top-level packages and whether any of the heavy ML and document-loader dependencies were
+imported eagerly. Runs can be compared with a baseline so that import-time regressions are visible.
+
+Usage (from the app directory):
+    python -m benchmarks.import_time --output data/benchmarks/import_time.json
+    python -m benchmarks.import_time --baseline data/benchmarks/import_time.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# dependencies that must only be imported when they are used
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "spacy", "onnxruntime", "unstructured",
+                 "langchain_community.document_loaders", "langchain_neo4j", "langchain_openai",
+                 "langchain_anthropic", "langchain_deepseek", "langchain_ollama"]
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """
+    Parse the stderr of `python -X importtime`.
+
+    Args:
+        output (str): The stderr of the interpreter.
+
+    Returns:
+        List[Dict]: One entry per imported module with its self and cumulative time in microseconds
+            and its nesting depth, in the order printed by the interpreter.
+    """
+    entries = []
+    for line in output.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        entries.append({
+            "module": match.group(4),
+            "self_us": int(match.group(1)),
+            "cumulative_us": int(match.group(2)),
+            # the interpreter indents nested imports by two spaces per level
+            "depth": (len(match.group(3)) - 1) // 2,
+        })
+    return entries
+
+
+def summarize(entries: List[Dict], top: int = 25) -> Dict:
+    """Summarize the parsed entries into total time, slowest packages and eagerly imported heavy modules."""
+    top_level = [entry for entry in entries if entry["depth"] == 0]
+    packages: Dict[str, int] = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+    imported = {entry["module"] for entry in entries}
+    return {
+        "total_ms": round(sum(entry["cumulative_us"] for entry in top_level) / 1000, 1),
+        "modules": len(entries),
+        "slowest_packages_ms": {
+            package: round(us / 1000, 1)
+            for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "heavy_modules_imported": [module for module in HEAVY_MODULES if module in imported],
+    }
+
+
+def measure(module: str, cwd: str, runs: int) -> Dict:
+    """Import the module in fresh interpreters and keep the fastest run, the others include disk cache misses."""
+    best: Optional[Dict] = None
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                 cwd=cwd, capture_output=True, text=True)
+        wall_ms = round((time.perf_counter() - start) * 1000, 1)
+        if process.returncode != 0:
+            raise RuntimeError(f"Failed to import {module}: {process.stderr.strip().splitlines()[-1:]}")
+        summary = summarize(parse_importtime(process.stderr))
+        summary["wall_ms"] = wall_ms
+        if best is None or summary["total_ms"] < best["total_ms"]:
+            best = summary
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the import time of the application.")
+    parser.add_argument("--module", default="main", help="the module to import")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--baseline", help="compare the total import time with this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown flagged as regression")
+    args = parser.parse_args(argv)
+
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = {"benchmark": "import_time", "module": args.module, "python": sys.version.split()[0],
+              "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **measure(args.module, app_dir, args.runs)}
+
+    print(f"import {args.module}: {report['total_ms']} ms ({report['modules']} modules)")
+    for package, ms in list(report["slowest_packages_ms"].items())[:10]:
+        print(f"  {package:30s} {ms:>8.1f} ms")
+    exit_code = 0
+    if report["heavy_modules_imported"]:
+        print(f"heavy modules imported eagerly: {', '.join(report['heavy_modules_imported'])}")
+        exit_code = 1
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        ratio = report["total_ms"] / baseline["total_ms"] if baseline.get("total_ms") else None
+        report["comparison"] = {"baseline_total_ms": baseline.get("total_ms"),
+                                "ratio": round(ratio, 3) if ratio else None,
+                                "regression": bool(ratio and ratio > 1 + args.tolerance)}
+        print(f"baseline {baseline.get('total_ms')} ms, ratio {report['comparison']['ratio']}")
+        if report["comparison"]["regression"]:
+            print("REGRESSION")
+            exit_code = 1
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+"""
+Local stand-in for the LLM providers, to benchmark and load-test without Ollama or cloud keys.
+
+Serves the Ollama API (/api/generate, /api/chat, /api/tags) used by OllamaLLM and the
+OpenAI-compatible API (/v1/chat/completions, /v1/completions) used by the OpenAI integration and
+the DouBao/Kimi adapters, with streaming. When a prompt shows a {"result": ...} example, the answer
+follows its shape so that Llm.parse_json_data accepts it; other prompts get a paragraph of text.
+Answers are derived from a hash of the request and the seed, so runs are reproducible.
+
+Latency is drawn from a configurable distribution, streamed answers add a delay per token, and a
+share of the requests can fail with 429/5xx. With --record the requests are forwarded to a real
+provider and the responses saved to a cassette, which --replay serves afterwards.
+
+Usage (from the app directory):
+    python -m benchmarks.llm_stub_server --port 11435 --latency lognormal:0.8,0.5 --error-rate 0.02
+    OLLAMA_ENDPOINT=http://127.0.0.1:11435 \
+    DOUBAO_API_ENDPOINT=http://127.0.0.1:11435/v1/chat/completions python main.py
+
+    python -m benchmarks.llm_stub_server --record http://127.0.0.1:11434 --cassette data/benchmarks/ollama.jsonl
+    python -m benchmarks.llm_stub_server --replay data/benchmarks/ollama.jsonl
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+WORDS = [
+    "knowledge", "graph", "model", "question", "answer", "network", "language", "system", "data", "learning",
+    "research", "history", "science", "energy", "market", "city", "river", "protein", "theory", "design",
+    "analysis", "structure", "process", "method", "result", "value", "growth", "policy", "culture", "memory",
+]
+
+
+class LatencyModel:
+    """
+    Draws the latency of a response.
+
+    The spec is "fixed:SECONDS", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA"; the time to the first
+    token of a streamed answer follows the spec, each further token adds token_interval seconds.
+    """
+
+    def __init__(self, spec: str = "fixed:0", token_interval: float = 0.0):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        values = [float(value) for value in params.split(",") if value]
+        if kind == "fixed" and len(values) == 1:
+            self._draw = lambda rng: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._draw = lambda rng: rng.uniform(values[0], values[1])
+        elif kind == "lognormal" and len(values) == 2:
+            self._draw = lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+        else:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        self.token_interval = token_interval
+
+    def first_token(self, rng: random.Random) -> float:
+        return max(0.0, self._draw(rng))
+
+
+def request_key(path: str, body: Dict[str, Any]) -> str:
+    """Returns the cassette key of a request: the sha256 of its path and JSON body."""
+    content = json.dumps({"path": path, "body": body}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def find_result_example(prompt: str) -> Optional[Any]:
+    """Returns the value of the first {"result": ...} example of a prompt, or None when there is none."""
+    decoder = json.JSONDecoder()
+    start = prompt.find('{"result"')
+    while start >= 0:
+        try:
+            example, _ = decoder.raw_decode(prompt, start)
+            if isinstance(example, dict) and "result" in example:
+                return example["result"]
+        except json.JSONDecodeError:
+            pass
+        start = prompt.find('{"result"', start + 1)
+    return None
+
+
+def fill_example(example: Any, rng: random.Random, list_size: int, index: int = 0) -> Any:
+    """Fills a JSON example with synthetic values of the same shape."""
+    if isinstance(example, str):
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+    if isinstance(example, bool):
+        return rng.random() < 0.5
+    if isinstance(example, int):
+        return index + 1
+    if isinstance(example, float):
+        return round(rng.random(), 3)
+    if isinstance(example, list):
+        template = example[0] if example else "word"
+        return [fill_example(template, rng, list_size, i) for i in range(list_size)]
+    if isinstance(example, dict):
+        return {key: fill_example(value, rng, list_size, index) for key, value in example.items()}
+    return example
+
+
+def synthesize_answer(prompt: str, seed: int, list_size: int = 3, paragraph_words: int = 120) -> str:
+    """
+    Returns a deterministic answer to a prompt.
+
+    Args:
+        prompt (str): The prompt, or the concatenated chat messages.
+        seed (int): The seed of the run.
+        list_size (int): The number of items of the lists of a JSON answer.
+        paragraph_words (int): The number of words of a text answer.
+
+    Returns:
+        str: A {"result": ...} JSON answer shaped like the example of the prompt, or a paragraph of text.
+    """
+    digest = hashlib.sha256(f"{seed}:{prompt}".encode("utf-8")).digest()
+    rng = random.Random(int.from_bytes(digest[:8], "big"))
+    example = find_result_example(prompt)
+    if example is not None:
+        return json.dumps({"result": fill_example(example, rng, list_size)}, ensure_ascii=False)
+    words = [rng.choice(WORDS) for _ in range(paragraph_words)]
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+    return " ".join(sentences)
+
+
+def split_tokens(text: str) -> List[str]:
+    """Splits an answer into streamed tokens of one word, keeping the separators."""
+    tokens, current = [], ""
+    for char in text:
+        current += char
+        if char == " ":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+def prompt_of(path: str, body: Dict[str, Any]) -> str:
+    if "messages" in body:
+        return "\n".join(str(message.get("content", "")) for message in body.get("messages") or [])
+    prompt = body.get("prompt", "")
+    return "\n".join(prompt) if isinstance(prompt, list) else str(prompt)
+
+
+class StubState:
+    """The configuration, random generator, cassette and counters shared by the request handlers."""
+
+    def __init__(self, latency: LatencyModel, error_rate: float = 0.0, error_statuses: Tuple[int, ...] = (429,),
+                 seed: int = 42, list_size: int = 3, paragraph_words: int = 120, record: Optional[str] = None,
+                 replay: Optional[str] = None, cassette: Optional[str] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.seed = seed
+        self.list_size = list_size
+        self.paragraph_words = paragraph_words
+        self.record = record.rstrip("/") if record else None
+        self.cassette_path = cassette or replay
+        self.cassette: Dict[str, Dict[str, Any]] = {}
+        if replay:
+            with open(replay, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.cassette[entry["key"]] = entry
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "replayed": 0, "recorded": 0, "streamed": 0}
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] += 1
+
+    def draw(self) -> Tuple[float, Optional[int]]:
+        """Returns the latency of a request and the error status it fails with, if any."""
+        with self.lock:
+            delay = self.latency.first_token(self.rng)
+            status = self.rng.choice(self.error_statuses) if self.rng.random() < self.error_rate else None
+        return delay, status
+
+    def save(self, entry: Dict[str, Any]) -> None:
+        with self.lock:
+            self.cassette[entry["key"]] = entry
+            if self.cassette_path:
+                with open(self.cassette_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: StubState = None
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, content_type: str, chunks: Iterator[bytes]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "stub", "model": "stub"}]})
+        elif self.path == "/stub/stats":
+            self._send_json(200, dict(self.state.stats))
+        elif self.path in ("/", "/health"):
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+
+        path = self.path.split("?")[0]
+        if path not in ("/api/generate", "/api/chat", "/v1/chat/completions", "/v1/completions"):
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+
+        state = self.state
+        state.count("requests")
+        key = request_key(path, body)
+
+        if key in state.cassette:
+            state.count("replayed")
+            self._replay(state.cassette[key])
+            return
+        if state.record:
+            self._record(path, body, key)
+            return
+
+        delay, error_status = state.draw()
+        if error_status is not None:
+            state.count("errors")
+            time.sleep(min(delay, 0.05))
+            self._send_json(error_status, {"error": {"message": "simulated error", "code": error_status}})
+            return
+
+        answer = synthesize_answer(prompt_of(path, body), state.seed, state.list_size, state.paragraph_words)
+        stream = body.get("stream", path.startswith("/api/"))
+        model = body.get("model", "stub")
+        time.sleep(delay)
+        if stream:
+            state.count("streamed")
+            tokens = split_tokens(answer)
+            if path.startswith("/api/"):
+                self._send_stream("application/x-ndjson", self._ollama_chunks(path, model, tokens))
+            else:
+                self._send_stream("text/event-stream", self._openai_chunks(path, model, tokens))
+        elif path.startswith("/api/"):
+            self._send_json(200, self._ollama_message(path, model, answer, done=True))
+        else:
+            self._send_json(200, self._openai_message(path, model, answer))
+
+    def _pace(self, tokens: List[str]) -> Iterator[str]:
+        for i, token in enumerate(tokens):
+            if i and self.state.latency.token_interval:
+                time.sleep(self.state.latency.token_interval)
+            yield token
+
+    @staticmethod
+    def _ollama_message(path: str, model: str, text: str, done: bool, eval_count: int = 0) -> Dict[str, Any]:
+        message = {"model": model, "created_at": now_iso(), "done": done}
+        if path == "/api/chat":
+            message["message"] = {"role": "assistant", "content": text}
+        else:
+            message["response"] = text
+        if done:
+            message.update({"done_reason": "stop", "total_duration": 0, "eval_count": eval_count})
+        return message
+
+    def _ollama_chunks(self, path: str, model: str, tokens: List[str]) -> Iterator[bytes]:
+        for token in self._pace(tokens):
+            yield (json.dumps(self._ollama_message(path, model, token, done=False), ensure_ascii=False) + "\n").encode()
+        yield (json.dumps(self._ollama_message(path, model, "", done=True, eval_count=len(tokens))) + "\n").encode()
+
+    @staticmethod
+    def _openai_message(path: str, model: str, text: str) -> Dict[str, Any]:
+        if path == "/v1/completions":
+            choice = {"index": 0, "text": text, "finish_reason": "stop", "logprobs": None}
+            kind = "text_completion"
+        else:
+            choice = {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            kind = "chat.completion"
+        tokens = len(split_tokens(text))
+        return {"id": "stub", "object": kind, "created": int(time.time()), "model": model, "choices": [choice],
+                "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens}}
+
+    def _openai_chunks(self, path: str, model: str, tokens: List[str]) -> Iterator[bytes]:
+        for token in self._pace(tokens):
+            if path == "/v1/completions":
+                choice = {"index": 0, "text": token, "finish_reason": None, "logprobs": None}
+            else:
+                choice = {"index": 0, "delta": {"content": token}, "finish_reason": None}
+            event = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [choice]}
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+    def _replay(self, entry: Dict[str, Any]) -> None:
+        body = entry["body"].encode("utf-8")
+        self.send_response(entry["status"])
+        self.send_header("Content-Type", entry.get("content_type", "application/json"))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _record(self, path: str, body: Dict[str, Any], key: str) -> None:
+        import httpx
+
+        headers = {name: value for name, value in self.headers.items() if name.lower() == "authorization"}
+        try:
+            response = httpx.post(self.state.record + self.path, json=body, headers=headers, timeout=600)
+        except httpx.HTTPError as e:
+            self._send_json(502, {"error": f"recording failed: {e}"})
+            return
+        entry = {"key": key, "path": path, "status": response.status_code,
+                 "content_type": response.headers.get("Content-Type", "application/json"), "body": response.text}
+        if response.status_code == 200:
+            self.state.save(entry)
+            self.state.count("recorded")
+        self._replay(entry)
+
+
+def create_server(host: str, port: int, state: StubState) -> ThreadingHTTPServer:
+    """Creates the stub server; the handlers share the state."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in of the Ollama and OpenAI-compatible APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="time to the first token: fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of the requests that fail")
+    parser.add_argument("--error-statuses", default="429", help="comma separated statuses of the failures")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--list-size", type=int, default=3, help="number of items of the JSON lists")
+    parser.add_argument("--paragraph-words", type=int, default=120, help="number of words of text answers")
+    parser.add_argument("--record", help="forward the requests to this provider URL and record the responses")
+    parser.add_argument("--replay", help="serve the responses of this cassette, synthesizing the others")
+    parser.add_argument("--cassette", help="JSON lines file the recorded responses are appended to")
+    args = parser.parse_args(argv)
+
+    state = StubState(
+        latency=LatencyModel(args.latency, args.token_interval),
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(status) for status in args.error_statuses.split(",") if status),
+        seed=args.seed,
+        list_size=args.list_size,
+        paragraph_words=args.paragraph_words,
+        record=args.record,
+        replay=args.replay,
+        cassette=args.cassette,
+    )
+    server = create_server(args.host, args.port, state)
+    print(f"LLM stub server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+"""
+Cancellation of long running graph jobs.
+
+A job registers a CancellationToken for its knowledge library and checks it in memory. Cancelling
+the library flips the token of this process at once and sends a Postgres NOTIFY, which the
+listener of every other process turns into a flip of their token. A job also polls the library
+status every GRAPH_CANCEL_POLL_SECONDS, in case the listener is not running or the status was
+changed without a notification.
+"""
+
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict
+
+from . import config
+from .extends_logger import logger
+
+CANCEL_CHANNEL = "wisenet_graph_cancel"
+
+
+class CancellationToken:
+    """Tells a running job of a knowledge library whether it has been cancelled."""
+
+    def __init__(self, lib_id: int):
+        self.lib_id = lib_id
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def canceled(self) -> bool:
+        return self._event.is_set()
+
+
+class CancellationRegistry:
+    """
+    Process-wide registry of the cancellation tokens of the running jobs, keyed by knowledge library.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._tokens = {}
+                    instance._lock = threading.Lock()
+                    instance._listen_connection = None
+                    cls._instance = instance
+        return cls._instance
+
+    def register(self, lib_id: int) -> CancellationToken:
+        """Registers a new token for a job of the knowledge library, replacing the token of an earlier job."""
+        token = CancellationToken(lib_id)
+        with self._lock:
+            self._tokens[lib_id] = token
+        return token
+
+    def unregister(self, token: CancellationToken) -> None:
+        with self._lock:
+            if self._tokens.get(token.lib_id) is token:
+                del self._tokens[token.lib_id]
+
+    def cancel(self, lib_id: int) -> bool:
+        """
+        Cancels the job of a knowledge library running in this process.
+
+        Returns:
+            bool: Whether a job of the library was running in this process.
+        """
+        with self._lock:
+            token = self._tokens.get(lib_id)
+        if token is None:
+            return False
+        token.cancel()
+        logger.info(f"Cancelled the running job of lib_id: {lib_id}")
+        return True
+
+    def running_jobs(self) -> Dict[int, bool]:
+        """Returns the knowledge libraries with a job running in this process and whether it is cancelled."""
+        with self._lock:
+            return {lib_id: token.canceled for lib_id, token in self._tokens.items()}
+
+    @staticmethod
+    async def notify(session, lib_id: int) -> None:
+        """
+        Notifies the other processes that the job of a knowledge library is cancelled.
+
+        The notification is sent with the transaction of the session, i.e. when the status update commits.
+        """
+        from sqlalchemy import text
+        await session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                              {"channel": CANCEL_CHANNEL, "payload": str(lib_id)})
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            self.cancel(int(payload))
+        except ValueError:
+            logger.warning(f"Invalid cancellation notification: {payload}")
+
+    async def start_listener(self) -> None:
+        """Listens to the cancellation notifications on a dedicated Postgres connection."""
+        if self._listen_connection is not None:
+            return
+        connection = None
+        try:
+            from .database import engine
+            # an unreachable database must not hold the startup up
+            connection = await asyncio.wait_for(engine.connect(), timeout=5)
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.add_listener(CANCEL_CHANNEL, self._on_notification)
+            self._listen_connection = connection
+            logger.info(f"Listening to cancellations on channel {CANCEL_CHANNEL}")
+        except Exception as e:
+            logger.warning(f"Failed to listen to cancellations, relying on polling: {e}")
+            if connection is not None:
+                await connection.close()
+
+    async def stop_listener(self) -> None:
+        connection, self._listen_connection = self._listen_connection, None
+        if connection is not None:
+            await connection.close()
+
+    @staticmethod
+    async def watch(token: CancellationToken, is_canceled: Callable[[], Awaitable[bool]]) -> None:
+        """
+        Polls the status of a job every GRAPH_CANCEL_POLL_SECONDS until it is cancelled.
+
+        Args:
+            token (CancellationToken): The token of the job.
+            is_canceled (Callable[[], Awaitable[bool]]): Reads whether the job is cancelled, e.g. from the database.
+        """
+        if config.GRAPH_CANCEL_POLL_SECONDS <= 0:
+            return
+        while not token.canceled:
+            await asyncio.sleep(config.GRAPH_CANCEL_POLL_SECONDS)
+            try:
+                if await is_canceled():
+                    token.cancel()
+            except Exception as e:
+                logger.warning(f"Failed to poll the cancellation of lib_id: {token.lib_id}: {e}")
+
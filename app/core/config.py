@@ -45,16 +45,134 @@ DOUBAO_1_5_PRO_256K_MODEL: str = os.getenv("DOUBAO_1_5_PRO_256K_MODEL", "")
 DOUBAO_1_5_LITE_32K_MODEL: str = os.getenv("DOUBAO_1_5_LITE_32K_MODEL", "")
 DOUBAO_PRO_32K_MODEL: str = os.getenv("DOUBAO_PRO_32K_MODEL", "")
 DOUBAO_API_ENDPOINT: str = os.getenv("DOUBAO_API_ENDPOINT", "https://ark.cn-beijing.volces.com/api")
+MOONSHOT_API_KEY: str = os.getenv("MOONSHOT_API_KEY", "")
+MOONSHOT_MODEL: str = os.getenv("MOONSHOT_MODEL", "moonshot-v1-32k")
+MOONSHOT_BASE_API_URL: str = os.getenv("MOONSHOT_BASE_API_URL", "https://api.moonshot.cn/v1/chat/completions")
+# seconds to wait before each Kimi request, to stay below the rate limit of the account
+MOONSHOT_MODEL_REQUEST_INTERVAL: float = float(os.getenv("MOONSHOT_MODEL_REQUEST_INTERVAL", 0))
 DASHSCOPE_API_KEY: str = os.getenv("DASHSCOPE_API_KEY")
 OLLAMA_ENDPOINT: str = os.getenv("OLLAMA_ENDPOINT", "http://127.0.0.1:11434")
 DEFAULT_LLM_NAME: str = os.getenv("DEFAULT_LLM_NAME", "llama3.1")
 LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", 60.0))
+# persistent cache of LLM responses keyed by (model, sampling parameters, prompt hash), off by default:
+# with it, regenerating a subject replays the previous answers instead of asking the model again
+LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "./data/cache/llm_cache.db")
+# the least recently used responses are evicted above this number of entries
+LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 50000))
+# seconds a cached response stays valid, 0 means it never expires
+LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", 604800))
+# analyze the title, keywords and tags of a node with one LLM call, falling back to one call per field
+NODE_ANALYSIS_SINGLE_CALL: bool = os.getenv("NODE_ANALYSIS_SINGLE_CALL", "true").lower() == "true"
+# concurrency and rate limits of the LLM calls of each provider, 0 means unlimited for the rates
+LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", 8))
+LLM_REQUESTS_PER_SECOND: float = float(os.getenv("LLM_REQUESTS_PER_SECOND", 0))
+LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", 0))
+# per provider or model overrides as name=requests_per_second:tokens_per_minute:max_in_flight
+LLM_RATE_LIMITS: str = os.getenv("LLM_RATE_LIMITS", "ollama=0:0:4")
+# on 429/5xx or a timeout the limits are halved and calls pause for this many seconds,
+# each successful call restores this fraction of the rates
+LLM_RATE_LIMIT_BACKOFF_SECONDS: float = float(os.getenv("LLM_RATE_LIMIT_BACKOFF_SECONDS", 2.0))
+LLM_RATE_LIMIT_RECOVERY: float = float(os.getenv("LLM_RATE_LIMIT_RECOVERY", 0.05))
+# retries of a call that failed because the provider was overloaded
+LLM_RATE_LIMIT_RETRIES: int = int(os.getenv("LLM_RATE_LIMIT_RETRIES", 3))
+# documents above this estimated number of tokens are summarized with map-reduce instead of one prompt
+LLM_SUMMARY_STUFF_MAX_TOKENS: int = int(os.getenv("LLM_SUMMARY_STUFF_MAX_TOKENS", 6000))
+# tokens of each group summarized in the map step, and the number of groups summarized at once
+LLM_SUMMARY_GROUP_TOKENS: int = int(os.getenv("LLM_SUMMARY_GROUP_TOKENS", 3000))
+LLM_SUMMARY_MAP_CONCURRENCY: int = int(os.getenv("LLM_SUMMARY_MAP_CONCURRENCY", 4))
+# hedge the chat summaries: when the LLM has not answered within the LLM_HEDGE_QUANTILE of its recent
+# latency, the request is also sent to LLM_HEDGE_MODEL and the first answer wins
+LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MODEL: str = os.getenv("LLM_HEDGE_MODEL", "")
+LLM_HEDGE_QUANTILE: float = float(os.getenv("LLM_HEDGE_QUANTILE", 0.9))
+# latencies kept per LLM, and the number needed before requests are hedged
+LLM_LATENCY_WINDOW: int = int(os.getenv("LLM_LATENCY_WINDOW", 200))
+LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+# fit the prompts into the context window of each model, reserving LLM_OUTPUT_TOKEN_RESERVE tokens (at most a
+# quarter of the window) for the answer; the largest input of a prompt over its budget is truncated
+LLM_TOKEN_BUDGET_ENABLED: bool = os.getenv("LLM_TOKEN_BUDGET_ENABLED", "true").lower() == "true"
+LLM_OUTPUT_TOKEN_RESERVE: int = int(os.getenv("LLM_OUTPUT_TOKEN_RESERVE", 2048))
+# context window of the Ollama models, passed to Ollama as num_ctx
+OLLAMA_NUM_CTX: int = int(os.getenv("OLLAMA_NUM_CTX", 8192))
+# overrides of the context windows and of the USD prices per 1000 prompt:completion tokens, e.g.
+# "qwen-max=32768,llama3.1=16384" and "gpt-4o=0.0025:0.01"
+LLM_CONTEXT_WINDOWS: str = os.getenv("LLM_CONTEXT_WINDOWS", "")
+LLM_TOKEN_PRICES: str = os.getenv("LLM_TOKEN_PRICES", "")
+# LLM instances are pooled by model name and parameters, the least recently used are dropped above this size
+LLM_CLIENT_POOL_SIZE: int = int(os.getenv("LLM_CLIENT_POOL_SIZE", 32))
+# connection limits of the keep-alive HTTP client shared by the LLM integrations
+LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 100))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+LLM_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", 30.0))
+# negotiate HTTP/2 in the async LLM client when the endpoint supports it (needs the h2 package)
+LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+#--------------------------embedding config-------------------------------
+# number of sentences encoded in one forward pass by the embedding models
+EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+# how SBERT splits texts: "sentence" encodes each sentence truncated to max_tokens_each_chunk,
+# "token_window" packs sentences into windows of the model token limit without truncation
+EMBEDDING_CHUNK_STRATEGY: str = os.getenv("EMBEDDING_CHUNK_STRATEGY", "sentence")
+# step in tokens between the windows of a sentence longer than a window, 0 means no overlap
+EMBEDDING_CHUNK_STRIDE: int = int(os.getenv("EMBEDDING_CHUNK_STRIDE", 96))
+# persistent embedding cache keyed by (model, max tokens of each chunk, text hash)
+EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./data/cache/embedding_cache.db")
+# the least recently used vectors are evicted above this number of entries
+EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200000))
+# concurrent search requests are collected for up to EMBEDDING_QUEUE_MAX_WAIT_MS and embedded as one batch
+EMBEDDING_QUEUE_MAX_BATCH_SIZE: int = int(os.getenv("EMBEDDING_QUEUE_MAX_BATCH_SIZE", 64))
+EMBEDDING_QUEUE_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_QUEUE_MAX_WAIT_MS", 5))
+# the sbert-onnx embedding model is exported to this directory once (requires onnx and onnxruntime)
+EMBEDDING_ONNX_DIR: str = os.getenv("EMBEDDING_ONNX_DIR", "./data/onnx")
+# apply dynamic int8 quantization to the exported model
+EMBEDDING_ONNX_QUANTIZE: bool = os.getenv("EMBEDDING_ONNX_QUANTIZE", "true").lower() == "true"
+# intra-op threads of ONNX Runtime, 0 lets ONNX Runtime decide
+EMBEDDING_ONNX_THREADS: int = int(os.getenv("EMBEDDING_ONNX_THREADS", 0))
+# minimum cosine similarity between the ONNX and the torch embeddings of the parity check
+EMBEDDING_ONNX_PARITY_THRESHOLD: float = float(os.getenv("EMBEDDING_ONNX_PARITY_THRESHOLD", 0.98))
+#--------------------------compute config-------------------------------
+# threads running embeddings off the event loop
+COMPUTE_THREAD_WORKERS: int = int(os.getenv("COMPUTE_THREAD_WORKERS", 4))
+# processes running spaCy NER, each loads its own spaCy models; 0 runs NER in the compute threads
+NLP_PROCESS_WORKERS: int = int(os.getenv("NLP_PROCESS_WORKERS", 1))
+# torch intra-op threads, keep COMPUTE_THREAD_WORKERS * TORCH_NUM_THREADS close to the cpu count; 0 keeps the torch default
+TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", 0))
+#--------------------------warm-up config-------------------------------
+# preload models and open connection pools on startup, /health/ready turns green when done
+WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# comma separated warm-up steps: embedding, ner, neo4j, gds, postgres
+WARMUP_STEPS: str = os.getenv("WARMUP_STEPS", "embedding,ner,neo4j,gds,postgres")
+WARMUP_EMBEDDING_MODELS: str = os.getenv("WARMUP_EMBEDDING_MODELS", "sbert")
+WARMUP_NER_LANGUAGES: str = os.getenv("WARMUP_NER_LANGUAGES", "en,zh")
+WARMUP_POSTGRES_CONNECTIONS: int = int(os.getenv("WARMUP_POSTGRES_CONNECTIONS", 5))
+# seconds to wait before retrying the failed warm-up steps
+WARMUP_RETRY_SECONDS: float = float(os.getenv("WARMUP_RETRY_SECONDS", 10))
 #--------------------------graph config-------------------------------
 DEEP_LIMIT:int = int(os.getenv("DEEP_LIMIT", 10))
 # default genereate quetions count
 DEFAULT_GENERATE_QUESTIONS_COUNT:int = int(os.getenv("DEFAULT_GENERATE_QUESTIONS_COUNT", 3))
 # default genereate prompts count
 DEFAULT_GENERATE_PROMPTS_COUNT:int = int(os.getenv("DEFAULT_GENERATE_PROMPTS_COUNT", 3))
+# nodes expanded concurrently by the breadth-first graph generation
+GRAPH_GENERATION_WORKERS: int = int(os.getenv("GRAPH_GENERATION_WORKERS", 4))
+# caps on the nodes created and the LLM calls made by one graph generation, 0 for no cap
+GRAPH_GENERATION_MAX_NODES: int = int(os.getenv("GRAPH_GENERATION_MAX_NODES", 0))
+GRAPH_GENERATION_MAX_LLM_CALLS: int = int(os.getenv("GRAPH_GENERATION_MAX_LLM_CALLS", 0))
+# generated nodes are written in batches: when this many are queued, and every GRAPH_WRITE_FLUSH_SECONDS
+GRAPH_WRITE_BATCH_SIZE: int = int(os.getenv("GRAPH_WRITE_BATCH_SIZE", 200))
+GRAPH_WRITE_FLUSH_SECONDS: float = float(os.getenv("GRAPH_WRITE_FLUSH_SECONDS", 2.0))
+# cancellations reach the running jobs through Postgres notifications; the jobs also poll their library
+# status at this interval, 0 to rely on the notifications only
+GRAPH_CANCEL_POLL_SECONDS: float = float(os.getenv("GRAPH_CANCEL_POLL_SECONDS", 10.0))
+# a generation checkpoints its progress as it goes; a GENERATING library whose checkpoint is older than this
+# is considered interrupted and can be resumed
+GRAPH_CHECKPOINT_STALE_SECONDS: float = float(os.getenv("GRAPH_CHECKPOINT_STALE_SECONDS", 300.0))
+# generated prompts whose embedding is at least this similar to a prompt already generated for the subject
+# are linked to it with RELATED_TO instead of expanded
+GRAPH_PROMPT_DEDUP_ENABLED: bool = os.getenv("GRAPH_PROMPT_DEDUP_ENABLED", "false").lower() == "true"
+GRAPH_PROMPT_DEDUP_THRESHOLD: float = float(os.getenv("GRAPH_PROMPT_DEDUP_THRESHOLD", 0.92))
+GRAPH_PROMPT_DEDUP_MODEL: str = os.getenv("GRAPH_PROMPT_DEDUP_MODEL", "sbert")
 # UPLOAD_DIR
 UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./data/upload")
 # MAX_FILE_SIZE
@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Optional, List, Dict, Any
 import logging
-from langchain_neo4j import Neo4jGraph
+import threading
 from core.config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
 from core.extends_logger import logger
 from core.i18n import _
@@ -10,8 +10,33 @@ import reprlib
 
 
 logging.getLogger("neo4j").setLevel(logging.ERROR)
-graph = Neo4jGraph(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD,
-                   driver_config={"max_connection_pool_size": 100, "max_transaction_retry_time": 10})
+
+
+class LazyNeo4jGraph:
+    """
+    Proxy of the shared Neo4jGraph that imports langchain_neo4j and connects on first use,
+    so importing the graph package neither pays for the import nor requires a running Neo4j.
+    """
+
+    def __init__(self):
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def get_graph(self):
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    from langchain_neo4j import Neo4jGraph
+                    self._graph = Neo4jGraph(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD,
+                                             driver_config={"max_connection_pool_size": 100,
+                                                            "max_transaction_retry_time": 10})
+        return self._graph
+
+    def __getattr__(self, name):
+        return getattr(self.get_graph(), name)
+
+
+graph = LazyNeo4jGraph()
 
 
 class RelationshipType(Enum):
@@ -36,6 +61,10 @@ class DatabaseError(Exception):
 
 
 class BaseModel:
+    # (class, label) pairs whose indexes this process has created, every save used to create them again
+    _created_indexes = set()
+    _created_indexes_lock = threading.Lock()
+
     vector_dimensions = 768
     similarity_function = "cosine"
     lib_id_index_name = "lib_id_index"
@@ -62,9 +91,15 @@ class BaseModel:
         """
         Create necessary indexes for a given node label.
 
+        The indexes are created once per process; later calls return without querying the database.
+
         :param node_label: The label of the node for which indexes are to be created.
         :raises DatabaseError: If there is an error during index creation.
         """
+        index_key = (type(self).__name__, node_label)
+        if index_key in BaseModel._created_indexes:
+            return
+
         queries = [
             f"""CREATE INDEX {self.lib_id_index_name} IF NOT EXISTS FOR (n:{node_label}) ON (n.lib_id);""",
             f"""CREATE INDEX {self.subject_id_index_name} IF NOT EXISTS FOR (n:{node_label}) ON (n.subject_id);""",
@@ -108,6 +143,8 @@ class BaseModel:
             except Exception as e:
                 logger.error(f"Failed to create index: {e}, Query: {query}")
                 raise DatabaseError(_("Failed to create index"))
+        with BaseModel._created_indexes_lock:
+            BaseModel._created_indexes.add(index_key)
 
 
 class BaseNode(ABC):
@@ -0,0 +1,266 @@
+import asyncio
+import datetime
+from typing import List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import delete, select, update
+
+import core.database as db
+from core.database import DBBase
+from core.extends_logger import logger
+from models.models import GraphGenerationCheckpoint, GraphGenerationJob
+from .node import Node
+from .node_write_buffer import PendingNode
+
+JOB_RUNNING: str = "RUNNING"
+JOB_DONE: str = "DONE"
+# stopped by a cancellation or a cap of the run, the job can be resumed
+JOB_STOPPED: str = "STOPPED"
+JOB_FAILED: str = "FAILED"
+
+CHECKPOINT_PENDING: str = "PENDING"
+CHECKPOINT_EXPANDED: str = "EXPANDED"
+
+GeneratedNode = Union[Node, PendingNode]
+
+
+class CheckpointBatch:
+    """The progress recorded by a generation since the previous flush of its checkpoint."""
+
+    def __init__(self, frontier: List[GeneratedNode], answers: List[Tuple[GeneratedNode, str]],
+                 expanded: List[Tuple[GeneratedNode, List[GeneratedNode], List[GeneratedNode]]]):
+        self.frontier = frontier
+        self.answers = answers
+        self.expanded = expanded
+
+
+class GenerationCheckpoint:
+    """
+    Persists the progress of a graph generation job in Postgres so that an interrupted run can resume.
+
+    The checkpoint holds a row per prompt node of the frontier, with its depth and, once the LLM has
+    answered it, the answer. A node is marked EXPANDED in the same transaction that adds the prompts
+    generated from it, and only once they are written to the graph, so the PENDING rows always describe
+    the nodes left to expand. The progress is recorded in memory and persisted when the generated nodes
+    are flushed, which also serves as the heartbeat of the job.
+    """
+
+    def __init__(self, lib_id: int, subject_id: int):
+        self.lib_id = lib_id
+        self.subject_id = subject_id
+        self.job_id: Optional[int] = None
+        self._frontier: List[GeneratedNode] = []
+        self._answers: List[Tuple[GeneratedNode, str]] = []
+        self._expanded: List[Tuple[GeneratedNode, List[GeneratedNode], List[GeneratedNode]]] = []
+
+    @staticmethod
+    async def create_tables() -> None:
+        """
+        Creates the checkpoint tables if they do not exist, for the databases initialized before them by
+        init.sql, which only runs when the database volume is created.
+        """
+        async def create_all():
+            async with db.engine.begin() as connection:
+                await connection.run_sync(DBBase.metadata.create_all, tables=[GraphGenerationJob.__table__,
+                                                                              GraphGenerationCheckpoint.__table__])
+
+        try:
+            # an unreachable database must not hold the startup up
+            await asyncio.wait_for(create_all(), timeout=5)
+        except Exception as e:
+            logger.warning(f"Failed to create the graph generation checkpoint tables: {e}")
+
+    async def start(self, llm_name: str, max_depth: int) -> Optional[int]:
+        """
+        Starts a new job for the subject, discarding the checkpoint of an earlier job.
+
+        Args:
+            llm_name (str): Name of the LLM of the job.
+            max_depth (int): Maximum depth of the job.
+
+        Returns:
+            Optional[int]: The ID of the job, or None when the checkpoint cannot be written, in which
+                case the generation runs without a checkpoint.
+        """
+        try:
+            self.job_id = await self._create_job(llm_name, max_depth)
+        except Exception as e:
+            logger.error(f"Failed to start the checkpoint of lib_id: {self.lib_id}, subject_id: {self.subject_id}, "
+                         f"generating without a checkpoint: {e}")
+            self.job_id = None
+            return None
+        logger.debug(f"Started graph generation job {self.job_id} for lib_id: {self.lib_id}, "
+                     f"subject_id: {self.subject_id}")
+        return self.job_id
+
+    async def _create_job(self, llm_name: str, max_depth: int) -> int:
+        async with db.get_async_session() as session:
+            job_ids = select(GraphGenerationJob.id).filter(GraphGenerationJob.lib_id == self.lib_id,
+                                                           GraphGenerationJob.subject_id == self.subject_id)
+            await session.execute(delete(GraphGenerationCheckpoint)
+                                  .where(GraphGenerationCheckpoint.job_id.in_(job_ids)))
+            await session.execute(delete(GraphGenerationJob)
+                                  .where(GraphGenerationJob.lib_id == self.lib_id,
+                                         GraphGenerationJob.subject_id == self.subject_id))
+            now = datetime.datetime.now()
+            job = GraphGenerationJob(lib_id=self.lib_id, subject_id=self.subject_id, llm_name=llm_name,
+                                     max_depth=max_depth, status=JOB_RUNNING, create_time=now, update_time=now)
+            session.add(job)
+            await session.flush()
+            job_id = job.id
+            await session.commit()
+        return job_id
+
+    @staticmethod
+    async def find_job(lib_id: int, subject_id: int) -> Optional[GraphGenerationJob]:
+        """
+        Finds the latest job of a subject.
+
+        Args:
+            lib_id (int): ID of the knowledge library.
+            subject_id (int): ID of the subject.
+
+        Returns:
+            Optional[GraphGenerationJob]: The job, or None if the subject has no checkpoint.
+        """
+        async with db.get_async_session() as session:
+            result = await session.execute(select(GraphGenerationJob)
+                                           .filter(GraphGenerationJob.lib_id == lib_id,
+                                                   GraphGenerationJob.subject_id == subject_id)
+                                           .order_by(GraphGenerationJob.id.desc()).limit(1))
+            job = result.scalar_one_or_none()
+            if job:
+                session.expunge(job)
+            return job
+
+    async def load(self) -> List[GraphGenerationCheckpoint]:
+        """
+        Resumes the latest job of the subject.
+
+        Returns:
+            List[GraphGenerationCheckpoint]: The PENDING rows of the job, shallowest first.
+
+        Raises:
+            ValueError: If the subject has no job to resume.
+        """
+        job = await self.find_job(self.lib_id, self.subject_id)
+        if not job:
+            raise ValueError(f"No graph generation to resume for lib_id: {self.lib_id}, subject_id: {self.subject_id}")
+        self.job_id = job.id
+        async with db.get_async_session() as session:
+            result = await session.execute(select(GraphGenerationCheckpoint)
+                                           .filter(GraphGenerationCheckpoint.job_id == job.id,
+                                                   GraphGenerationCheckpoint.status == CHECKPOINT_PENDING)
+                                           .order_by(GraphGenerationCheckpoint.depth, GraphGenerationCheckpoint.id))
+            rows = list(result.scalars().all())
+            session.expunge_all()
+        await self.finish(JOB_RUNNING)
+        logger.info(f"Resuming graph generation job {job.id} with {len(rows)} pending nodes for lib_id: "
+                    f"{self.lib_id}, subject_id: {self.subject_id}")
+        return rows
+
+    def add_pending(self, node: GeneratedNode) -> None:
+        """Records a node to expand that no expanded node has generated, i.e. the subject node."""
+        self._frontier.append(node)
+
+    def answered(self, node: GeneratedNode, answer: str) -> None:
+        """Records the answer of the LLM to a node, which a resumed job reuses instead of asking again."""
+        self._answers.append((node, answer))
+
+    def expanded(self, node: GeneratedNode, answer_node: Optional[GeneratedNode] = None,
+                 prompt_nodes: Sequence[GeneratedNode] = ()) -> None:
+        """
+        Records that a node is expanded.
+
+        Args:
+            node (GeneratedNode): The expanded node.
+            answer_node (Optional[GeneratedNode]): The answer node written below it, if any.
+            prompt_nodes (Sequence[GeneratedNode]): The prompt nodes generated from the answer, now to expand.
+        """
+        written = [answer_node] if answer_node is not None else []
+        self._expanded.append((node, written + list(prompt_nodes), list(prompt_nodes)))
+
+    def take(self) -> CheckpointBatch:
+        """Takes the progress recorded since the previous call, to be flushed once the nodes are written."""
+        batch = CheckpointBatch(self._frontier, self._answers, self._expanded)
+        self._frontier, self._answers, self._expanded = [], [], []
+        return batch
+
+    def _put_back(self, batch: CheckpointBatch) -> None:
+        self._frontier = batch.frontier + self._frontier
+        self._answers = batch.answers + self._answers
+        self._expanded = batch.expanded + self._expanded
+
+    async def flush(self, batch: CheckpointBatch) -> None:
+        """
+        Persists a batch taken before the generated nodes were written, in one transaction.
+
+        A node whose generated prompts could not be written stays pending and is expanded again on
+        resume. A batch that cannot be persisted is put back, to be persisted with the next one.
+
+        Args:
+            batch (CheckpointBatch): The batch returned by take.
+        """
+        if self.job_id is None:
+            return
+        frontier, answers, expanded = self._resolve(batch)
+        now = datetime.datetime.now()
+        try:
+            async with db.get_async_session() as session:
+                session.add_all([GraphGenerationCheckpoint(job_id=self.job_id, element_id=node.element_id,
+                                                           content=node.content, depth=node.depth,
+                                                           status=CHECKPOINT_PENDING, create_time=now,
+                                                           update_time=now)
+                                 for node in frontier])
+                await session.flush()
+                for element_id, answer in answers:
+                    await session.execute(update(GraphGenerationCheckpoint)
+                                          .where(GraphGenerationCheckpoint.job_id == self.job_id,
+                                                 GraphGenerationCheckpoint.element_id == element_id)
+                                          .values(answer=answer, update_time=now))
+                if expanded:
+                    await session.execute(update(GraphGenerationCheckpoint)
+                                          .where(GraphGenerationCheckpoint.job_id == self.job_id,
+                                                 GraphGenerationCheckpoint.element_id.in_(expanded))
+                                          .values(status=CHECKPOINT_EXPANDED, update_time=now))
+                # the update time of the job tells a running job from an interrupted one
+                await session.execute(update(GraphGenerationJob).where(GraphGenerationJob.id == self.job_id)
+                                      .values(update_time=now))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Failed to checkpoint graph generation job {self.job_id}: {e}")
+            self._put_back(batch)
+
+    @staticmethod
+    def _resolve(batch: CheckpointBatch) -> Tuple[List[GeneratedNode], List[Tuple[str, str]], List[str]]:
+        """
+        Resolves a batch into the nodes to add to the frontier, the answers to store by element ID and
+        the element IDs of the expanded nodes, leaving out the nodes that were not written.
+        """
+        frontier = [node for node in batch.frontier if node.element_id]
+        expanded = []
+        for node, written, prompt_nodes in batch.expanded:
+            if node.element_id and all(child.element_id for child in written):
+                expanded.append(node.element_id)
+                frontier.extend(prompt_nodes)
+            else:
+                logger.warning(f"The nodes generated from node {node.element_id} were not written, "
+                               f"it is expanded again on resume")
+        answers = [(node.element_id, answer) for node, answer in batch.answers if node.element_id]
+        return frontier, answers, expanded
+
+    async def finish(self, status: str) -> None:
+        """
+        Sets the status of the job.
+
+        Args:
+            status (str): JOB_RUNNING, JOB_DONE, JOB_STOPPED or JOB_FAILED.
+        """
+        if self.job_id is None:
+            return
+        try:
+            async with db.get_async_session() as session:
+                await session.execute(update(GraphGenerationJob).where(GraphGenerationJob.id == self.job_id)
+                                      .values(status=status, update_time=datetime.datetime.now()))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Failed to set the status of graph generation job {self.job_id} to {status}: {e}")
@@ -1,24 +1,30 @@
 import asyncio
-from typing import Dict, List, Any, Optional
+import itertools
+from typing import Dict, List, Optional, Sequence, Union
 
 from sqlalchemy import select
 from sqlalchemy.orm import make_transient
 
 import core.database as db
 from ai.llm import Llm
-from core.config import DEEP_LIMIT, LLM_TIMEOUT
+from ai.prompt_dedup import PromptDedupIndex
+from core import config
+from core.cancellation import CancellationRegistry, CancellationToken
+from core.config import DEEP_LIMIT
 from core.extends_logger import logger
 from core.i18n import _
 from models.models import KnowledgeLib
-from . import RelationshipType, graph
+from . import NodeType, graph
+from .generation_checkpoint import JOB_DONE, JOB_FAILED, JOB_STOPPED, GenerationCheckpoint
 from .node import Node
-from .relationship import Relationship
+from .node_write_buffer import NodeWriteBuffer, PendingNode
 
 GENERATING_CANCELED: str = "PENDING"
 
 class KnowledgeGraphGenerator:
     def __init__(self, lib_name: str, title: str, llm_name: str, max_depth: int = 4, lib_id: int = 1,
-                 subject_id: int = 1):
+                 subject_id: int = 1, workers: Optional[int] = None, max_nodes: Optional[int] = None,
+                 max_llm_calls: Optional[int] = None, dedup_prompts: Optional[bool] = None):
         """
         Initializes the KnowledgeGraphGenerator.
 
@@ -29,6 +35,13 @@ class KnowledgeGraphGenerator:
             max_depth (int): Maximum depth of the knowledge graph. Defaults to 4.
             lib_id (int): ID of the knowledge library. Defaults to 1.
             subject_id (int): ID of the subject. Defaults to 1.
+            workers (Optional[int]): Number of nodes expanded concurrently. Defaults to GRAPH_GENERATION_WORKERS.
+            max_nodes (Optional[int]): Cap on the nodes created by the run, 0 for no cap.
+                Defaults to GRAPH_GENERATION_MAX_NODES.
+            max_llm_calls (Optional[int]): Cap on the LLM calls of the run, 0 for no cap.
+                Defaults to GRAPH_GENERATION_MAX_LLM_CALLS.
+            dedup_prompts (Optional[bool]): Whether generated prompts similar to a prompt already generated
+                for the subject are linked to it instead of expanded. Defaults to GRAPH_PROMPT_DEDUP_ENABLED.
 
         Raises:
             ValueError: If lib_name, title, or max_depth are invalid.
@@ -51,14 +64,29 @@ class KnowledgeGraphGenerator:
         self.subject_id = subject_id
         self.max_depth = max_depth
         self.progress = 0  # Tracks the progress of graph generation
+        self.workers = max(1, workers if workers is not None else config.GRAPH_GENERATION_WORKERS)
+        self.max_nodes = max_nodes if max_nodes is not None else config.GRAPH_GENERATION_MAX_NODES
+        self.max_llm_calls = max_llm_calls if max_llm_calls is not None else config.GRAPH_GENERATION_MAX_LLM_CALLS
+        self.nodes_created = 0
+        self.llm_calls = 0
+        self.canceled = False
+        self._caps_reached = set()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._write_buffer: Optional[NodeWriteBuffer] = None
+        self._cancel_token: Optional[CancellationToken] = None
+        self._checkpoint = GenerationCheckpoint(lib_id, subject_id)
+        self._stored_answers: Dict[str, str] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.failed_nodes = 0
+        dedup_prompts = dedup_prompts if dedup_prompts is not None else config.GRAPH_PROMPT_DEDUP_ENABLED
+        self._prompt_index: Optional[PromptDedupIndex] = PromptDedupIndex() if dedup_prompts else None
 
     async def __call__(self):
         """
         Entry point for generating the knowledge graph asynchronously.
         """
-        knowledge_lib = await self._get_knowledge_lib()
-        if knowledge_lib and knowledge_lib.status == GENERATING_CANCELED:
-            logger.info("Knowledge lib is generating canceled")
+        if await self._is_canceled():
             return
 
         root_node = self._get_or_create_root_node()
@@ -67,8 +95,37 @@ class KnowledgeGraphGenerator:
         await self._delete_existing_nodes()
         logger.debug(f"generate_knowledge_graph deep: 1, title: {self.title}")
 
+        await self._checkpoint.start(self.llm_name, self.max_depth)
         subject_node = Node.add_subject_node(self.lib_id, self.subject_id, self.title, depth=1)
-        await self.generate_knowledge_graph_recursive(subject_node)
+        self._checkpoint.add_pending(subject_node)
+        await self.generate_knowledge_graph(subject_node)
+
+    async def resume(self):
+        """
+        Resumes the interrupted generation of the subject from its checkpoint.
+
+        The pending nodes are expanded again, after deleting what an interrupted expansion had written
+        below them; the nodes already expanded are kept and the answers the LLM had given to pending
+        nodes are reused.
+
+        Raises:
+            ValueError: If the subject has no generation to resume.
+        """
+        if await self._is_canceled():
+            return
+
+        self._get_or_create_root_node()
+        rows = await self._checkpoint.load()
+        await self._delete_partial_expansions([row.element_id for row in rows])
+
+        pending_nodes = []
+        for row in rows:
+            pending_nodes.append(Node(lib_id=self.lib_id, subject_id=self.subject_id, element_id=row.element_id,
+                                      content=row.content, depth=row.depth,
+                                      type=NodeType.SUBJECT if row.depth == 1 else NodeType.PROMPT))
+            if row.answer:
+                self._stored_answers[row.element_id] = row.answer
+        await self.generate_knowledge_graph(*pending_nodes)
 
     async def _get_knowledge_lib(self) -> Optional[KnowledgeLib]:
         """
@@ -114,100 +171,240 @@ class KnowledgeGraphGenerator:
             delete_query = "MATCH (n) WHERE n.lib_id=$lib_id AND n.subject_id=$subject_id DETACH DELETE n"
             graph.query(delete_query, {"lib_id": self.lib_id, "subject_id": self.subject_id})
 
-    async def generate_knowledge_graph_recursive(self, parent_node: Node):
+    async def _delete_partial_expansions(self, element_ids: List[str]):
         """
-        Recursively generates the knowledge graph starting from the parent node asynchronously.
+        Deletes the answers, and the nodes below them, that interrupted expansions of the pending nodes had written.
 
         Args:
-            parent_node (Node): The parent node to start generation from.
+            element_ids (List[str]): The element IDs of the pending nodes.
         """
+        if not element_ids:
+            return
+        delete_query = f"""
+            MATCH (p)-[:HAS_CHILD]->(c:Node {{type: $info}})
+            WHERE elementId(p) IN $element_ids AND c.lib_id = $lib_id AND c.subject_id = $subject_id
+            OPTIONAL MATCH (c)-[:HAS_CHILD*]->(d:Node)
+            WHERE d.lib_id = $lib_id AND d.subject_id = $subject_id
+            DETACH DELETE c, d
+        """
+        graph.query(delete_query, {"element_ids": element_ids, "info": NodeType.INFO.value,
+                                   "lib_id": self.lib_id, "subject_id": self.subject_id})
+
+    async def _is_canceled(self) -> bool:
         knowledge_lib = await self._get_knowledge_lib()
         if knowledge_lib and knowledge_lib.status == GENERATING_CANCELED:
             logger.info("Knowledge lib is generating canceled")
-            return
+            return True
+        return False
+
+    def _cap_reached(self, name: str, cap: int) -> None:
+        if name not in self._caps_reached:
+            self._caps_reached.add(name)
+            logger.warning(f"Reached the cap of {cap} {name} for lib_id: {self.lib_id}, subject_id: "
+                           f"{self.subject_id}, the graph is not expanded further")
+
+    def _reserve_llm_call(self) -> bool:
+        """Counts an LLM call of the run, or returns False when the run has reached max_llm_calls."""
+        if self.max_llm_calls and self.llm_calls >= self.max_llm_calls:
+            self._cap_reached("LLM calls", self.max_llm_calls)
+            return False
+        self.llm_calls += 1
+        return True
+
+    def _reserve_nodes(self, count: int) -> int:
+        """Counts up to count new nodes of the run and returns how many may be created under max_nodes."""
+        if self.max_nodes:
+            if self.nodes_created + count > self.max_nodes:
+                self._cap_reached("nodes", self.max_nodes)
+            count = max(0, min(count, self.max_nodes - self.nodes_created))
+        self.nodes_created += count
+        return count
+
+    def _enqueue(self, node: Union[Node, PendingNode]) -> None:
+        # the sequence keeps the nodes of a level in creation order and spares comparing nodes
+        self._queue.put_nowait((node.depth, next(self._sequence), node))
+
+    async def generate_knowledge_graph(self, *start_nodes: Node):
+        """
+        Generates the knowledge graph breadth first, starting from the subject node, or from the pending
+        nodes of a resumed generation.
 
-        if parent_node.depth >= self.max_depth:
-            logger.debug(f"Stopping recursion at depth {parent_node.depth} for node: {parent_node.id}")
-            return
+        Pending nodes wait in a queue ordered by depth and a fixed pool of workers expands them, so a
+        level is expanded before the next one and no more than `workers` nodes are expanded at once,
+        whatever the fan-out. The run stops expanding once it has created max_nodes nodes or made
+        max_llm_calls LLM calls.
 
-        logger.debug(f"parent_node depth: {parent_node.depth}, prompt_input: {parent_node.id}")
+        The generated nodes go through a NodeWriteBuffer, flushed when GRAPH_WRITE_BATCH_SIZE nodes are
+        queued, every GRAPH_WRITE_FLUSH_SECONDS and at the end of the run. Cancellation is checked on
+        the cancellation token of the library, which the database is polled for only every
+        GRAPH_CANCEL_POLL_SECONDS. Each flush checkpoints the progress, so that a run interrupted,
+        cancelled or stopped by a cap can be resumed. With prompt de-duplication, the start nodes seed
+        the index of the prompts generated for the subject.
+
+        Args:
+            *start_nodes (Node): The nodes to start generation from.
+        """
+        self._queue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._write_buffer = NodeWriteBuffer(self.lib_id, self.subject_id)
+        self._flush_lock = asyncio.Lock()
+        registry = CancellationRegistry()
+        self._cancel_token = registry.register(self.lib_id)
+        for node in start_nodes:
+            self._enqueue(node)
+        await self._index_prompts(start_nodes)
+
+        workers = [asyncio.create_task(self._worker()) for _i in range(self.workers)]
+        background = [asyncio.create_task(self._flush_periodically()),
+                      asyncio.create_task(registry.watch(self._cancel_token, self._is_canceled))]
+        status = JOB_FAILED
         try:
-            # Add timeout for LLM interaction
-            ai_response = await asyncio.wait_for(Llm.get_ai_response_async(parent_node.content, self.llm_name), timeout=LLM_TIMEOUT)
-        except asyncio.TimeoutError:
-            logger.error(f"LLM interaction timed out for node: {parent_node.id}")
+            await self._queue.join()
+            status = JOB_STOPPED if self.canceled or self._caps_reached or self.failed_nodes else JOB_DONE
+        finally:
+            for task in workers + background:
+                task.cancel()
+            await asyncio.gather(*workers, *background, return_exceptions=True)
+            registry.unregister(self._cancel_token)
+            await self._flush_writes()
+            await self._checkpoint.finish(status)
+        duplicates = self._prompt_index.duplicates if self._prompt_index else 0
+        logger.info(f"Generated {self.nodes_created} nodes with {self.llm_calls} LLM calls, "
+                    f"{duplicates} duplicate prompts linked and {self._write_buffer.round_trips} write round "
+                    f"trips for lib_id: {self.lib_id}, subject_id: {self.subject_id}")
+
+    async def _index_prompts(self, nodes: Sequence[Union[Node, PendingNode]]) -> None:
+        """Adds the prompts of nodes to the de-duplication index, if prompts are de-duplicated."""
+        if self._prompt_index is None or not nodes:
             return
-        except Exception as e:
-            logger.error(f"Failed to get AI response: {e}")
+        embeddings = await self._prompt_index.embed([node.content for node in nodes])
+        if embeddings is not None:
+            for node, embedding in zip(nodes, embeddings):
+                self._prompt_index.add(node, embedding)
+
+    async def _flush_writes(self):
+        async with self._flush_lock:
+            # the progress recorded so far only refers to nodes queued in the buffer before this flush
+            batch = self._checkpoint.take()
+            try:
+                await self._write_buffer.flush()
+            except Exception as e:
+                logger.error(f"Failed to write generated nodes: {e}")
+            await self._checkpoint.flush(batch)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(config.GRAPH_WRITE_FLUSH_SECONDS)
+            await self._flush_writes()
+
+    async def _flush_if_full(self):
+        if self._write_buffer.is_full():
+            await self._flush_writes()
+
+    async def _worker(self):
+        """Expands the pending nodes until the generation is done; canceled runs drain the queue."""
+        while True:
+            _depth, _sequence, node = await self._queue.get()
+            try:
+                if not self.canceled:
+                    await self._expand_node(node)
+            except Exception as e:
+                self.failed_nodes += 1
+                logger.error(f"Failed to expand node {node.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _expand_node(self, parent_node: Union[Node, PendingNode]):
+        """
+        Expands a node: the LLM answers its content and the prompts generated from the answer are
+        queued as the next level.
+
+        Args:
+            parent_node (Union[Node, PendingNode]): The subject or prompt node to expand.
+        """
+        if self._cancel_token.canceled:
+            if not self.canceled:
+                logger.info("Knowledge lib is generating canceled")
+            self.canceled = True
             return
 
-        if not ai_response:
-            logger.warning(f"No AI response for node: {parent_node.id}")
+        if parent_node.depth >= self.max_depth:
+            logger.debug(f"Stopping expansion at depth {parent_node.depth} for node: {parent_node.id}")
+            self._checkpoint.expanded(parent_node)
             return
 
-        # Start a database transaction
-        ai_node = Node.add_info_node(self.lib_id, self.subject_id, ai_response, parent_node.depth + 1)
-        logger.debug(f"ai_node depth: {ai_node.depth}")
+        # a resumed generation reuses the answer given before the interruption
+        ai_response = self._stored_answers.pop(parent_node.element_id, None) if parent_node.element_id else None
+        if not ai_response:
+            if not self._reserve_llm_call():
+                return
+
+            logger.debug(f"parent_node depth: {parent_node.depth}, prompt_input: {parent_node.id}")
+            try:
+                # LLM_TIMEOUT applies to each LLM attempt, the calls are queued by the provider rate limiter
+                ai_response = await Llm.get_ai_response_async(parent_node.content, self.llm_name)
+            except Exception as e:
+                self.failed_nodes += 1
+                logger.error(f"Failed to get AI response: {e}")
+                return
 
-        Relationship.add_relationship(
-            self.lib_id, self.subject_id, parent_node.element_id, ai_node.element_id, RelationshipType.HAS_CHILD
-        )
+            if not ai_response:
+                self.failed_nodes += 1
+                logger.warning(f"No AI response for node: {parent_node.id}")
+                return
+            self._checkpoint.answered(parent_node, ai_response)
+
+        if not self._reserve_nodes(1):
+            return
+        ai_node = self._write_buffer.add_node(parent_node, ai_response, NodeType.INFO, parent_node.depth + 1)
+        logger.debug(f"ai_node depth: {ai_node.depth}")
 
         if ai_node.depth >= self.max_depth:
-            logger.debug(f"Stopping recursion at depth {ai_node.depth} for node: {ai_node.id}")
+            logger.debug(f"Stopping expansion at depth {ai_node.depth} for node: {parent_node.id}")
+            self._checkpoint.expanded(parent_node, ai_node)
+            await self._flush_if_full()
             return
 
-        generated_prompts = await asyncio.wait_for(Llm.generate_prompts_from_text_async(ai_response, self.llm_name), timeout=LLM_TIMEOUT)
+        if not self._reserve_llm_call():
+            return
+        generated_prompts = await Llm.generate_prompts_from_text_async(ai_response, self.llm_name)
         logger.debug(f"generated_prompts: {generated_prompts}")
 
         if not generated_prompts:
             logger.debug("No prompts generated from AI response.")
+            self._checkpoint.expanded(parent_node, ai_node)
             return
 
-        # Batch process prompts asynchronously
-        await self._process_prompts_batch(ai_node, generated_prompts)
-
-        # Update progress
-        self.progress += 1
-        logger.info(f"Progress: {self.progress} nodes processed.")
-
-    async def _process_prompts_batch(self, ai_node: Node, generated_prompts: List[Dict[str, Any]]):
-        """
-        Processes a batch of prompts generated from the AI response asynchronously.
-
-        Args:
-            ai_node (Node): The AI node to which the prompts are linked.
-            generated_prompts (List[Dict[str, Any]]): List of generated prompts.
-        """
-        tasks = []
+        prompt_contents = []
         for generated_prompt in generated_prompts:
-            knowledge_lib = await self._get_knowledge_lib()
-            if knowledge_lib and knowledge_lib.status == GENERATING_CANCELED:
-                logger.info("Knowledge lib is generating canceled")
-                return
-
             prompt_content = generated_prompt.get("prompt")
             if not prompt_content:
                 logger.warning("Skipping empty prompt.")
                 continue
+            prompt_contents.append(prompt_content)
+
+        # the prompts are embedded in one batch and compared to the prompts generated for the subject
+        embeddings = await self._prompt_index.embed(prompt_contents) if self._prompt_index else None
+        prompt_nodes = []
+        for i, prompt_content in enumerate(prompt_contents):
+            embedding = embeddings[i] if embeddings is not None else None
+            if embedding is not None:
+                duplicate, similarity = self._prompt_index.find(embedding)
+                if duplicate is not None:
+                    # the answer is linked to the prompt already generated instead of expanding it again
+                    logger.debug(f"Prompt {prompt_content!r} duplicates {duplicate.content!r} ({similarity:.3f})")
+                    self._write_buffer.add_link(ai_node, duplicate, prompt_content, similarity)
+                    continue
+            if not self._reserve_nodes(1):
+                break
+            prompt_node = self._write_buffer.add_node(ai_node, prompt_content, NodeType.PROMPT, ai_node.depth + 1)
+            if embedding is not None:
+                self._prompt_index.add(prompt_node, embedding)
+            prompt_nodes.append(prompt_node)
+            self._enqueue(prompt_node)
+        self._checkpoint.expanded(parent_node, ai_node, prompt_nodes)
+        await self._flush_if_full()
 
-            # Create a task for each prompt
-            task = self._process_prompt(ai_node, prompt_content)
-            tasks.append(task)
-
-        # Run all tasks concurrently
-        await asyncio.gather(*tasks)
-
-    async def _process_prompt(self, ai_node: Node, prompt_content: str):
-        """
-        Processes a single prompt asynchronously.
-
-        Args:
-            ai_node (Node): The AI node to which the prompt is linked.
-            prompt_content (str): The content of the prompt.
-        """
-        prompt_node = Node.add_prompt_node(self.lib_id, self.subject_id, prompt_content, ai_node.depth + 1)
-        Relationship.add_relationship(
-            self.lib_id, self.subject_id, ai_node.element_id, prompt_node.element_id, RelationshipType.HAS_CHILD
-        )
-        await self.generate_knowledge_graph_recursive(prompt_node)
\ No newline at end of file
+        # Update progress
+        self.progress += 1
+        logger.info(f"Progress: {self.progress} nodes processed.")
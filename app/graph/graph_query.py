@@ -3,6 +3,7 @@ from typing import List, Optional
 
 import core.config as config
 from ai.embedding import EmbeddingFactory
+from ai.embedding_queue import get_embedding_batcher
 from . import NodeType, graph
 from .document import Document
 from .document_page import DocumentPage
@@ -79,15 +80,17 @@ class KnowledgeGraphQuery:
                                 max_tokens_each_chunk = 128,
                                 search_scope = ["question", "page", "document", "webpage", "node"],
                                 search_type = "vector", # fulltext, vector, hybrid
-                                only_title: bool = False,) -> Optional[QueryResult]:
+                                only_title: bool = False,
+                                message_vector: Optional[List[float]] = None) -> Optional[QueryResult]:
         if not message:
             return None
 
-        message_vector: List[float] = self.embedding_factory.get_embedding(
-            text=message,
-            model_name=embedding_model,
-            max_tokens_each_chunk=max_tokens_each_chunk
-        ).tolist()
+        if message_vector is None:
+            message_vector = self.embedding_factory.get_embedding(
+                text=message,
+                model_name=embedding_model,
+                max_tokens_each_chunk=max_tokens_each_chunk
+            ).tolist()
 
         query_methods = {
             "question": self.query_by_question,
@@ -109,6 +112,20 @@ class KnowledgeGraphQuery:
 
         return None
 
+    async def embed_message(self, message: str, embedding_model: str = "sbert",
+                            max_tokens_each_chunk: int = 128) -> List[float]:
+        """
+        Embed a search message without blocking the event loop.
+
+        Concurrent messages are micro-batched by the embedding batcher and encoded together in its worker thread.
+        """
+        message_vector = await get_embedding_batcher().embed(
+            text=message,
+            model_name=embedding_model,
+            max_tokens_each_chunk=max_tokens_each_chunk
+        )
+        return message_vector.tolist()
+
     def find_related_nodes(self, lib_id: str, subject_id: int, node_id: int, limit: int = 5) -> List[Node]:
         human_child_nodes = Node.find_human_nodes(node_id)
         similar_nodes = self.find_similar_nodes(lib_id, subject_id, node_id, limit)
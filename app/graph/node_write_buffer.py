@@ -0,0 +1,193 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+
+from core import config
+from core.extends_logger import logger
+from . import NodeType, RelationshipType
+from .node import Node
+
+
+class PendingNode:
+    """
+    A node queued in a NodeWriteBuffer. Its id and element_id are set once the buffer has written it.
+    """
+
+    def __init__(self, lib_id: int, subject_id: int, content: str, type: NodeType, depth: int,
+                 parent: Union[Node, "PendingNode"]):
+        self.lib_id = lib_id
+        self.subject_id = subject_id
+        self.content = content
+        self.type = type
+        self.depth = depth
+        self.parent = parent
+        self.id: Optional[int] = None
+        self.element_id: Optional[str] = None
+
+    def __repr__(self):
+        return f"PendingNode(id={self.id}, element_id={self.element_id}, type={self.type}, depth={self.depth})"
+
+
+class PendingLink:
+    """A RELATED_TO relationship queued in a NodeWriteBuffer between nodes that may themselves be pending."""
+
+    def __init__(self, source: Union[Node, PendingNode], target: Union[Node, PendingNode], content: str,
+                 similarity: float):
+        self.source = source
+        self.target = target
+        self.content = content
+        self.similarity = similarity
+
+
+class NodeWriteBuffer:
+    """
+    Write-behind buffer of generated nodes and their HAS_CHILD relationships.
+
+    Nodes are queued with their parent, which may itself be pending, and written in batches with one
+    UNWIND ... CREATE statement per wave: a wave holds the queued nodes whose parent is written, so a
+    batch of answers and the prompts generated from them takes two round trips instead of four per node.
+    The RELATED_TO links queued between generated nodes are written after the nodes, in one more round trip.
+    """
+
+    write_query: str = f"""
+        UNWIND $rows AS row
+        MATCH (parent) WHERE elementId(parent) = row.parent_element_id
+        CREATE (parent)-[r:{RelationshipType.HAS_CHILD.value} {{
+            lib_id: $lib_id,
+            subject_id: $subject_id,
+            created_at: $now,
+            updated_at: $now
+        }}]->(node:Node {{
+            lib_id: $lib_id,
+            subject_id: $subject_id,
+            type: row.type,
+            content: row.content,
+            created_at: $now,
+            updated_at: $now
+        }})
+        RETURN row.key AS key, id(node) AS id, elementId(node) AS element_id
+    """
+
+    link_query: str = f"""
+        UNWIND $rows AS row
+        MATCH (source) WHERE elementId(source) = row.source_element_id
+        MATCH (target) WHERE elementId(target) = row.target_element_id
+        CREATE (source)-[r:{RelationshipType.RELATED_TO.value} {{
+            lib_id: $lib_id,
+            subject_id: $subject_id,
+            content: row.content,
+            similarity: row.similarity,
+            created_at: $now,
+            updated_at: $now
+        }}]->(target)
+        RETURN count(r) AS count
+    """
+
+    def __init__(self, lib_id: int, subject_id: int, batch_size: Optional[int] = None):
+        """
+        Initializes the NodeWriteBuffer.
+
+        Args:
+            lib_id (int): ID of the knowledge library.
+            subject_id (int): ID of the subject.
+            batch_size (Optional[int]): Number of queued nodes that triggers a flush. Defaults to GRAPH_WRITE_BATCH_SIZE.
+        """
+        self.lib_id = lib_id
+        self.subject_id = subject_id
+        self.batch_size = max(1, batch_size if batch_size is not None else config.GRAPH_WRITE_BATCH_SIZE)
+        self.nodes_written = 0
+        self.links_written = 0
+        self.round_trips = 0
+        self._pending: List[PendingNode] = []
+        self._links: List[PendingLink] = []
+        self._flush_lock = asyncio.Lock()
+
+    def add_node(self, parent: Union[Node, PendingNode], content: str, node_type: NodeType, depth: int) -> PendingNode:
+        """
+        Queues a node and its HAS_CHILD relationship from the parent.
+
+        Args:
+            parent (Union[Node, PendingNode]): The parent node, written or queued.
+            content (str): The content of the node.
+            node_type (NodeType): The type of the node.
+            depth (int): The depth of the node in the graph hierarchy.
+
+        Returns:
+            PendingNode: The queued node, which can be the parent of further queued nodes.
+        """
+        node = PendingNode(self.lib_id, self.subject_id, content, node_type, depth, parent)
+        self._pending.append(node)
+        return node
+
+    def add_link(self, source: Union[Node, PendingNode], target: Union[Node, PendingNode], content: str,
+                 similarity: float) -> None:
+        """
+        Queues a RELATED_TO relationship, e.g. from an answer to the existing prompt node a generated
+        prompt duplicates.
+
+        Args:
+            source (Union[Node, PendingNode]): The source node, written or queued.
+            target (Union[Node, PendingNode]): The target node, written or queued.
+            content (str): The content of the relationship, e.g. the duplicate prompt.
+            similarity (float): The similarity of the duplicate prompt to the target node.
+        """
+        self._links.append(PendingLink(source, target, content, similarity))
+
+    def is_full(self) -> bool:
+        return len(self._pending) >= self.batch_size
+
+    async def flush(self):
+        """
+        Writes the queued nodes. Flushes run one at a time, so a parent queued in an earlier flush is
+        written before its children.
+
+        Raises:
+            DatabaseError: If a write fails; the nodes of that wave and their descendants are dropped.
+        """
+        async with self._flush_lock:
+            pending, self._pending = self._pending, []
+            links, self._links = self._links, []
+            if pending or links:
+                await asyncio.to_thread(self._write, pending, links)
+
+    def _write(self, pending: List[PendingNode], links: List[PendingLink]):
+        if pending:
+            # the indexes are only created by the first write of the process
+            Node().create_index("Node")
+        while pending:
+            wave = [node for node in pending if node.parent.element_id]
+            pending = [node for node in pending if not node.parent.element_id]
+            if not wave:
+                logger.error(f"Dropping {len(pending)} generated nodes whose parent was not written")
+                break
+            self._write_wave(wave)
+
+        written = [link for link in links if link.source.element_id and link.target.element_id]
+        if len(written) < len(links):
+            logger.error(f"Dropping {len(links) - len(written)} links whose nodes were not written")
+        if written:
+            self._write_links(written)
+
+    def _write_wave(self, wave: List[PendingNode]):
+        rows = [{"key": key, "parent_element_id": node.parent.element_id, "type": node.type.value,
+                 "content": node.content} for key, node in enumerate(wave)]
+        params = {"rows": rows, "lib_id": self.lib_id, "subject_id": self.subject_id,
+                  "now": datetime.now(timezone.utc).timestamp()}
+        result = Node._query_database(self.write_query, params)
+        self.round_trips += 1
+        for item in result or []:
+            node = wave[item["key"]]
+            node.id = item["id"]
+            node.element_id = item["element_id"]
+        self.nodes_written += len(result or [])
+        logger.debug(f"Wrote {len(result or [])} generated nodes in one round trip for lib_id: {self.lib_id}, "
+                     f"subject_id: {self.subject_id}")
+
+    def _write_links(self, links: List[PendingLink]):
+        rows = [{"source_element_id": link.source.element_id, "target_element_id": link.target.element_id,
+                 "content": link.content, "similarity": link.similarity} for link in links]
+        params = {"rows": rows, "lib_id": self.lib_id, "subject_id": self.subject_id,
+                  "now": datetime.now(timezone.utc).timestamp()}
+        result = Node._query_database(self.link_query, params)
+        self.round_trips += 1
+        self.links_written += result[0]["count"] if result else 0
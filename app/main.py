@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from contextlib import asynccontextmanager
@@ -7,20 +8,40 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 import core.config as config
+from ai.compute import shutdown_compute_executors
+from ai.http_clients import aclose_http_clients
+from core.cancellation import CancellationRegistry
 from core.error_handle import register_exception
 from core.extends_logger import logger
-from core.i18n import LanguageMiddleware
+from core.i18n import LanguageMiddleware, _
 from core.middleware import NamingConventionMiddleware
+from graph.generation_checkpoint import GenerationCheckpoint
 from routers import register_router
+from schemas.result import ok, failed
+from services.warmup_service import WarmupService
 
 
 # Add lifespan function to manage Redis client lifecycle and database session
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    warmup_service = WarmupService()
+    warmup_task = None
     try:
         logger.info("Application startup")
+        if config.WARMUP_ENABLED:
+            # warm up in the background, /health/ready reports when it is done
+            warmup_task = asyncio.create_task(warmup_service.run())
+        else:
+            warmup_service.ready = True
+        await GenerationCheckpoint.create_tables()
+        await CancellationRegistry().start_listener()
         yield
     finally:
+        if warmup_task and not warmup_task.done():
+            warmup_task.cancel()
+        shutdown_compute_executors()
+        await aclose_http_clients()
+        await CancellationRegistry().stop_listener()
         logger.info("Application shutdown")
 
 def create_app():
@@ -60,6 +81,19 @@ def create_app():
     async def read_root():
         return {"message": "Welcome to FastAPI!"}
 
+    @current_app.get("/health/live")
+    async def health_live():
+        return ok({"status": "alive"})
+
+    @current_app.get("/health/ready")
+    async def health_ready():
+        status = WarmupService().status()
+        if status["ready"]:
+            return ok(status)
+        response = failed(data=status, msg=_("The service is warming up."))
+        response.status_code = 503
+        return response
+
     return current_app
 
 app = create_app()
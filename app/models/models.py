@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Column, String, ForeignKey, Text
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from . import BaseModel
 
@@ -38,4 +38,33 @@ class KnowledgeLibSubject(BaseModel):
 
     def __repr__(self):
         repr = super().__repr__()
-        return f"KnowledgeLibSubject({repr}, name={self.name})"
\ No newline at end of file
+        return f"KnowledgeLibSubject({repr}, name={self.name})"
+
+class GraphGenerationJob(BaseModel):
+    __allow_unmapped__ = True
+    __tablename__ = 'graph_generation_job'
+
+    lib_id = Column(BigInteger, nullable=False, index=True)
+    subject_id = Column(BigInteger, nullable=False, index=True)
+    llm_name = Column(String(100), nullable=False)
+    max_depth = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default='RUNNING')
+
+    def __repr__(self):
+        repr = super().__repr__()
+        return f"GraphGenerationJob({repr}, lib_id={self.lib_id}, subject_id={self.subject_id}, status={self.status})"
+
+class GraphGenerationCheckpoint(BaseModel):
+    __allow_unmapped__ = True
+    __tablename__ = 'graph_generation_checkpoint'
+
+    job_id = Column(BigInteger, nullable=False, index=True)
+    element_id = Column(String(100), nullable=False)
+    content = Column(Text, nullable=False)
+    depth = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default='PENDING')
+    answer = Column(Text, nullable=True)
+
+    def __repr__(self):
+        repr = super().__repr__()
+        return f"GraphGenerationCheckpoint({repr}, job_id={self.job_id}, element_id={self.element_id}, status={self.status})"
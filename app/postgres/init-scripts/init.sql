@@ -59,4 +59,32 @@ INSERT INTO knowledge_lib (id, title, content) VALUES
 -- init knowledge_lib_subject
 INSERT INTO knowledge_lib_subject (id, name, knowledge_lib_id) VALUES (9, 'The Secret to Sustainable Weight Loss', 3); 
 INSERT INTO knowledge_lib_subject (id, name, knowledge_lib_id) VALUES (10, 'Weight Loss Diet', 3); 
-INSERT INTO knowledge_lib_subject (id, name, knowledge_lib_id) VALUES (11, 'Weight Loss Exercise', 3);
\ No newline at end of file
+INSERT INTO knowledge_lib_subject (id, name, knowledge_lib_id) VALUES (11, 'Weight Loss Exercise', 3);
+
+-- init graph_generation_job, the checkpointed graph generation of a subject
+CREATE TABLE IF NOT EXISTS graph_generation_job (
+    id BIGSERIAL PRIMARY KEY,
+    lib_id BIGINT NOT NULL,
+    subject_id BIGINT NOT NULL,
+    llm_name VARCHAR(100) NOT NULL,
+    max_depth INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'RUNNING',
+    create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_graph_generation_job_subject ON graph_generation_job (lib_id, subject_id);
+
+-- init graph_generation_checkpoint, the frontier of a graph generation job
+CREATE TABLE IF NOT EXISTS graph_generation_checkpoint (
+    id BIGSERIAL PRIMARY KEY,
+    job_id BIGINT NOT NULL REFERENCES graph_generation_job(id) ON DELETE CASCADE,
+    element_id VARCHAR(100) NOT NULL,
+    content TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',
+    answer TEXT,
+    create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_graph_generation_checkpoint_job ON graph_generation_checkpoint (job_id, status);
+CREATE INDEX IF NOT EXISTS idx_graph_generation_checkpoint_element ON graph_generation_checkpoint (job_id, element_id);
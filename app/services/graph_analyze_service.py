@@ -9,9 +9,10 @@ from numpy import lib
 from sqlalchemy import select
 
 import core.database as db
+from ai.compute import run_in_compute_thread
 from ai.document_service import DocumentService
 from ai.llm import Llm
-from ai.nlp import extract_entities
+from ai.nlp import extract_entities_async
 from core import config
 from core.extends_logger import logger
 from core.i18n import _
@@ -170,26 +171,20 @@ class GraphAnalyzeService(GraphGenerateService):
 
         try:
             # Step 1: Analyze entities
-            self._analyze_entities(node, data.embedding_model, data.max_tokens_each_chunk)
+            await self._analyze_entities(node, data.embedding_model, data.max_tokens_each_chunk)
 
-            # Step 2: Analyze title (for HUMAN or INFO nodes)
-            if node.type in [NodeType.HUMAN, NodeType.INFO]:
-                self._analyze_title(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
-
-            # Step 3: Analyze keywords
-            self._analyze_keywords(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
-
-            # Step 4: Analyze tags
-            self._analyze_tags(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
+            # Steps 2-4: Analyze title (for HUMAN or INFO nodes), keywords and tags
+            await self._analyze_title_keywords_tags(node, data.llm_name, data.embedding_model,
+                                                    data.max_tokens_each_chunk)
 
             # Step 5: Convert content to vector
-            self._convert_content_to_vector(node, data.embedding_model, data.max_tokens_each_chunk)
+            await self._convert_content_to_vector(node, data.embedding_model, data.max_tokens_each_chunk)
 
             # Step 6: Analyze documents associated with the node
-            self._analyze_documents(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
+            await self._analyze_documents(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
 
             # Step 7: Analyze web pages associated with the node
-            self._analyze_webpages(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
+            await self._analyze_webpages(node, data.llm_name, data.embedding_model, data.max_tokens_each_chunk)
 
             # Step 8: Update the node with the new embedding model
             node.embedding_model = data.embedding_model
@@ -202,7 +197,7 @@ class GraphAnalyzeService(GraphGenerateService):
             logger.error(f"Failed to analyze node with element_id {data.element_id}. Error: {e}")
             raise RuntimeError(f"Failed to analyze node: {e}") from e
 
-    def _analyze_entities(self, node: Node, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _analyze_entities(self, node: Node, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Extracts entities from the node content and adds them to the graph.
 
@@ -214,7 +209,7 @@ class GraphAnalyzeService(GraphGenerateService):
         Returns:
             None
         """
-        analysis_entities = extract_entities(node.content)
+        analysis_entities = await extract_entities_async(node.content)
         if not analysis_entities:
             logger.debug(f"No entities found for node with element_id: {node.element_id}")
             return
@@ -222,24 +217,94 @@ class GraphAnalyzeService(GraphGenerateService):
         # Delete existing entities
         Entity.delete_entities_of_node(node.element_id)
 
-        # Add new entities
-        for entity in analysis_entities:
-            entity_vector = self.embedding_factory.get_embedding(
-                text=entity,
-                model_name=embedding_model,
-                max_tokens_each_chunk=max_tokens_each_chunk,
-            ).tolist()
+        # Add new entities, embedding them in one batch
+        entity_vectors = await run_in_compute_thread(
+            self.embedding_factory.get_embeddings_for_texts,
+            texts=analysis_entities,
+            model_name=embedding_model,
+            max_tokens_each_chunk=max_tokens_each_chunk,
+        )
+        for entity, entity_vector in zip(analysis_entities, entity_vectors):
             Entity.add_entity_node(
                 lib_id=node.lib_id,
                 subject_id=node.subject_id,
                 node_element_id=node.element_id,
                 content=entity,
-                content_vector=entity_vector,
+                content_vector=entity_vector.tolist(),
                 embedding_model=embedding_model,
             )
         logger.debug(f"Added {len(analysis_entities)} entities for node with element_id: {node.element_id}")
 
-    def _analyze_title(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _analyze_title_keywords_tags(self, node: Node, llm_name: str, embedding_model: str,
+                                           max_tokens_each_chunk: int) -> None:
+        """
+        Analyzes and updates the title, keywords and tags of the node.
+
+        With NODE_ANALYSIS_SINGLE_CALL the three fields are requested in one LLM call, so the node
+        content is sent once instead of three times. Fields missing from or malformed in the combined
+        response are analyzed with their own prompt.
+
+        Args:
+            node (Node): The node to analyze.
+            llm_name (str): The name of the LLM to use.
+            embedding_model (str): The embedding model to use.
+            max_tokens_each_chunk (int): The maximum number of tokens per chunk.
+
+        Returns:
+            None
+        """
+        analyze_title = node.type in [NodeType.HUMAN, NodeType.INFO]
+        analysis = {}
+        if config.NODE_ANALYSIS_SINGLE_CALL:
+            node_template = Llm.get_prompt_template("analysis_node")
+            node_prompt = node_template.format(input=node.content)
+            analysis = self.parse_node_analysis(await Llm.get_ai_json_response_async(node_prompt, llm_name))
+
+        if analyze_title:
+            if "title" in analysis:
+                await self._update_title(node, analysis["title"], embedding_model, max_tokens_each_chunk)
+            else:
+                await self._analyze_title(node, llm_name, embedding_model, max_tokens_each_chunk)
+
+        if "keywords" in analysis:
+            await self._update_keywords(node, analysis["keywords"], embedding_model, max_tokens_each_chunk)
+        else:
+            await self._analyze_keywords(node, llm_name, embedding_model, max_tokens_each_chunk)
+
+        if "tags" in analysis:
+            await self._update_tags(node, analysis["tags"], embedding_model, max_tokens_each_chunk)
+        else:
+            await self._analyze_tags(node, llm_name, embedding_model, max_tokens_each_chunk)
+
+    @staticmethod
+    def parse_node_analysis(analysis: Any) -> dict:
+        """
+        Keeps the well-formed fields of a combined node analysis.
+
+        Args:
+            analysis (Any): The decoded "result" of the analysis node prompt, e.g.
+                {"title": "...", "keywords": ["..."], "tags": ["..."]}.
+
+        Returns:
+            dict: The title (str), keywords and tags (lists of str) found in the analysis; a field
+                that is missing, empty or has the wrong type is left out so that it is analyzed separately.
+        """
+        if not isinstance(analysis, dict):
+            return {}
+
+        fields = {}
+        title = analysis.get("title")
+        if isinstance(title, str) and title.strip():
+            fields["title"] = title.strip()
+        for name in ("keywords", "tags"):
+            values = analysis.get(name)
+            if isinstance(values, list) and all(isinstance(value, str) for value in values):
+                values = [value.strip() for value in values if value.strip()]
+                if values:
+                    fields[name] = values
+        return fields
+
+    async def _analyze_title(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Analyzes and updates the title of the node using an LLM.
 
@@ -254,18 +319,22 @@ class GraphAnalyzeService(GraphGenerateService):
         """
         title_template = Llm.get_prompt_template("analysis_title")
         title_prompt = title_template.format(input=node.content)
-        analysis_title = Llm.get_ai_json_response(title_prompt, llm_name)
+        analysis_title = await Llm.get_ai_json_response_async(title_prompt, llm_name)
+        await self._update_title(node, analysis_title, embedding_model, max_tokens_each_chunk)
 
+    async def _update_title(self, node: Node, analysis_title: Optional[str], embedding_model: str,
+                            max_tokens_each_chunk: int) -> None:
         if analysis_title:
             node.title = analysis_title.strip()
-            node.title_vector = self.embedding_factory.get_embedding(
+            node.title_vector = (await run_in_compute_thread(
+                self.embedding_factory.get_embedding,
                 text=analysis_title.strip(),
                 model_name=embedding_model,
                 max_tokens_each_chunk=max_tokens_each_chunk,
-            ).tolist()
+            )).tolist()
             logger.debug(f"Updated title for node with element_id: {node.element_id}")
 
-    def _analyze_keywords(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _analyze_keywords(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Analyzes and updates the keywords of the node using an LLM.
 
@@ -280,27 +349,31 @@ class GraphAnalyzeService(GraphGenerateService):
         """
         keywords_template = Llm.get_prompt_template("analysis_keywords")
         keywords_prompt = keywords_template.format(input=node.content)
-        analysis_keywords = Llm.get_ai_json_response(keywords_prompt, llm_name)
+        analysis_keywords = await Llm.get_ai_json_response_async(keywords_prompt, llm_name)
+        await self._update_keywords(node, analysis_keywords, embedding_model, max_tokens_each_chunk)
 
+    async def _update_keywords(self, node: Node, analysis_keywords: Optional[List[str]], embedding_model: str,
+                               max_tokens_each_chunk: int) -> None:
         if analysis_keywords:
             Keyword.delete_keywords_of_node(node.element_id)
-            for keyword in analysis_keywords:
-                keyword_vector = self.embedding_factory.get_embedding(
-                    text=keyword,
-                    model_name=embedding_model,
-                    max_tokens_each_chunk=max_tokens_each_chunk,
-                ).tolist()
+            keyword_vectors = await run_in_compute_thread(
+                self.embedding_factory.get_embeddings_for_texts,
+                texts=analysis_keywords,
+                model_name=embedding_model,
+                max_tokens_each_chunk=max_tokens_each_chunk,
+            )
+            for keyword, keyword_vector in zip(analysis_keywords, keyword_vectors):
                 Keyword.add_keyword_node(
                     lib_id=node.lib_id,
                     subject_id=node.subject_id,
                     node_element_id=node.element_id,
                     content=keyword,
-                    content_vector=keyword_vector,
+                    content_vector=keyword_vector.tolist(),
                     embedding_model=embedding_model,
                 )
             logger.debug(f"Added {len(analysis_keywords)} keywords for node with element_id: {node.element_id}")
 
-    def _analyze_tags(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _analyze_tags(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Analyzes and updates the tags of the node using an LLM.
 
@@ -315,27 +388,31 @@ class GraphAnalyzeService(GraphGenerateService):
         """
         tags_template = Llm.get_prompt_template("analysis_tags")
         tags_prompt = tags_template.format(input=node.content)
-        analysis_tags = Llm.get_ai_json_response(tags_prompt, llm_name)
+        analysis_tags = await Llm.get_ai_json_response_async(tags_prompt, llm_name)
+        await self._update_tags(node, analysis_tags, embedding_model, max_tokens_each_chunk)
 
+    async def _update_tags(self, node: Node, analysis_tags: Optional[List[str]], embedding_model: str,
+                           max_tokens_each_chunk: int) -> None:
         if analysis_tags:
             Tag.delete_tags_of_node(node.element_id)
-            for tag in analysis_tags:
-                tag_vector = self.embedding_factory.get_embedding(
-                    text=tag,
-                    model_name=embedding_model,
-                    max_tokens_each_chunk=max_tokens_each_chunk,
-                ).tolist()
+            tag_vectors = await run_in_compute_thread(
+                self.embedding_factory.get_embeddings_for_texts,
+                texts=analysis_tags,
+                model_name=embedding_model,
+                max_tokens_each_chunk=max_tokens_each_chunk,
+            )
+            for tag, tag_vector in zip(analysis_tags, tag_vectors):
                 Tag.add_tag_node(
                     lib_id=node.lib_id,
                     subject_id=node.subject_id,
                     node_element_id=node.element_id,
                     content=tag,
-                    content_vector=tag_vector,
+                    content_vector=tag_vector.tolist(),
                     embedding_model=embedding_model,
                 )
             logger.debug(f"Added {len(analysis_tags)} tags for node with element_id: {node.element_id}")
 
-    def _convert_content_to_vector(self, node: Node, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _convert_content_to_vector(self, node: Node, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Converts the node content to a vector using the specified embedding model.
 
@@ -348,14 +425,15 @@ class GraphAnalyzeService(GraphGenerateService):
             None
         """
         if node.content:
-            node.content_vector = self.embedding_factory.get_embedding(
+            node.content_vector = (await run_in_compute_thread(
+                self.embedding_factory.get_embedding,
                 text=node.content,
                 model_name=embedding_model,
                 max_tokens_each_chunk=max_tokens_each_chunk,
-            ).tolist()
+            )).tolist()
             logger.debug(f"Converted content to vector for node with element_id: {node.element_id}")
 
-    def _analyze_documents(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _analyze_documents(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Analyzes documents associated with the node.
 
@@ -371,7 +449,10 @@ class GraphAnalyzeService(GraphGenerateService):
         documents = Document.get_documents_of_node(node.element_id)
         if documents:
             for document in documents:
-                self.analyze_graph_node_file(
+                # the file analysis is synchronous end to end and mostly waits on the loader and the LLM,
+                # run it in a thread of its own instead of holding a compute thread for minutes
+                await asyncio.to_thread(
+                    self.analyze_graph_node_file,
                     document.element_id,
                     llm_name=llm_name,
                     embedding_model=embedding_model,
@@ -379,7 +460,7 @@ class GraphAnalyzeService(GraphGenerateService):
                 )
             logger.debug(f"Analyzed {len(documents)} documents for node with element_id: {node.element_id}")
 
-    def _analyze_webpages(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
+    async def _analyze_webpages(self, node: Node, llm_name: str, embedding_model: str, max_tokens_each_chunk: int) -> None:
         """
         Analyzes web pages associated with the node.
 
@@ -395,7 +476,8 @@ class GraphAnalyzeService(GraphGenerateService):
         webpages = WebPage.get_webpages_of_node(node.element_id)
         if webpages:
             for webpage in webpages:
-                self.analyze_graph_node_webpage(
+                await asyncio.to_thread(
+                    self.analyze_graph_node_webpage,
                     webpage.element_id,
                     llm_name=llm_name,
                     embedding_model=embedding_model,
@@ -458,13 +540,8 @@ class GraphAnalyzeService(GraphGenerateService):
             document_summary = summary.get("summary", "")
 
             # Generate embeddings for the title and summary
-            document_title_vector = self.embedding_factory.get_embedding(
-                text=document_title,
-                model_name=embedding_model,
-                max_tokens_each_chunk=max_tokens_each_chunk,
-            ).tolist()
-            document_summary_vector = self.embedding_factory.get_embedding(
-                text=document_summary,
+            document_title_vector, document_summary_vector = self.embedding_factory.get_embeddings_for_texts(
+                texts=[document_title, document_summary],
                 model_name=embedding_model,
                 max_tokens_each_chunk=max_tokens_each_chunk,
             ).tolist()
@@ -528,11 +605,14 @@ class GraphAnalyzeService(GraphGenerateService):
             # Delete existing document pages
             DocumentPage.delete_document_pages_of_parent(document_element_id)
 
-            # Add new document pages
-            for split in splits:
-                if not split.metadata.get("source", "") or not split.page_content:
-                    continue
-
+            # Add new document pages, embedding all their contents in one batch
+            splits = [split for split in splits if split.metadata.get("source", "") and split.page_content]
+            split_vectors = self.embedding_factory.get_embeddings_for_texts(
+                texts=[split.page_content for split in splits],
+                model_name=embedding_model,
+                max_tokens_each_chunk=max_tokens_each_chunk,
+            )
+            for split, split_vector in zip(splits, split_vectors):
                 DocumentPage.add_document_page_node(
                     lib_id=lib_id,
                     subject_id=subject_id,
@@ -544,11 +624,7 @@ class GraphAnalyzeService(GraphGenerateService):
                     page=split.metadata.get("page", 0),
                     row=split.metadata.get("row", 0),
                     content=split.page_content,
-                    content_vector=self.embedding_factory.get_embedding(
-                        text=split.page_content,
-                        model_name=embedding_model,
-                        max_tokens_each_chunk=max_tokens_each_chunk,
-                    ).tolist(),
+                    content_vector=split_vector.tolist(),
                     embedding_model=embedding_model,
                 )
             logger.info(
@@ -600,13 +676,8 @@ class GraphAnalyzeService(GraphGenerateService):
                 webpage.content = summary.get("summary", "")
 
             # Generate embeddings for the title and content
-            webpage.title_vector = self.embedding_factory.get_embedding(
-                text=webpage.title,
-                model_name=embedding_model,
-                max_tokens_each_chunk=max_tokens_each_chunk,
-            ).tolist()
-            webpage.content_vector = self.embedding_factory.get_embedding(
-                text=webpage.content,
+            webpage.title_vector, webpage.content_vector = self.embedding_factory.get_embeddings_for_texts(
+                texts=[webpage.title, webpage.content],
                 model_name=embedding_model,
                 max_tokens_each_chunk=max_tokens_each_chunk,
             ).tolist()
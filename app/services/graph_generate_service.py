@@ -3,12 +3,15 @@ from typing import Optional, List
 
 from sqlalchemy import select
 
+from core import config
+from core.cancellation import CancellationRegistry
 from core.extends_logger import logger
 from core.i18n import _
+from graph.generation_checkpoint import JOB_DONE, JOB_RUNNING, GenerationCheckpoint
 from graph.graph_generator import KnowledgeGraphGenerator
 import core.database as db
 from graph.node import Node
-from models.models import KnowledgeLib
+from models.models import GraphGenerationJob, KnowledgeLib
 from schemas.graph import GraphGenerateConditionView
 from services.graph_query_service import GraphQueryService
 
@@ -98,6 +101,84 @@ class GraphGenerateService(GraphQueryService):
             logger.error(error_msg)
             raise RuntimeError(error_msg) from e
 
+    async def find_resumable_job(self, lib_id: int, subject_id: int) -> GraphGenerationJob:
+        """
+        Finds the interrupted graph generation of a subject.
+
+        A job can be resumed unless it is done, or it is running and its checkpoint was updated within
+        GRAPH_CHECKPOINT_STALE_SECONDS; a running job with an older checkpoint belongs to a process that
+        stopped without finishing it, e.g. a restart of the API.
+
+        Args:
+            lib_id (int): The ID of the knowledge library.
+            subject_id (int): The ID of the knowledge subject.
+
+        Returns:
+            GraphGenerationJob: The job to resume.
+
+        Raises:
+            ValueError: If the library is not found or there is no generation to resume.
+            RuntimeError: If the library is busy or published.
+        """
+        knowledge_lib = await self.find_knowledge_lib_by_id(lib_id)
+        if not knowledge_lib:
+            raise ValueError(_("Knowledge lib not found"))
+
+        if knowledge_lib.status == 'PUBLISHED':
+            logger.warning(f"Library is published. Please unpublish the library first.")
+            raise RuntimeError(_("Library is published. Please unpublish the library first."))
+
+        job = await GenerationCheckpoint.find_job(lib_id, subject_id)
+        if not job or job.status == JOB_DONE:
+            raise ValueError(_("No graph generation to resume."))
+
+        stale = datetime.datetime.now() - datetime.timedelta(seconds=config.GRAPH_CHECKPOINT_STALE_SECONDS)
+        running = job.status == JOB_RUNNING and job.update_time and job.update_time > stale
+        if knowledge_lib.status == 'ANALYZING' or (knowledge_lib.status == 'GENERATING' and running):
+            logger.warning(f"Graph generation or analysis is already in progress for library ID: {lib_id}.")
+            raise RuntimeError(_("Graph generation or analysis is already in progress."))
+        return job
+
+    async def resume_generate_graph(self, lib_id: int, subject_id: int) -> None:
+        """
+        Resumes the interrupted graph generation of a subject from its checkpoint, with the LLM and
+        max depth it was started with.
+
+        Args:
+            lib_id (int): The ID of the knowledge library.
+            subject_id (int): The ID of the knowledge subject.
+
+        Raises:
+            ValueError: If the library or subject is not found or there is no generation to resume.
+            RuntimeError: If the graph generation fails.
+        """
+        logger.debug(f"Starting resume_generate_graph for lib_id: {lib_id}, subject_id: {subject_id}")
+        job = await self.find_resumable_job(lib_id, subject_id)
+        knowledge_lib = await self.find_knowledge_lib_by_id(lib_id)
+        knowledge_subject = await self.find_knowledge_lib_subject_by_id(subject_id)
+        if not knowledge_subject:
+            error_msg = f"Knowledge subject (ID: {subject_id}) not found."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        try:
+            await self.update_knowledge_lib_status(lib_id, 'GENERATING')
+            knowledge_graph_generator = KnowledgeGraphGenerator(
+                lib_name=knowledge_lib.title,
+                title=knowledge_subject.name,
+                llm_name=job.llm_name,
+                max_depth=job.max_depth,
+                lib_id=lib_id,
+                subject_id=subject_id,
+            )
+            await knowledge_graph_generator.resume()
+            logger.debug(f"Successfully resumed knowledge graph for lib_id: {lib_id}, subject_id: {subject_id}.")
+            await self.update_knowledge_lib_status(lib_id, 'PENDING')
+        except Exception as e:
+            error_msg = f"Failed to resume graph for lib_id: {lib_id}, subject_id: {subject_id}. Error: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg) from e
+
     async def cancel_generate_graph(self, lib_id: int) -> None:
         """
         Cancels the ongoing graph generation for a specific knowledge library.
@@ -117,6 +198,9 @@ class GraphGenerateService(GraphQueryService):
                 try:
                     knowledge_lib.status = 'PENDING'
                     knowledge_lib.update_time = datetime.datetime.now()
+                    # the job stops at once if it runs in this process, the notification reaches the others
+                    CancellationRegistry().cancel(lib_id)
+                    await CancellationRegistry.notify(session, lib_id)
                     await session.commit()
                     await session.refresh(knowledge_lib)
                     print(f"--------Successfully canceled generate or analyze graph for lib_id: {lib_id}")
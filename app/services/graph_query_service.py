@@ -128,7 +128,7 @@ class GraphQueryService(GraphBaseService):
         messages = self._prepare_messages_for_summarization(query_result)
         if query_condition.return_method == "sync":
             if query_condition.is_summary:
-                summary = Llm.summary_message_history(
+                summary = await Llm.summary_message_history_async(
                     messages=messages,
                     llm_name=query_condition.llm_name,
                     chain_type=query_condition.chain_type,
@@ -165,7 +165,7 @@ class GraphQueryService(GraphBaseService):
                             llm_name=query_condition.llm_name,
                             chain_type=query_condition.chain_type,
                     ):
-                        yield KnowledgeQueryResult(summary_chunk.get("output_text"), None, None, None, None, None, None, None, None)
+                        yield KnowledgeQueryResult(summary_chunk, None, None, None, None, None, None, None, None)
                     
                     yield KnowledgeQueryResult(None, query_result.main_node, None, None, None, None, None, None, None)
                     yield KnowledgeQueryResult(None, None, query_result.entities, None, None, None, None, None, None)
@@ -238,7 +238,7 @@ class GraphQueryService(GraphBaseService):
         if len(query_condition.messages) > 1:
             if query_condition.is_summary:
                 # Stream the summarization process
-                summary = Llm.summary_message_history(
+                summary = await Llm.summary_message_history_async(
                     messages=query_condition.messages,
                     llm_name=query_condition.llm_name,
                     chain_type=query_condition.chain_type,
@@ -249,9 +249,18 @@ class GraphQueryService(GraphBaseService):
         else:
             summary_message = query_condition.messages[0]
 
+        message_vector = None
+        if summary_message:
+            message_vector = await self.knowledge_graph_query.embed_message(
+                message=summary_message,
+                embedding_model=query_condition.embedding_model,
+                max_tokens_each_chunk=query_condition.max_tokens_each_chunk,
+            )
+
         # Query the knowledge graph
         query_result: QueryResult = self.knowledge_graph_query.search_knowledge_graph(
             message=summary_message,
+            message_vector=message_vector,
             lib_id=query_condition.lib_id,
             subject_id=query_condition.subject_id,
             limit=query_condition.limit,
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import text
+
+import core.database as db
+from ai.compute import run_in_compute_thread, run_in_nlp_process
+from ai.embedding import EmbeddingFactory
+from ai.nlp import warm_up_ner
+from core import config
+from core.extends_logger import logger
+from graph import graph
+from graph.gds_graph import GdsGraph
+
+
+class WarmupDegraded(Exception):
+    """Raised by a warm-up step that cannot succeed by retrying, e.g. a model that is not installed."""
+
+    def __init__(self, message: str, result: Any = None):
+        super().__init__(message)
+        self.result = result
+
+
+class WarmupService:
+    """
+    Warms the process up before it takes traffic.
+
+    Preloads the configured embedding and NER models and runs a dummy inference through them, opens
+    the Neo4j and Postgres connection pools and verifies the GDS graph. The service is ready once
+    every step succeeded or is degraded; failed steps (e.g. Neo4j still starting) are retried
+    periodically, degraded ones (e.g. a spaCy pipeline that is not installed) are not.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super().__new__(cls)
+            instance.steps = {}
+            instance.ready = False
+            instance.started_at = None
+            instance.finished_at = None
+            cls._instance = instance
+        return cls._instance
+
+    def _step_functions(self) -> Dict[str, Callable[[], Awaitable[Any]]]:
+        return {
+            "embedding": self._warm_up_embedding,
+            "ner": self._warm_up_ner,
+            "neo4j": self._warm_up_neo4j,
+            "gds": self._warm_up_gds,
+            "postgres": self._warm_up_postgres,
+        }
+
+    async def _warm_up_embedding(self) -> List[str]:
+        factory = EmbeddingFactory()
+        models = [name.strip() for name in config.WARMUP_EMBEDDING_MODELS.split(",") if name.strip()]
+        for model_name in models:
+            # bypass the embedding cache, the point is to run a forward pass
+            model = factory.get_model(model_name)
+            await run_in_compute_thread(model.get_embeddings, ["Warm up the embedding model.", "预热嵌入模型。"])
+        return models
+
+    async def _warm_up_ner(self) -> List[str]:
+        langs = [lang.strip() for lang in config.WARMUP_NER_LANGUAGES.split(",") if lang.strip()]
+        # each NER worker process loads its own pipelines, give every worker a warm-up task
+        results = await asyncio.gather(*(run_in_nlp_process(warm_up_ner, langs)
+                                         for _ in range(max(1, config.NLP_PROCESS_WORKERS))))
+        ready = set.intersection(*(set(result) for result in results))
+        missing = set(langs) - ready
+        if missing:
+            # a pipeline that is not installed does not appear by retrying, its language is skipped
+            raise WarmupDegraded(f"NER models not available for: {sorted(missing)}",
+                                 [lang for lang in langs if lang in ready])
+        return langs
+
+    async def _warm_up_neo4j(self) -> None:
+        await run_in_compute_thread(graph.query, "RETURN 1")
+
+    async def _warm_up_gds(self) -> str:
+        gds_graph_name = GdsGraph.test_graph_name if config.API_ENV.lower() == "test" else GdsGraph.graph_name
+        exists = await run_in_compute_thread(GdsGraph.check_gds_graph, gds_graph_name)
+        if not exists:
+            await run_in_compute_thread(GdsGraph.create_gds_graph, gds_graph_name)
+        return gds_graph_name
+
+    async def _warm_up_postgres(self) -> int:
+        async def ping():
+            async with db.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        # open several connections at once so that they stay in the pool
+        connections = max(1, config.WARMUP_POSTGRES_CONNECTIONS)
+        await asyncio.gather(*(ping() for _ in range(connections)))
+        return connections
+
+    async def _run_step(self, name: str, func: Callable[[], Awaitable[Any]]) -> bool:
+        start = time.perf_counter()
+        try:
+            result = await func()
+            self.steps[name] = {"status": "ok", "seconds": round(time.perf_counter() - start, 3), "result": result}
+            logger.info(f"Warm-up step '{name}' finished in {time.perf_counter() - start:.2f}s")
+            return True
+        except WarmupDegraded as e:
+            self.steps[name] = {"status": "degraded", "seconds": round(time.perf_counter() - start, 3),
+                                "result": e.result, "error": str(e)}
+            logger.warning(f"Warm-up step '{name}' is degraded: {e}")
+            return True
+        except Exception as e:
+            self.steps[name] = {"status": "failed", "seconds": round(time.perf_counter() - start, 3),
+                                "error": str(e)}
+            logger.error(f"Warm-up step '{name}' failed: {e}")
+            return False
+
+    async def run(self) -> None:
+        """Runs the warm-up steps until all of them succeeded or are degraded."""
+        self.started_at = time.time()
+        enabled = [name.strip() for name in config.WARMUP_STEPS.split(",") if name.strip()]
+        pending = {name: func for name, func in self._step_functions().items() if name in enabled}
+        for name in pending:
+            self.steps[name] = {"status": "pending"}
+
+        while pending:
+            results = await asyncio.gather(*(self._run_step(name, func) for name, func in pending.items()))
+            pending = {name: func for (name, func), done in zip(pending.items(), results) if not done}
+            if pending:
+                logger.warning(f"Warm-up steps {list(pending)} failed, retrying in {config.WARMUP_RETRY_SECONDS}s")
+                await asyncio.sleep(config.WARMUP_RETRY_SECONDS)
+
+        self.ready = True
+        self.finished_at = time.time()
+        logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.2f}s, the service is ready")
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the readiness and the status of every warm-up step."""
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": self.steps,
+        }
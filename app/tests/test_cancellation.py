@@ -0,0 +1,52 @@
+import asyncio
+
+from core import config
+from core.cancellation import CancellationRegistry
+
+
+class TestCancellationRegistry:
+
+    def test_cancel_flips_the_registered_token(self):
+        registry = CancellationRegistry()
+        assert registry is CancellationRegistry()
+        token = registry.register(-21)
+        assert not token.canceled
+        assert registry.running_jobs()[-21] is False
+
+        assert registry.cancel(-21)
+        assert token.canceled
+        registry.unregister(token)
+        assert -21 not in registry.running_jobs()
+        assert not registry.cancel(-21)
+
+    def test_a_new_job_replaces_the_token(self):
+        registry = CancellationRegistry()
+        old_token = registry.register(-22)
+        new_token = registry.register(-22)
+        registry.unregister(old_token)
+        registry.cancel(-22)
+        assert new_token.canceled and not old_token.canceled
+        registry.unregister(new_token)
+
+    def test_notification_cancels(self):
+        registry = CancellationRegistry()
+        token = registry.register(-23)
+        registry._on_notification(None, 1, "wisenet_graph_cancel", "-23")
+        registry._on_notification(None, 1, "wisenet_graph_cancel", "invalid")
+        assert token.canceled
+        registry.unregister(token)
+
+    def test_watch_polls_the_status(self, monkeypatch):
+        monkeypatch.setattr(config, "GRAPH_CANCEL_POLL_SECONDS", 0.01)
+        registry = CancellationRegistry()
+        token = registry.register(-24)
+        polls = []
+
+        async def is_canceled():
+            polls.append(1)
+            return len(polls) >= 3
+
+        asyncio.run(asyncio.wait_for(registry.watch(token, is_canceled), timeout=1))
+        assert token.canceled
+        assert len(polls) == 3
+        registry.unregister(token)
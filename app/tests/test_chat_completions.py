@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ai.chat_completions import apost_chat_completion, astream_chat_completion, parse_chat_completion, \
+    parse_stream_line
+from ai.http_clients import aclose_http_clients, get_async_http_client
+
+URL = "https://llm.test/v1/chat/completions"
+
+
+def completions_handler(request: httpx.Request) -> httpx.Response:
+    payload = json.loads(request.content)
+    if payload.get("stream"):
+        events = [{"choices": [{"delta": {"role": "assistant"}}]}] + \
+                 [{"choices": [{"delta": {"content": word}}]} for word in ["Hello", ", ", "world"]]
+        body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+    return httpx.Response(200, json={"choices": [{"message": {"content": "Hello, world"}}]})
+
+
+class TestChatCompletions:
+
+    def test_parse_chat_completion(self):
+        response = httpx.Response(200, json={"choices": [{"message": {"content": "Hi"}}]})
+        assert parse_chat_completion(response) == "Hi"
+
+        with pytest.raises(ValueError):
+            parse_chat_completion(httpx.Response(429, text="Too Many Requests"))
+        with pytest.raises(ValueError):
+            parse_chat_completion(httpx.Response(200, json={"choices": []}))
+
+    def test_parse_stream_line(self):
+        assert parse_stream_line('data: {"choices": [{"delta": {"content": "Hi"}}]}') == "Hi"
+        assert parse_stream_line(': keep-alive') == ""
+        assert parse_stream_line('data: {"choices": [{"delta": {"role": "assistant"}}]}') == ""
+        assert parse_stream_line("data: [DONE]") is None
+
+    def test_post_and_stream(self):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(completions_handler)) as client:
+                text = await apost_chat_completion(client, URL, {}, {"messages": []}, 5)
+                deltas = [delta async for delta in astream_chat_completion(client, URL, {}, {"messages": []}, 5)]
+            return text, deltas
+
+        text, deltas = asyncio.run(run())
+        assert text == "Hello, world"
+        assert deltas == ["Hello", ", ", "world"]
+
+    def test_async_client_is_shared_per_loop(self):
+        async def run():
+            client = get_async_http_client()
+            assert get_async_http_client() is client
+            await aclose_http_clients()
+            assert client.is_closed
+            return client
+
+        first = asyncio.run(run())
+        second = asyncio.run(run())
+        assert first is not second
@@ -0,0 +1,49 @@
+import pytest
+
+from ai.chunking import group_texts_by_tokens, pack_token_windows
+
+
+class TestPackTokenWindows:
+
+    def test_sentences_are_packed_whole(self):
+        windows = pack_token_windows([[1, 2], [3, 4, 5], [6], [7, 8, 9, 10]], window_size=4)
+        assert windows == [([1, 2], 2), ([3, 4, 5, 6], 4), ([7, 8, 9, 10], 4)]
+
+    def test_long_sentence_is_split_with_stride(self):
+        windows = pack_token_windows([[0], list(range(1, 11))], window_size=4, stride=3)
+        assert [window for window, _ in windows] == [[0], [1, 2, 3, 4], [4, 5, 6, 7], [7, 8, 9, 10]]
+        # overlapping tokens only count once, so the weights add up to the number of tokens
+        assert sum(tokens for _, tokens in windows) == 11
+
+    def test_no_token_is_lost(self):
+        sentences = [list(range(i * 100, i * 100 + n)) for i, n in enumerate([3, 17, 1, 9, 40])]
+        windows = pack_token_windows(sentences, window_size=8, stride=5)
+        covered = set(token for window, _ in windows for token in window)
+        assert covered == set(token for sentence in sentences for token in sentence)
+        assert all(len(window) <= 8 for window, _ in windows)
+
+    def test_invalid_window_size(self):
+        with pytest.raises(ValueError):
+            pack_token_windows([[1]], window_size=0)
+
+
+class TestGroupTextsByTokens:
+
+    @staticmethod
+    def count_words(text):
+        return len(text.split())
+
+    def test_texts_are_grouped_whole(self):
+        groups = group_texts_by_tokens(["a b", "c d e", "f", "", "g h i j"], 4, self.count_words)
+        assert groups == [["a b"], ["c d e", "f"], ["g h i j"]]
+
+    def test_long_text_is_cut(self):
+        text = " ".join(["word"] * 10)
+        groups = group_texts_by_tokens(["intro", text], 4, self.count_words)
+        assert groups[0][0] == "intro"
+        assert "".join(piece for group in groups for piece in group if piece != "intro") == text
+        assert all(sum(self.count_words(piece) for piece in group) <= 4 for group in groups)
+
+    def test_invalid_max_tokens(self):
+        with pytest.raises(ValueError):
+            group_texts_by_tokens(["a"], 0, self.count_words)
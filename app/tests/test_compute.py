@@ -0,0 +1,41 @@
+import asyncio
+import math
+import os
+import threading
+
+from ai import compute
+from core import config
+
+
+class TestCompute:
+
+    def teardown_method(self):
+        compute.shutdown_compute_executors()
+
+    def test_run_in_compute_thread(self):
+        async def run():
+            return await compute.run_in_compute_thread(lambda a, b=0: (a + b, threading.current_thread().name), 1, b=2)
+
+        result, thread_name = asyncio.run(run())
+        assert result == 3
+        assert thread_name.startswith("compute")
+
+    def test_run_in_nlp_process(self, monkeypatch):
+        monkeypatch.setattr(config, "NLP_PROCESS_WORKERS", 1)
+
+        async def run():
+            return await asyncio.gather(compute.run_in_nlp_process(math.factorial, 5),
+                                        compute.run_in_nlp_process(os.getpid))
+
+        factorial, pid = asyncio.run(run())
+        assert factorial == 120
+        assert pid != os.getpid()
+
+    def test_run_in_nlp_process_falls_back_to_threads(self, monkeypatch):
+        monkeypatch.setattr(config, "NLP_PROCESS_WORKERS", 0)
+
+        async def run():
+            return await compute.run_in_nlp_process(os.getpid)
+
+        assert asyncio.run(run()) == os.getpid()
+        assert compute.get_process_pool() is None
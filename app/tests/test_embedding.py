@@ -1,8 +1,48 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import time
 import unittest
-from ai.embedding import EmbeddingFactory, calculate_cosine_similarity
+from ai.embedding_cache import EmbeddingCache
+from ai.embedding import EmbeddingFactory, SBERTModel, calculate_cosine_similarity, check_onnx_parity, scatter_mean
 import numpy as np
 
 
+class WordLengthTokenizer:
+    """Tokenizes a sentence into the lengths of its words."""
+
+    def __call__(self, sentences, add_special_tokens=True, truncation=True, max_length=None):
+        return {'input_ids': [[len(word) for word in sentence.split()][:max_length] for sentence in sentences]}
+
+
+class WordLengthModel(SBERTModel):
+    """SBERT model whose sentence embedding is (number of tokens, sum of tokens), failing on 9-letter words."""
+
+    def __init__(self):
+        super().__init__("word-length")
+        self.batches = []
+        self.encoding = 0
+        self.max_encoding = 0
+
+    def load_model(self):
+        if self.model is None:
+            self.model = type("Model", (), {"tokenizer": WordLengthTokenizer()})()
+
+    def get_dimension(self) -> int:
+        return 2
+
+    def _encode_batch(self, input_ids, attention_mask):
+        self.batches.append([len(ids) for ids in input_ids])
+        self.encoding += 1
+        self.max_encoding = max(self.max_encoding, self.encoding)
+        time.sleep(0.001)
+        self.encoding -= 1
+        if any(9 in ids for ids in input_ids):
+            raise RuntimeError("cannot encode")
+        return np.array([[len(ids), sum(ids)] for ids in input_ids], dtype=np.float32)
+
+
 class TestEmbedding(unittest.TestCase):
     def setUp(self):
         self.embedding_factory = EmbeddingFactory()
@@ -229,5 +269,88 @@ class TestEmbedding(unittest.TestCase):
         similarity = self.embedding_factory.get_model("sbert").similarity(embedding, test_embedding)
         self.assertLessEqual(similarity, 0.2)  
 
+    @unittest.skipUnless(importlib.util.find_spec("onnxruntime"), "onnxruntime is not installed")
+    def test_onnx_parity_with_torch(self):
+        """Test the ONNX backend produces the same embeddings as the torch model."""
+        for quantize in (False, True):
+            result = check_onnx_parity(quantize=quantize)
+            self.assertTrue(result["passed"], result)
+
+        embedding = self.embedding_factory.get_embedding(text="This is a test sentence.", model_name="sbert-onnx")
+        self.assertEqual(embedding.shape, (768,))
+
+    def test_batched_embeddings_match_single_texts(self):
+        """Test the batched embeddings of several texts equal the embeddings of each text."""
+        texts = [
+            "Barack Obama visited San Francisco. He attended a conference at Stanford University!",
+            "This is a lie.",
+            "",
+            "巴拉克·奥巴马上周四访问了旧金山。他参加了斯坦福大学的人工智能会议。",
+        ]
+        model = self.embedding_factory.get_model("sbert")
+        batched = model.get_embeddings(texts, batch_size=2)
+        single = np.vstack([model.get_embedding(text) for text in texts])
+        np.testing.assert_allclose(batched, single, atol=1e-5)
+
+
+class TestBatchedEmbeddings(unittest.TestCase):
+    def test_order_is_restored_after_sorting_by_length(self):
+        model = WordLengthModel()
+        texts = ["a bb ccc dddd. e", "", "ffffff gg", "h. ii. jjj"]
+        embeddings = model.get_embeddings(texts, batch_size=2)
+
+        # the sentences are encoded shortest first, and averaged back into their texts in order
+        self.assertEqual([length for batch in model.batches for length in batch], [1, 1, 1, 1, 2, 4])
+        np.testing.assert_allclose(embeddings, [[2.5, 6], [0, 0], [2, 8], [1, 8 / 3]])
+        np.testing.assert_array_equal(embeddings, np.vstack([model.get_embedding(text) for text in texts]))
+
+    def test_failed_batch_is_left_out(self):
+        model = WordLengthModel()
+        embeddings = model.get_embeddings(["ab. abcdefghi", "abcdefghi"], batch_size=1)
+        np.testing.assert_array_equal(embeddings, [[1, 3], [0, 0]])
+
+    def test_shared_model_is_used_by_one_thread_at_a_time(self):
+        model = WordLengthModel()
+        threads = [threading.Thread(target=model.get_embeddings, args=(["a bb. ccc"] * 20,), kwargs={"batch_size": 1})
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(model.batches), 4 * 40)
+        self.assertEqual(model.max_encoding, 1)
+
+    def test_empty_texts_with_the_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = EmbeddingCache(os.path.join(tmpdir, "embeddings.db"))
+            factory = EmbeddingFactory(cache=cache)
+            factory.models["word-length"] = WordLengthModel()
+            for _ in range(2):
+                embeddings = factory.get_embeddings_for_texts([None, "a bb", ""], model_name="word-length")
+                np.testing.assert_array_equal(embeddings, [[0, 0], [2, 3], [0, 0]])
+            # the second call is served from the cache, the empty texts are not looked up
+            self.assertEqual(cache.stats()["entries"], 1)
+            self.assertEqual(cache.stats()["hits"], 1)
+            self.assertEqual(cache.stats()["misses"], 1)
+            cache.close()
+
+
+class TestScatterMean(unittest.TestCase):
+    def test_rows_are_averaged_into_their_owners(self):
+        embeddings = np.array([[1, 2], [3, 4], [5, 6], [7, 8]], dtype=np.float32)
+        valid = np.ones(4, dtype=bool)
+        result = scatter_mean(embeddings, [2, 0, 2, 2], valid, 3)
+        np.testing.assert_allclose(result, [[3, 4], [0, 0], [13 / 3, 16 / 3]])
+
+    def test_invalid_rows_are_left_out(self):
+        embeddings = np.array([[1, 2], [3, 4], [5, 6]], dtype=np.float32)
+        result = scatter_mean(embeddings, [0, 0, 1], np.array([True, False, False]), 2)
+        np.testing.assert_array_equal(result, [[1, 2], [0, 0]])
+
+    def test_weights(self):
+        embeddings = np.array([[1, 0], [0, 1]], dtype=np.float32)
+        result = scatter_mean(embeddings, [0, 0], np.ones(2, dtype=bool), 1, weights=[3, 1])
+        np.testing.assert_allclose(result, [[0.75, 0.25]])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,18 @@
+from benchmarks.embedding_benchmark import compare, make_corpus
+
+
+class TestEmbeddingBenchmark:
+
+    def test_corpus_is_deterministic(self):
+        assert make_corpus("en", "medium", 5) == make_corpus("en", "medium", 5)
+        assert make_corpus("zh", "short", 5) != make_corpus("zh", "short", 5, seed=7)
+        assert all("。" in text for text in make_corpus("zh", "long", 3))
+
+    def test_compare_flags_regressions(self):
+        baseline = [{"model": "sbert", "lang": "en", "length": "short", "batch_size": 32, "texts_per_second": 100.0}]
+        results = [{"model": "sbert", "lang": "en", "length": "short", "batch_size": 32, "texts_per_second": 80.0},
+                   {"model": "sbert", "lang": "zh", "length": "short", "batch_size": 32, "texts_per_second": 90.0}]
+        comparison = compare(results, baseline, tolerance=0.1)
+        assert len(comparison) == 1
+        assert comparison[0]["ratio"] == 0.8
+        assert comparison[0]["regression"]
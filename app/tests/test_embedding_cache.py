@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import numpy as np
+
+from ai.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache:
+
+    def setup_method(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = EmbeddingCache(os.path.join(self.tmpdir.name, "cache", "embeddings.db"), max_entries=3)
+
+    def teardown_method(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_get_many_hits_and_misses(self):
+        self.cache.put_many("sbert", 128, ["apple", "banana"], [np.ones(4), np.full(4, 2.0)])
+        results = self.cache.get_many("sbert", 128, ["apple", "cherry", "banana", "apple"])
+
+        assert results[1] is None
+        np.testing.assert_array_equal(results[0], np.ones(4, dtype=np.float32))
+        np.testing.assert_array_equal(results[2], np.full(4, 2.0, dtype=np.float32))
+        np.testing.assert_array_equal(results[3], results[0])
+        stats = self.cache.stats()
+        assert stats["hits"] == 3
+        assert stats["misses"] == 1
+        assert stats["entries"] == 2
+
+    def test_key_includes_model_and_chunk_size(self):
+        self.cache.put("sbert", 128, "apple", np.ones(4))
+        assert self.cache.get("sbert", 256, "apple") is None
+        assert self.cache.get("mlongt5", 128, "apple") is None
+        assert self.cache.get("sbert", 128, "apple") is not None
+
+    def test_vectors_are_stored_as_float32(self):
+        self.cache.put("sbert", 128, "apple", np.arange(4, dtype=np.float64))
+        embedding = self.cache.get("sbert", 128, "apple")
+        assert embedding.dtype == np.float32
+        np.testing.assert_array_equal(embedding, np.arange(4))
+        # the returned vector does not share the read-only buffer of the row
+        embedding[0] = 1.0
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from ai.embedding_queue import EmbeddingBatcher
+
+
+class CountingFactory:
+    """Embeds a text as [len(text)] and records the batches it receives."""
+
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+
+    def get_embeddings_for_texts(self, texts, model_name="sbert", max_tokens_each_chunk=128):
+        self.batches.append((model_name, list(texts)))
+        self.threads.add(threading.current_thread().name)
+        return np.array([[float(len(text))] for text in texts])
+
+
+class TestEmbeddingBatcher:
+
+    def test_concurrent_requests_share_a_batch(self):
+        factory = CountingFactory()
+        batcher = EmbeddingBatcher(factory=factory, max_batch_size=64, max_wait_ms=20)
+
+        async def run():
+            return await asyncio.gather(*(batcher.embed("x" * i) for i in range(1, 11)))
+
+        results = asyncio.run(run())
+
+        assert [result[0] for result in results] == [float(i) for i in range(1, 11)]
+        assert len(factory.batches) == 1
+        assert batcher.stats()["max_batch_size"] == 10
+        assert all(name.startswith("embedding-batcher") for name in factory.threads)
+
+    def test_requests_are_grouped_by_model(self):
+        factory = CountingFactory()
+        batcher = EmbeddingBatcher(factory=factory, max_batch_size=64, max_wait_ms=20)
+
+        async def run():
+            return await asyncio.gather(batcher.embed("a", model_name="sbert"),
+                                        batcher.embed("bb", model_name="mlongt5"),
+                                        batcher.embed("ccc", model_name="sbert"))
+
+        results = asyncio.run(run())
+
+        assert [result[0] for result in results] == [1.0, 2.0, 3.0]
+        assert sorted(model for model, _ in factory.batches) == ["mlongt5", "sbert"]
+
+    def test_errors_propagate_to_callers(self):
+        class FailingFactory:
+            def get_embeddings_for_texts(self, texts, model_name="sbert", max_tokens_each_chunk=128):
+                raise RuntimeError("model unavailable")
+
+        batcher = EmbeddingBatcher(factory=FailingFactory(), max_wait_ms=1)
+
+        async def run():
+            try:
+                await batcher.embed("a")
+            except RuntimeError as e:
+                return str(e)
+
+        assert asyncio.run(run()) == "model unavailable"
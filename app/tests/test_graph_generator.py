@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core.cancellation import CancellationRegistry
+from graph import NodeType, generation_checkpoint, graph_generator
+from ai.prompt_dedup import PromptDedupIndex
+from graph.generation_checkpoint import JOB_DONE, JOB_STOPPED, GenerationCheckpoint
+from graph.graph_generator import KnowledgeGraphGenerator
+from graph.node_write_buffer import NodeWriteBuffer
+
+
+class FakeGraph:
+    """Records the nodes and relationships the generator creates instead of writing them to Neo4j."""
+
+    def __init__(self, monkeypatch, prompts_per_answer=3):
+        self.ids = itertools.count(1)
+        self.nodes = []
+        self.links = []
+        self.answered_depths = []
+        self.in_flight = 0
+        self.round_trips = 0
+        self.max_in_flight = 0
+
+        def query_database(query, params):
+            # stands for the UNWIND ... CREATE of NodeWriteBuffer
+            self.round_trips += 1
+            if "source_element_id" in params["rows"][0]:
+                self.links.extend(params["rows"])
+                return [{"count": len(params["rows"])}]
+            result = []
+            for row in params["rows"]:
+                node_id = next(self.ids)
+                self.nodes.append({**row, "element_id": f"4:node:{node_id}"})
+                result.append({"key": row["key"], "id": node_id, "element_id": f"4:node:{node_id}"})
+            return result
+
+        async def get_ai_response_async(content, llm_name):
+            self.answered_depths.append(content.count("/"))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.001)
+            self.in_flight -= 1
+            return content + " answer"
+
+        async def generate_prompts_from_text_async(text, llm_name):
+            return [{"id": i, "prompt": f"{text.removesuffix(' answer')}/{i}"} for i in range(prompts_per_answer)]
+
+        async def is_canceled(generator):
+            return False
+
+        monkeypatch.setattr(graph_generator.Node, "_query_database", staticmethod(query_database))
+        monkeypatch.setattr(graph_generator.Node, "create_index", lambda node, label: None)
+        monkeypatch.setattr(graph_generator.Llm, "get_ai_response_async", staticmethod(get_ai_response_async))
+        monkeypatch.setattr(graph_generator.Llm, "generate_prompts_from_text_async",
+                            staticmethod(generate_prompts_from_text_async))
+        monkeypatch.setattr(KnowledgeGraphGenerator, "_is_canceled", is_canceled)
+
+
+class FakeCheckpointStore:
+    """Keeps the checkpoint rows of one job in memory instead of Postgres."""
+
+    def __init__(self, monkeypatch, fake_graph):
+        self.rows = {}
+        self.status = None
+
+        async def start(checkpoint, llm_name, max_depth):
+            checkpoint.job_id = 1
+
+        async def load(checkpoint):
+            checkpoint.job_id = 1
+            return sorted((row for row in self.rows.values() if row.status == "PENDING"), key=lambda row: row.depth)
+
+        async def flush(checkpoint, batch):
+            frontier, answers, expanded = GenerationCheckpoint._resolve(batch)
+            for node in frontier:
+                self.rows[node.element_id] = SimpleNamespace(element_id=node.element_id, content=node.content,
+                                                             depth=node.depth, status="PENDING", answer=None)
+            for element_id, answer in answers:
+                self.rows[element_id].answer = answer
+            for element_id in expanded:
+                self.rows[element_id].status = "EXPANDED"
+
+        async def finish(checkpoint, status):
+            self.status = status
+
+        def delete_partial_expansions(query, params):
+            # stands for the DETACH DELETE of the answers below the pending nodes and their subtrees
+            deleted = set(params["element_ids"])
+            while True:
+                children = {row["element_id"] for row in fake_graph.nodes
+                            if row["parent_element_id"] in deleted and row["element_id"] not in deleted}
+                if not children:
+                    break
+                deleted |= children
+            fake_graph.nodes = [row for row in fake_graph.nodes
+                                if row["element_id"] not in deleted or row["element_id"] in params["element_ids"]]
+
+        monkeypatch.setattr(GenerationCheckpoint, "start", start)
+        monkeypatch.setattr(GenerationCheckpoint, "load", load)
+        monkeypatch.setattr(GenerationCheckpoint, "flush", flush)
+        monkeypatch.setattr(GenerationCheckpoint, "finish", finish)
+        monkeypatch.setattr(graph_generator, "graph", SimpleNamespace(query=delete_partial_expansions))
+
+    def pending(self):
+        return [row for row in self.rows.values() if row.status == "PENDING"]
+
+
+def subject_node():
+    return SimpleNamespace(id=0, element_id="subject", content="subject", depth=1)
+
+
+class TestKnowledgeGraphGenerator:
+
+    def test_breadth_first_with_bounded_workers(self, monkeypatch):
+        fake = FakeGraph(monkeypatch)
+        generator = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, workers=2,
+                                            max_nodes=0, max_llm_calls=0)
+        asyncio.run(generator.generate_knowledge_graph(subject_node()))
+
+        # answers of depth 2, 4 and 6 to 1, 3 and 9 prompts, and the 3 + 9 prompts of depth 3 and 5
+        assert len(fake.nodes) == 1 + 3 + 9 + 3 + 9
+        assert generator.llm_calls == 13 + 4
+        assert fake.max_in_flight == 2
+        assert fake.answered_depths == sorted(fake.answered_depths)
+        assert generator._write_buffer.nodes_written == len(fake.nodes)
+        assert fake.round_trips < len(fake.nodes) / 2
+
+    def test_caps(self, monkeypatch):
+        fake = FakeGraph(monkeypatch)
+        generator = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, workers=4, max_nodes=10,
+                                            max_llm_calls=0)
+        asyncio.run(generator.generate_knowledge_graph(subject_node()))
+        assert len(fake.nodes) == generator.nodes_created == 10
+
+        fake = FakeGraph(monkeypatch)
+        generator = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, workers=4, max_nodes=0,
+                                            max_llm_calls=5)
+        asyncio.run(generator.generate_knowledge_graph(subject_node()))
+        assert generator.llm_calls == 5
+
+    def test_cancellation_stops_the_expansion(self, monkeypatch):
+        fake = FakeGraph(monkeypatch)
+        generator = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, lib_id=-31, workers=1,
+                                            max_nodes=0, max_llm_calls=0)
+
+        async def cancel_after_first_level(content, llm_name):
+            CancellationRegistry().cancel(-31)
+            return content + " answer"
+
+        monkeypatch.setattr(graph_generator.Llm, "get_ai_response_async", staticmethod(cancel_after_first_level))
+        asyncio.run(generator.generate_knowledge_graph(subject_node()))
+        assert generator.canceled
+        # the subject is answered, its prompts are written but not expanded
+        assert generator.llm_calls == 2
+        assert len(fake.nodes) == 1 + 3
+        assert -31 not in CancellationRegistry().running_jobs()
+
+    def test_resume_continues_from_the_checkpoint(self, monkeypatch):
+        fake = FakeGraph(monkeypatch)
+        store = FakeCheckpointStore(monkeypatch, fake)
+        generator = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, workers=1, max_nodes=0,
+                                            max_llm_calls=7)
+        generator._checkpoint.job_id = 1
+        generator._checkpoint.add_pending(subject_node())
+        asyncio.run(generator.generate_knowledge_graph(subject_node()))
+        assert store.status == JOB_STOPPED
+        # the 7th call answered a prompt of depth 3 whose prompts could not be generated
+        answered = [row for row in store.pending() if row.answer]
+        assert len(answered) == 1
+        assert answered[0].depth == 3
+
+        calls = []
+
+        async def get_ai_response_async(content, llm_name):
+            calls.append(content)
+            return content + " answer"
+
+        monkeypatch.setattr(graph_generator.Llm, "get_ai_response_async", staticmethod(get_ai_response_async))
+        resumed = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, workers=1, max_nodes=0,
+                                          max_llm_calls=0)
+        monkeypatch.setattr(resumed, "_get_or_create_root_node", lambda: None)
+        asyncio.run(resumed.resume())
+
+        assert store.status == JOB_DONE
+        assert not store.pending()
+        # the stored answer is reused and the nodes expanded before the interruption are not asked again
+        assert answered[0].content not in calls
+        assert "subject" not in calls
+        # the graph is the one of an uninterrupted run
+        assert len(fake.nodes) == 1 + 3 + 9 + 3 + 9
+        assert sum(row["type"] == NodeType.INFO.value for row in fake.nodes) == 1 + 3 + 9
+
+    def test_duplicate_prompts_are_linked_instead_of_expanded(self, monkeypatch):
+        fake = FakeGraph(monkeypatch)
+
+        dimensions = {}
+
+        async def embed(index, prompts):
+            embeddings = np.zeros((len(prompts), 64))
+            for i, prompt in enumerate(prompts):
+                # the last prompt generated from every answer means the same as the first one ever generated
+                key = "/2" if prompt.endswith("/2") else prompt
+                embeddings[i, dimensions.setdefault(key, len(dimensions))] = 1.0
+            return embeddings
+
+        monkeypatch.setattr(PromptDedupIndex, "_embed_with_batcher", embed)
+        generator = KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=6, workers=1, max_nodes=0,
+                                            max_llm_calls=0, dedup_prompts=True)
+        asyncio.run(generator.generate_knowledge_graph(subject_node()))
+
+        prompts = [row["content"] for row in fake.nodes if row["type"] == NodeType.PROMPT.value]
+        # "subject/2" is kept, the "/2" prompts generated from its siblings and children are linked to it
+        assert sum(prompt.endswith("/2") for prompt in prompts) == 1
+        assert len(fake.links) == generator._prompt_index.duplicates == 3
+        assert len(prompts) == 3 + 6
+        assert {link["target_element_id"] for link in fake.links} == {
+            row["element_id"] for row in fake.nodes if row["content"] == "subject/2"}
+        assert generator._write_buffer.links_written == len(fake.links)
+
+    def test_checkpoint_start_failure_generates_without_checkpoint(self, monkeypatch):
+        def get_async_session():
+            raise RuntimeError('relation "graph_generation_job" does not exist')
+
+        monkeypatch.setattr(generation_checkpoint.db, "get_async_session", get_async_session)
+        checkpoint = GenerationCheckpoint(lib_id=1, subject_id=1)
+        assert asyncio.run(checkpoint.start("llama3.1", 4)) is None
+        assert checkpoint.job_id is None
+        # without a job, flushing and finishing do not touch the database
+        checkpoint.add_pending(subject_node())
+        asyncio.run(checkpoint.flush(checkpoint.take()))
+        asyncio.run(checkpoint.finish(JOB_DONE))
+
+    def test_invalid_depth(self):
+        with pytest.raises(ValueError):
+            KnowledgeGraphGenerator("lib", "subject", "llama3.1", max_depth=3)
+
+
+class TestNodeWriteBuffer:
+
+    def test_flush_writes_a_wave_per_level(self, monkeypatch):
+        fake = FakeGraph(monkeypatch)
+        buffer = NodeWriteBuffer(lib_id=1, subject_id=1, batch_size=3)
+        answers = [buffer.add_node(subject_node(), f"answer {i}", NodeType.INFO, 2) for i in range(2)]
+        prompts = [buffer.add_node(answer, f"prompt {i}", NodeType.PROMPT, 3) for answer in answers for i in range(3)]
+        assert buffer.is_full()
+
+        asyncio.run(buffer.flush())
+        assert fake.round_trips == 2
+        assert buffer.nodes_written == 8
+        assert all(node.element_id for node in answers + prompts)
+        assert [row["parent_element_id"] for row in fake.nodes[2:5]] == [answers[0].element_id] * 3
+        assert not buffer.is_full()
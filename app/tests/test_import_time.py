@@ -0,0 +1,25 @@
+from benchmarks.import_time import parse_importtime, summarize
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       169 |        169 |   _io
+import time:      4122 |       4761 | _frozen_importlib_external
+import time:      1000 |       1000 |     torch._C
+import time:      2000 |       3000 |   torch
+import time:       500 |       3500 | ai.embedding
+"""
+
+
+class TestImportTime:
+
+    def test_parse_importtime(self):
+        entries = parse_importtime(SAMPLE)
+        assert [entry["module"] for entry in entries] == ["_io", "_frozen_importlib_external", "torch._C",
+                                                          "torch", "ai.embedding"]
+        assert [entry["depth"] for entry in entries] == [1, 0, 2, 1, 0]
+        assert entries[3]["cumulative_us"] == 3000
+
+    def test_summarize(self):
+        summary = summarize(parse_importtime(SAMPLE))
+        assert summary["total_ms"] == 8.3
+        assert summary["heavy_modules_imported"] == ["torch"]
+        assert list(summary["slowest_packages_ms"])[0] == "_frozen_importlib_external"
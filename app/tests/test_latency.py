@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from ai.latency import LatencyTracker, hedged_call
+
+
+def make_tracker(latencies):
+    tracker = LatencyTracker(window=100, min_samples=5)
+    for model_name, seconds in latencies.items():
+        for _ in range(10):
+            tracker.observe(model_name, seconds)
+    return tracker
+
+
+def make_call(delays, failing=()):
+    calls = []
+
+    async def call(model_name):
+        calls.append(model_name)
+        await asyncio.sleep(delays[model_name])
+        if model_name in failing:
+            raise RuntimeError(f"{model_name} failed")
+        return model_name
+
+    return call, calls
+
+
+class TestLatencyTracker:
+
+    def test_quantile_needs_min_samples(self):
+        tracker = LatencyTracker(window=100, min_samples=5)
+        for seconds in [0.1, 0.2, 0.3, 0.4]:
+            tracker.observe("llama3.1", seconds)
+        assert tracker.quantile("llama3.1", 0.9) is None
+
+        tracker.observe("llama3.1", 5.0)
+        assert tracker.quantile("llama3.1", 0.5) == 0.3
+        assert tracker.quantile("llama3.1", 0.99) == 5.0
+
+    def test_window_and_histogram(self):
+        tracker = LatencyTracker(window=3, min_samples=1)
+        for seconds in [10, 10, 0.1, 0.1, 0.1]:
+            tracker.observe("llama3.1", seconds)
+        stats = tracker.stats()["llama3.1"]
+        assert stats["samples"] == 3
+        assert stats["p99"] == 0.1
+        assert stats["histogram"]["le_0.25"] == 3
+        assert stats["histogram"]["le_10"] == 2
+
+
+class TestHedgedCall:
+
+    def test_fast_primary_is_not_hedged(self):
+        tracker = make_tracker({"primary": 0.05})
+        call, calls = make_call({"primary": 0.01, "secondary": 0.01})
+
+        assert asyncio.run(hedged_call(call, "primary", "secondary", 0.9, tracker)) == "primary"
+        assert calls == ["primary"]
+
+    def test_slow_primary_is_hedged(self):
+        tracker = make_tracker({"primary": 0.02})
+        call, calls = make_call({"primary": 1.0, "secondary": 0.01})
+
+        assert asyncio.run(hedged_call(call, "primary", "secondary", 0.9, tracker)) == "secondary"
+        assert calls == ["primary", "secondary"]
+        stats = tracker.stats()["primary"]
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+
+    def test_failed_hedge_waits_for_primary(self):
+        tracker = make_tracker({"primary": 0.02})
+        call, _ = make_call({"primary": 0.1, "secondary": 0.01}, failing={"secondary"})
+
+        assert asyncio.run(hedged_call(call, "primary", "secondary", 0.9, tracker)) == "primary"
+
+    def test_both_failing_raises(self):
+        tracker = make_tracker({"primary": 0.02})
+        call, _ = make_call({"primary": 0.1, "secondary": 0.01}, failing={"primary", "secondary"})
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(hedged_call(call, "primary", "secondary", 0.9, tracker))
+
+    def test_no_hedge_without_latency_history(self):
+        tracker = LatencyTracker(window=100, min_samples=5)
+        call, calls = make_call({"primary": 0.05, "secondary": 0.01})
+
+        assert asyncio.run(hedged_call(call, "primary", "secondary", 0.9, tracker)) == "primary"
+        assert calls == ["primary"]
+        assert tracker.stats()["primary"]["samples"] == 1
+
+    def test_kind_has_its_own_latency_window(self):
+        # fast generation calls of the primary must not set the hedge delay of its slower summaries
+        tracker = make_tracker({"primary": 0.001, "primary:summary": 0.5})
+        call, calls = make_call({"primary": 0.05, "secondary": 0.01})
+
+        assert asyncio.run(hedged_call(call, "primary", "secondary", 0.9, tracker, kind="summary")) == "primary"
+        assert calls == ["primary"]
+        stats = tracker.stats()
+        assert stats["primary:summary"]["samples"] == stats["primary"]["samples"] + 1
@@ -1,5 +1,6 @@
 import pytest
 from ai.llm import Llm
+from ai.token_budget import count_tokens
 from core.i18n import _, set_locale
 
 class TestLlm:
@@ -19,6 +20,61 @@ class TestLlm:
         assert llm_instance is not None
         assert type(llm_instance).__name__ == 'OllamaLLM'
 
+    def test_retrieve_llm_by_name_reuses_clients(self):
+        Llm.clear_client_pool()
+        llm_instance = Llm.retrieve_llm_by_name('llama3.1')
+        assert Llm.retrieve_llm_by_name('llama3.1') is llm_instance
+        assert Llm.retrieve_llm_by_name('llama3.1', temperature=0.1) is not llm_instance
+        stats = Llm.client_pool_stats()
+        assert stats["size"] == 2
+        assert stats["hits"] >= 1
+
+    def test_render_within_budget_truncates_the_largest_input(self, monkeypatch):
+        from langchain_core.prompts import PromptTemplate
+        from core import config
+        monkeypatch.setattr(config, "LLM_CONTEXT_WINDOWS", "llama3.1=1000")
+        monkeypatch.setattr(config, "LLM_OUTPUT_TOKEN_RESERVE", 200)
+        prompt = PromptTemplate.from_template("Summarize {count} points of: {input}")
+
+        prompt_value, tokens, truncated = Llm._render_within_budget(
+            "llama3.1", prompt, {"input": "word " * 2000, "count": 3})
+        assert truncated
+        assert tokens <= 800
+        assert prompt_value.to_string().startswith("Summarize 3 points of: word")
+
+        _, _, truncated = Llm._render_within_budget("llama3.1", prompt, {"input": "a short text", "count": 3})
+        assert not truncated
+
+    def test_invoke_with_limits_retries_and_times_out(self, monkeypatch):
+        import time
+        from core import config
+
+        monkeypatch.setattr(config, "LLM_TIMEOUT", 0.05)
+        monkeypatch.setattr(config, "LLM_RATE_LIMIT_RETRIES", 1)
+        monkeypatch.setattr(config, "LLM_RATE_LIMIT_BACKOFF_SECONDS", 0)
+        calls = []
+
+        class Prompt:
+            def to_string(self):
+                return "Summarize apples"
+
+        class SlowLlm:
+            def invoke(self, prompt_value):
+                calls.append(prompt_value)
+                # the first attempt is stuck, the retry answers
+                time.sleep(0.2 if len(calls) == 1 else 0)
+                return "apples"
+
+        assert Llm._invoke_with_limits(SlowLlm(), "llama3.1", Prompt()) == "apples"
+        assert len(calls) == 2
+
+        class StuckLlm:
+            def invoke(self, prompt_value):
+                time.sleep(0.2)
+
+        with pytest.raises(TimeoutError):
+            Llm._invoke_with_limits(StuckLlm(), "llama3.1", Prompt())
+
     def test_get_ai_response_by_wizardlm2(self):
         user_message = "Hello, how are you?"
         response = Llm.get_ai_response(user_message, 'wizardlm2')
@@ -213,6 +269,41 @@ class TestLlm:
         # Assertions
         assert len(summary_chunks) > 0
 
+    @pytest.mark.asyncio
+    async def test_summary_message_history_streaming_yields_tokens(self, monkeypatch):
+        from langchain_core.language_models import FakeStreamingListLLM
+        monkeypatch.setattr(Llm, "retrieve_llm_by_name", lambda llm_name: FakeStreamingListLLM(
+            responses=["They greeted each other."]))
+
+        summary_chunks = []
+        async for chunk in Llm.summary_message_history_streaming(["Hello", "Hi"], "llama3.1"):
+            summary_chunks.append(chunk)
+
+        assert len(summary_chunks) > 1
+        assert "".join(summary_chunks) == "They greeted each other."
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("chain_type, summary", [("refine", "Refined summary."),
+                                                     ("map_reduce", "Combined summary.")])
+    async def test_summary_message_history_streaming_by_chain_type(self, monkeypatch, chain_type, summary):
+        from langchain_core.language_models import FakeListLLM
+
+        class FakeSummaryLLM(FakeListLLM):
+            def get_num_tokens(self, text: str) -> int:
+                # spares the tokenizer download of the default implementation
+                return len(text) // 4
+
+        # refine: the question prompt and one refine step; map_reduce: one map per message and the combine
+        responses = {"refine": ["First summary.", "Refined summary."],
+                     "map_reduce": ["Hello summary.", "Hi summary.", "Combined summary."]}[chain_type]
+        monkeypatch.setattr(Llm, "retrieve_llm_by_name", lambda llm_name: FakeSummaryLLM(responses=responses))
+
+        summary_chunks = []
+        async for chunk in Llm.summary_message_history_streaming(["Hello", "Hi"], "llama3.1", chain_type=chain_type):
+            summary_chunks.append(chunk)
+
+        assert "".join(summary_chunks) == summary
+
     def test_summary_message_history_by_map_reduce(self):
         messages = [
             {"role": "user", "content": "Hello"},
@@ -224,4 +315,52 @@ class TestLlm:
         ]
         result = Llm.summary_message_history(messages, "wizardlm2", chain_type="map_reduce")
         print("test_summary_message_history by map_reduce:", result.get("output_text"))
-        assert result is not None
\ No newline at end of file
+        assert result is not None
+
+class TestSummarizeDocumentsMapReduce:
+
+    @pytest.fixture
+    def summary_calls(self, monkeypatch):
+        from langchain_core.documents import Document
+        from core import config
+
+        monkeypatch.setattr(config, "LLM_TOKEN_BUDGET_ENABLED", False)
+        monkeypatch.setattr(config, "LLM_SUMMARY_STUFF_MAX_TOKENS", 150)
+        monkeypatch.setattr(config, "LLM_SUMMARY_GROUP_TOKENS", 200)
+        monkeypatch.setattr(Llm, "_summary_group_prompts", classmethod(lambda cls: ("part", "final")))
+        calls = {"part": [], "final": [], "shorten": True}
+
+        def invoke(cls, llm_name, prompt, inputs, parse=None, use_cache=True):
+            calls[prompt].append(inputs["context"])
+            if prompt == "final":
+                assert parse == Llm.parse_json_response
+                return {"title": "Title", "summary": "Summary"}
+            # a part summary is a quarter of its text, or the text itself when the summaries stop shrinking
+            return inputs["context"][:len(inputs["context"]) // 4] if calls["shorten"] else inputs["context"]
+
+        monkeypatch.setattr(Llm, "_invoke", classmethod(invoke))
+        # 8 pages of 100 tokens, grouped by 2 into the first round of 4 part summaries
+        documents = [Document(page_content="a" * 400) for _ in range(8)]
+        return calls, documents
+
+    def test_reduces_until_the_summaries_fit(self, summary_calls):
+        calls, documents = summary_calls
+
+        result = Llm.summarize_documents_map_reduce(documents, "llama3.1")
+
+        assert result == {"title": "Title", "summary": "Summary"}
+        # 4 part summaries of 50 tokens are still over 150 tokens, a second round reduces them
+        assert len(calls["part"]) > 4
+        assert len(calls["final"]) == 1
+        assert count_tokens(calls["final"][0], "llama3.1") <= 150
+
+    def test_stops_when_the_summaries_no_longer_get_shorter(self, summary_calls):
+        calls, documents = summary_calls
+        calls["shorten"] = False
+
+        result = Llm.summarize_documents_map_reduce(documents, "llama3.1")
+
+        assert result == {"title": "Title", "summary": "Summary"}
+        assert len(calls["part"]) == 4
+        # the final call summarizes the last round as it is
+        assert calls["final"] == ["\n\n".join(calls["part"])]
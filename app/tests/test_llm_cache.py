@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+from ai.llm_cache import LlmResponseCache
+
+PARAMS = {"top_p": 0.5, "temperature": 0.7, "n": 1}
+
+
+class TestLlmResponseCache:
+
+    def setup_method(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = LlmResponseCache(os.path.join(self.tmpdir.name, "cache", "llm.db"), max_entries=3)
+
+    def teardown_method(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_get_hits_and_misses(self):
+        key = self.cache.make_key("llama3.1", PARAMS, "Summarize apples")
+        assert self.cache.get(key) is None
+        self.cache.put(key, "llama3.1", '{"result": "apples"}')
+        assert self.cache.get(key) == '{"result": "apples"}'
+
+        stats = self.cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_key_includes_model_params_and_prompt(self):
+        key = self.cache.make_key("llama3.1", PARAMS, "apple")
+        assert key == self.cache.make_key("llama3.1", dict(reversed(list(PARAMS.items()))), "apple")
+        assert key != self.cache.make_key("gpt-4o", PARAMS, "apple")
+        assert key != self.cache.make_key("llama3.1", {**PARAMS, "temperature": 0.1}, "apple")
+        assert key != self.cache.make_key("llama3.1", PARAMS, "banana")
+
+    def test_ttl_can_be_changed(self):
+        self.cache.ttl_seconds = 60
+        assert self.cache.store.ttl_seconds == 60
+        assert self.cache.stats()["ttl_seconds"] == 60
+
+    def test_empty_responses_are_not_cached(self):
+        key = self.cache.make_key("llama3.1", PARAMS, "apple")
+        self.cache.put(key, "llama3.1", "")
+        assert self.cache.stats()["entries"] == 0
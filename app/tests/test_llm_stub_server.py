@@ -0,0 +1,77 @@
+import json
+import random
+import threading
+
+import httpx
+
+from benchmarks.llm_stub_server import (LatencyModel, StubState, create_server, find_result_example,
+                                        request_key, synthesize_answer)
+
+PROMPT = ('Generate 3 questions. Output JSON like {"result": [{"id":1,"question":"question"}]} '
+          'about the text: rivers of Europe')
+
+
+class TestLlmStubServer:
+
+    def test_answer_follows_the_result_example(self):
+        assert find_result_example(PROMPT) == [{"id": 1, "question": "question"}]
+        answer = json.loads(synthesize_answer(PROMPT, seed=1, list_size=4))
+        assert [item["id"] for item in answer["result"]] == [1, 2, 3, 4]
+        assert all(isinstance(item["question"], str) for item in answer["result"])
+        assert synthesize_answer(PROMPT, seed=1) == synthesize_answer(PROMPT, seed=1)
+        assert synthesize_answer(PROMPT, seed=1) != synthesize_answer(PROMPT, seed=2)
+        assert find_result_example("Summarize the conversation") is None
+        assert len(synthesize_answer("Summarize the conversation", seed=1, paragraph_words=24).split()) == 24
+
+    def test_latency_model(self):
+        assert LatencyModel("fixed:0.5").first_token(random.Random(0)) == 0.5
+        lognormal = LatencyModel("lognormal:1,0.5")
+        assert lognormal.first_token(random.Random(3)) == lognormal.first_token(random.Random(3))
+        assert 2 <= LatencyModel("uniform:2,3").first_token(random.Random(0)) <= 3
+
+    def test_request_key(self):
+        assert request_key("/api/chat", {"a": 1, "b": 2}) == request_key("/api/chat", {"b": 2, "a": 1})
+        assert request_key("/api/chat", {"a": 1}) != request_key("/api/generate", {"a": 1})
+
+    def test_server_endpoints(self, tmp_path):
+        cassette = tmp_path / "cassette.jsonl"
+        body = {"model": "stub", "prompt": "hello", "stream": False}
+        cassette.write_text(json.dumps({"key": request_key("/api/generate", body), "status": 200,
+                                        "content_type": "application/json", "body": '{"response": "recorded"}'}))
+        state = StubState(LatencyModel("fixed:0"), replay=str(cassette))
+        server = create_server("127.0.0.1", 0, state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with httpx.Client(base_url=base_url) as client:
+                assert client.post("/api/generate", json=body).json() == {"response": "recorded"}
+
+                chat = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": PROMPT}]})
+                content = chat.json()["choices"][0]["message"]["content"]
+                assert len(json.loads(content)["result"]) == 3
+
+                lines = client.post("/api/chat", json={"messages": [{"role": "user", "content": PROMPT}]}).text
+                chunks = [json.loads(line) for line in lines.splitlines()]
+                assert chunks[-1]["done"]
+                assert "".join(chunk["message"]["content"] for chunk in chunks) == content
+
+                events = client.post("/v1/chat/completions", json={
+                    "stream": True, "messages": [{"role": "user", "content": PROMPT}]}).text
+                assert events.rstrip().endswith("data: [DONE]")
+
+                assert client.get("/stub/stats").json()["replayed"] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_error_rate(self):
+        state = StubState(LatencyModel("fixed:0"), error_rate=1.0, error_statuses=(503,))
+        server = create_server("127.0.0.1", 0, state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            response = httpx.post(f"http://127.0.0.1:{server.server_address[1]}/api/generate", json={"prompt": "x"})
+            assert response.status_code == 503
+            assert state.stats["errors"] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from ai.model_registry import ModelRegistry, model_registry
+
+
+class TestModelRegistry:
+
+    def test_registry_is_process_wide(self):
+        assert ModelRegistry() is model_registry
+
+    def test_get_or_load_loads_once(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        key = "test:get_or_load_loads_once"
+        model_registry.unload(key)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(model_registry.get_or_load(key, loader)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        model_registry.unload(key)
+
+    def test_stats(self):
+        key = "test:stats"
+        model_registry.unload(key)
+        model_registry.get_or_load(key, lambda: "model")
+        stats = [item for item in model_registry.stats() if item["key"] == key]
+        assert len(stats) == 1
+        assert stats[0]["type"] == "str"
+        assert stats[0]["load_seconds"] >= 0
+        model_registry.unload(key)
+        assert not model_registry.is_loaded(key)
+
+    def test_model_lock_is_shared_per_model(self):
+        key = "test:model_lock"
+        model_registry.unload(key)
+        model = model_registry.get_or_load(key, object)
+        assert model_registry.model_lock(model) is model_registry.model_lock(model)
+        assert model_registry.model_lock(model) is not model_registry.model_lock(object())
+        model_registry.unload(key)
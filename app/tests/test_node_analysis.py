@@ -0,0 +1,38 @@
+import json
+
+from ai.llm import Llm
+from services.graph_analyze_service import GraphAnalyzeService
+
+
+class TestNodeAnalysis:
+
+    def test_parse_combined_response(self):
+        ai_message = '{"result": {"title": "Apples", "keywords": ["apple", " fruit "], "tags": ["food"]}}'
+        analysis = json.loads(Llm.parse_json_data(ai_message))
+
+        assert GraphAnalyzeService.parse_node_analysis(analysis) == {
+            "title": "Apples",
+            "keywords": ["apple", "fruit"],
+            "tags": ["food"],
+        }
+
+    def test_malformed_fields_are_left_out(self):
+        analysis = {"title": ["not", "a", "title"], "keywords": "apple", "tags": ["food"]}
+
+        assert GraphAnalyzeService.parse_node_analysis(analysis) == {"tags": ["food"]}
+        assert GraphAnalyzeService.parse_node_analysis(None) == {}
+        assert GraphAnalyzeService.parse_node_analysis(["apple"]) == {}
+
+    def test_empty_fields_are_left_out(self):
+        analysis = {"title": "  ", "keywords": [], "tags": [" ", ""]}
+        assert GraphAnalyzeService.parse_node_analysis(analysis) == {}
+
+        analysis = {"title": " Apples ", "keywords": ["", "apple"], "tags": []}
+        assert GraphAnalyzeService.parse_node_analysis(analysis) == {"title": "Apples", "keywords": ["apple"]}
+
+    def test_analysis_node_prompt_template(self):
+        template = Llm.get_prompt_template("analysis_node")
+        prompt = template.format(input="Apples are fruits.")
+
+        assert "Apples are fruits." in prompt
+        assert '"keywords"' in prompt and '"tags"' in prompt
@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+
+from ai.prompt_dedup import PromptDedupIndex
+
+VECTORS = {
+    "What is logistics?": [1.0, 0.0, 0.0],
+    "What does logistics mean?": [0.98, 0.2, 0.0],
+    "Which trucks are used?": [0.0, 1.0, 0.0],
+    "How are goods stored?": [0.0, 0.6, 0.8],
+    "": [0.0, 0.0, 0.0],
+}
+
+
+async def embed(prompts):
+    return np.array([VECTORS[prompt] for prompt in prompts]) * 5
+
+
+class TestPromptDedupIndex:
+
+    def test_duplicates_reach_the_threshold(self):
+        index = PromptDedupIndex(threshold=0.9, model_name="sbert", embed=embed)
+        prompts = list(VECTORS)
+        embeddings = asyncio.run(index.embed(prompts))
+        assert np.allclose(np.linalg.norm(embeddings[:4], axis=1), 1.0)
+
+        index.add("logistics", embeddings[0])
+        duplicate, similarity = index.find(embeddings[1])
+        assert duplicate == "logistics"
+        assert similarity > 0.9
+        assert index.find(embeddings[2]) == (None, 0.0)
+
+        index.add("trucks", embeddings[2])
+        duplicate, similarity = index.find(embeddings[3])
+        assert duplicate is None
+        assert 0.5 < similarity < 0.9
+        assert index.duplicates == 1
+
+        # a prompt that could not be embedded is neither matched nor indexed
+        index.add("empty", embeddings[4])
+        assert index.find(embeddings[4]) == (None, 0.0)
+        assert len(index) == 2
+
+    def test_index_grows(self):
+        index = PromptDedupIndex(threshold=0.99, model_name="sbert", embed=embed)
+        for i in range(100):
+            embedding = np.zeros(128, dtype=np.float32)
+            embedding[i] = 1.0
+            index.add(i, embedding)
+        assert len(index) == 100
+        assert index.find(np.eye(128, dtype=np.float32)[77]) == (77, 1.0)
+
+    def test_embedding_failure_disables_the_batch(self):
+        async def failing_embed(prompts):
+            raise RuntimeError("model not loaded")
+
+        index = PromptDedupIndex(threshold=0.9, model_name="sbert", embed=failing_embed)
+        assert asyncio.run(index.embed(["What is logistics?"])) is None
+        assert asyncio.run(index.embed([])) is None
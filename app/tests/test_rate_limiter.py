@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai.rate_limiter import AdaptiveRateLimiter, error_status_code, is_overload_error, parse_rate_limits
+from core import config
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class TestAdaptiveRateLimiter:
+
+    def test_max_in_flight(self):
+        limiter = AdaptiveRateLimiter("test", max_in_flight=3)
+        running = []
+        peak = []
+
+        async def call():
+            async with limiter.limit():
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        async def run():
+            await asyncio.gather(*(call() for _ in range(20)))
+
+        asyncio.run(run())
+        assert max(peak) == 3
+        stats = limiter.stats()
+        assert stats["in_flight"] == 0
+        assert stats["succeeded"] == 20
+        assert stats["max_queue_depth"] >= 17
+
+    def test_requests_per_second(self):
+        limiter = AdaptiveRateLimiter("test", requests_per_second=50, max_in_flight=100)
+
+        async def run():
+            start = time.monotonic()
+            for _ in range(60):
+                async with limiter.limit():
+                    pass
+            return time.monotonic() - start
+
+        # the bucket holds 50 requests, the 10 others are metered at 50 per second
+        assert asyncio.run(run()) >= 0.15
+
+    def test_tokens_per_minute(self):
+        limiter = AdaptiveRateLimiter("test", tokens_per_minute=6000, max_in_flight=100)
+
+        async def run():
+            async with limiter.limit(tokens=6000):
+                pass
+            start = time.monotonic()
+            async with limiter.limit(tokens=10):
+                pass
+            return time.monotonic() - start
+
+        # the first call drains the bucket, which refills 100 tokens per second
+        assert asyncio.run(run()) >= 0.09
+
+    def test_overload_backs_off_and_recovers(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_RATE_LIMIT_BACKOFF_SECONDS", 0.05)
+        limiter = AdaptiveRateLimiter("test", requests_per_second=100, max_in_flight=8)
+
+        async def fail():
+            async with limiter.limit():
+                raise StatusError(429)
+
+        async def run():
+            with pytest.raises(StatusError):
+                await fail()
+            start = time.monotonic()
+            async with limiter.limit():
+                pass
+            return time.monotonic() - start
+
+        assert asyncio.run(run()) >= 0.04
+        assert limiter.stats()["concurrency"] == 4
+        assert limiter.stats()["overloaded"] == 1
+
+        for _ in range(30):
+            limiter.in_flight += 1
+            limiter.release()
+        assert limiter.stats()["concurrency"] == 8
+        assert limiter.rate_factor == 1.0
+
+    def test_other_errors_do_not_back_off(self):
+        limiter = AdaptiveRateLimiter("test", max_in_flight=8)
+
+        async def run():
+            with pytest.raises(ValueError):
+                async with limiter.limit():
+                    raise ValueError("bad prompt")
+
+        asyncio.run(run())
+        assert limiter.stats()["concurrency"] == 8
+        assert limiter.stats()["failed"] == 1
+
+    def test_cancelled_waiter_frees_its_slot(self):
+        limiter = AdaptiveRateLimiter("test", max_in_flight=1)
+
+        async def hold(event):
+            async with limiter.limit():
+                await event.wait()
+
+        async def run():
+            event = asyncio.Event()
+            holder = asyncio.create_task(hold(event))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            event.set()
+            await holder
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            await asyncio.wait_for(limiter.acquire(), timeout=1)
+            limiter.release()
+
+        asyncio.run(run())
+        assert limiter.stats()["in_flight"] == 0
+
+    def test_threads_share_the_limits_of_the_coroutines(self):
+        limiter = AdaptiveRateLimiter("test", max_in_flight=2)
+        running = []
+        peak = []
+
+        def track(seconds):
+            running.append(1)
+            peak.append(len(running))
+            time.sleep(seconds)
+            running.pop()
+
+        def call_sync():
+            with limiter.limit_sync():
+                track(0.01)
+
+        async def call():
+            async with limiter.limit():
+                track(0.01)
+
+        async def run():
+            await asyncio.gather(*(call() for _ in range(4)))
+
+        threads = [threading.Thread(target=call_sync) for _ in range(6)] + [threading.Thread(target=asyncio.run,
+                                                                                             args=(run(),))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 2
+        assert limiter.stats()["in_flight"] == 0
+        assert limiter.stats()["succeeded"] == 10
+
+    def test_sync_overload_backs_off(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_RATE_LIMIT_BACKOFF_SECONDS", 0)
+        limiter = AdaptiveRateLimiter("test", max_in_flight=8)
+        with pytest.raises(TimeoutError):
+            with limiter.limit_sync():
+                raise TimeoutError()
+        assert limiter.stats()["concurrency"] == 4
+        assert limiter.stats()["in_flight"] == 0
+
+
+class TestOverloadErrors:
+
+    def test_error_status_code(self):
+        assert error_status_code(StatusError(429)) == 429
+        assert error_status_code(ValueError("Failed with response: <Response [503 Service Unavailable]>")) == 503
+        assert error_status_code(ValueError("bad prompt")) is None
+
+    def test_is_overload_error(self):
+        assert is_overload_error(StatusError(429))
+        assert is_overload_error(StatusError(502))
+        assert is_overload_error(asyncio.TimeoutError())
+        assert not is_overload_error(StatusError(400))
+
+    def test_parse_rate_limits(self):
+        assert parse_rate_limits("ollama=0:0:2, gpt-4=2:10000:4,invalid") == {
+            "ollama": (0.0, 0.0, 2),
+            "gpt-4": (2.0, 10000.0, 4),
+        }
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import time
+
+from ai.sqlite_lru_store import SqliteLruStore
+
+
+class TestSqliteLruStore:
+
+    def setup_method(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = SqliteLruStore(os.path.join(self.tmpdir.name, "cache", "store.db"), "entries", max_entries=3)
+
+    def teardown_method(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_get_many_counts_repeated_keys(self):
+        self.store.put_many([("a", "sbert", b"1"), ("b", "sbert", b"2")])
+        assert self.store.get_many(["a", "c", "b", "a"]) == [b"1", None, b"2", b"1"]
+
+        stats = self.store.stats()
+        assert stats["hits"] == 3
+        assert stats["misses"] == 1
+        assert stats["entries"] == 2
+        assert stats["hit_rate"] == 0.75
+
+    def test_get_many_above_the_parameter_limit(self):
+        self.store.max_entries = 2000
+        self.store.put_many([(str(i), "sbert", b"x") for i in range(1200)])
+        assert all(value == b"x" for value in self.store.get_many([str(i) for i in range(1200)]))
+
+    def test_lru_eviction(self):
+        self.store.put_many([(key, "sbert", b"x") for key in "abc"])
+        # touch "a" so that "b" becomes the least recently used entry
+        self.store.get_many(["a"])
+        self.store.put_many([("d", "sbert", b"x")])
+
+        assert self.store.get_many(["b", "a"]) == [None, b"x"]
+        assert self.store.stats()["entries"] == 3
+        assert self.store.stats()["evictions"] == 1
+
+    def test_ttl_expiration(self):
+        self.store.ttl_seconds = 0.05
+        self.store.put_many([("a", "llama3.1", "response")])
+        assert self.store.get_many(["a"]) == ["response"]
+        time.sleep(0.1)
+        assert self.store.get_many(["a"]) == [None]
+        assert self.store.stats()["expirations"] == 1
+        assert self.store.stats()["entries"] == 0
+
+    def test_expired_entries_are_evicted_first(self):
+        self.store.ttl_seconds = 0.05
+        self.store.put_many([("a", "llama3.1", "response")])
+        time.sleep(0.1)
+        self.store.put_many([(key, "llama3.1", "response") for key in "bcd"])
+
+        assert self.store.get_many(["b", "c", "d"]) == ["response"] * 3
+        assert self.store.stats()["expirations"] == 1
+        assert self.store.stats()["evictions"] == 0
+
+    def test_persistent(self):
+        self.store.put_many([("a", "sbert", b"x")])
+        self.store.get_many(["a"])
+        self.store.close()
+        reopened = SqliteLruStore(self.store.path, "entries", max_entries=3)
+        assert reopened.get_many(["a"]) == [b"x"]
+        # the access clock continues from the entries on disk
+        reopened.put_many([(key, "sbert", b"x") for key in "bcd"])
+        assert reopened.get_many(["a"]) == [None]
+        reopened.close()
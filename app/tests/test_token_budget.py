@@ -0,0 +1,57 @@
+from ai.token_budget import (TRUNCATION_MARK, TokenUsage, compress_text, context_window, count_tokens, fit_texts,
+                             prompt_budget, token_prices, truncate_text)
+from core import config
+
+
+class TestTokenBudget:
+
+    def test_count_tokens(self):
+        assert count_tokens("") == 0
+        assert count_tokens("a" * 40, "llama3.1") == 10
+        # CJK characters are about one token each
+        assert count_tokens("知识图谱" * 10, "qwen-max") == 40
+
+    def test_context_window_and_budget(self, monkeypatch):
+        monkeypatch.setattr(config, "OLLAMA_NUM_CTX", 8192)
+        monkeypatch.setattr(config, "LLM_OUTPUT_TOKEN_RESERVE", 2048)
+        monkeypatch.setattr(config, "LLM_CONTEXT_WINDOWS", "qwen-max=16000,bad=x")
+        assert context_window("Doubao-1.5-lite-32k") == 32768
+        assert context_window("llama3.1") == 8192
+        assert context_window("qwen-max") == 16000
+        assert prompt_budget("Doubao-1.5-lite-32k") == 32768 - 2048
+        assert prompt_budget("gpt-4") == 8192 - 2048
+        monkeypatch.setattr(config, "LLM_OUTPUT_TOKEN_RESERVE", 4096)
+        assert prompt_budget("llama3.1") == 8192 - 2048
+
+    def test_token_prices(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_TOKEN_PRICES", "llama3.1=0.001:0.002")
+        assert token_prices("llama3.1") == (0.001, 0.002)
+        assert token_prices("wizardlm2") == (0.0, 0.0)
+
+    def test_truncate_text(self):
+        assert truncate_text("short text", 100) == "short text"
+        assert compress_text("a   b\n\n\n\nc  ") == "a b\n\nc"
+        text = " ".join(f"word{i}" for i in range(1000))
+        truncated = truncate_text(text, 50, "llama3.1")
+        assert truncated.startswith("word0 word1")
+        assert truncated.endswith(TRUNCATION_MARK)
+        assert count_tokens(truncated, "llama3.1") <= 50
+
+    def test_fit_texts_keeps_the_most_recent(self):
+        texts = ["a" * 400, "b" * 400, "c" * 400]
+        assert fit_texts(texts, 250) == ["b" * 400, "c" * 400]
+        assert fit_texts(texts, 1000) == texts
+        fitted = fit_texts(texts, 50)
+        assert len(fitted) == 1 and fitted[0].startswith("c") and count_tokens(fitted[0]) <= 50
+
+    def test_usage(self, monkeypatch):
+        monkeypatch.setattr(config, "LLM_TOKEN_PRICES", "")
+        usage = TokenUsage()
+        assert usage.record("gpt-4", 1000, 500) == 0.06
+        usage.record("gpt-4", 1000, 0, truncated=True)
+        stats = usage.stats()["gpt-4"]
+        assert stats["calls"] == 2
+        assert stats["prompt_tokens"] == 2000
+        assert stats["truncated"] == 1
+        assert stats["cost_usd"] == 0.09
+        assert stats["context_window"] == 8192
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from core import config
+from services import warmup_service
+from services.warmup_service import WarmupService
+
+
+@pytest.fixture
+def service(monkeypatch) -> WarmupService:
+    # a fresh singleton whose steps do not touch the models or the databases
+    monkeypatch.setattr(WarmupService, "_instance", None)
+    monkeypatch.setattr(config, "WARMUP_STEPS", "embedding,neo4j")
+    monkeypatch.setattr(config, "WARMUP_RETRY_SECONDS", 0.01)
+    return WarmupService()
+
+
+def stub_steps(monkeypatch, service: WarmupService, steps) -> None:
+    monkeypatch.setattr(service, "_step_functions", lambda: steps)
+
+
+class TestWarmupService:
+
+    def test_ready_after_all_steps_succeed(self, service, monkeypatch):
+        async def embedding():
+            return ["sbert"]
+
+        async def neo4j():
+            return None
+
+        async def gds():
+            raise AssertionError("disabled steps do not run")
+
+        stub_steps(monkeypatch, service, {"embedding": embedding, "neo4j": neo4j, "gds": gds})
+        assert service.status()["ready"] is False
+
+        asyncio.run(service.run())
+
+        status = service.status()
+        assert status["ready"] is True
+        assert status["finished_at"] >= status["started_at"]
+        assert set(status["steps"]) == {"embedding", "neo4j"}
+        assert status["steps"]["embedding"]["status"] == "ok"
+        assert status["steps"]["embedding"]["result"] == ["sbert"]
+
+    def test_failed_step_is_retried(self, service, monkeypatch):
+        calls = {"embedding": 0, "neo4j": 0}
+        statuses = []
+
+        async def embedding():
+            calls["embedding"] += 1
+            return ["sbert"]
+
+        async def neo4j():
+            calls["neo4j"] += 1
+            if calls["neo4j"] < 3:
+                statuses.append(service.status())
+                raise ConnectionError("Neo4j is starting")
+
+        stub_steps(monkeypatch, service, {"embedding": embedding, "neo4j": neo4j})
+        asyncio.run(service.run())
+
+        # the failed step runs again, the succeeded one does not
+        assert calls == {"embedding": 1, "neo4j": 3}
+        assert all(status["ready"] is False for status in statuses)
+        assert service.ready is True
+        assert service.steps["neo4j"]["status"] == "ok"
+
+    def test_status_while_a_step_keeps_failing(self, service, monkeypatch):
+        async def embedding():
+            return ["sbert"]
+
+        async def neo4j():
+            raise ConnectionError("Neo4j is starting")
+
+        async def run_for_a_while():
+            task = asyncio.create_task(service.run())
+            await asyncio.sleep(0.05)
+            status = service.status()
+            task.cancel()
+            return status
+
+        stub_steps(monkeypatch, service, {"embedding": embedding, "neo4j": neo4j})
+        status = asyncio.run(run_for_a_while())
+
+        assert status["ready"] is False
+        assert status["finished_at"] is None
+        assert status["steps"]["embedding"]["status"] == "ok"
+        assert status["steps"]["neo4j"]["status"] == "failed"
+        assert status["steps"]["neo4j"]["error"] == "Neo4j is starting"
+
+    def test_missing_ner_language_does_not_block_readiness(self, service, monkeypatch):
+        calls = []
+
+        async def run_in_nlp_process(func, langs):
+            calls.append(langs)
+            # the zh pipeline is not installed
+            return [lang for lang in langs if lang == "en"]
+
+        monkeypatch.setattr(config, "WARMUP_STEPS", "ner")
+        monkeypatch.setattr(config, "WARMUP_NER_LANGUAGES", "en,zh")
+        monkeypatch.setattr(config, "NLP_PROCESS_WORKERS", 1)
+        monkeypatch.setattr(warmup_service, "run_in_nlp_process", run_in_nlp_process)
+        asyncio.run(service.run())
+
+        # a missing model is not retried
+        assert calls == [["en", "zh"]]
+        assert service.status()["ready"] is True
+        assert service.steps["ner"]["status"] == "degraded"
+        assert service.steps["ner"]["result"] == ["en"]
+        assert "zh" in service.steps["ner"]["error"]
+
+
+class TestHealthEndpoints:
+
+    def test_ready_is_503_while_warming_up(self, service, monkeypatch):
+        monkeypatch.setattr(config, "IS_CAMEL_CASE", False)
+        # the lifespan, which starts the warm-up, does not run without a with block
+        client = TestClient(main.create_app())
+
+        assert client.get("/health/live").status_code == 200
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["msg"] == "The service is warming up."
+        assert response.json()["data"]["ready"] is False
+
+        service.ready = True
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json()["data"]["ready"] is True